@@ -0,0 +1,279 @@
+"""
+性能基准测试
+
+覆盖坐标转换(标量与1~10^7个点的批量转换), 全网格几何枚举, 1km/500m/250m图块写出, 各尺寸图块渲染;
+记录每项的耗时, 吞吐量(项/秒)与峰值内存(tracemalloc统计的Python/NumPy分配, 不含GDAL内部缓存),
+可保存为基线并与已保存的基线对比, 超出阈值时以非零状态退出, 便于在发布前发现性能回退.
+
+python scripts/benchmark.py --save benchmark_baseline.json
+python scripts/benchmark.py --compare benchmark_baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter import Sinusoidal, __version__
+
+parser = argparse.ArgumentParser(description="Benchmark modis_sinusoidal_tile_converter")
+parser.add_argument("--save", default=None, help="Save the results as a baseline JSON file")
+parser.add_argument("--compare", default=None, help="Compare the results with a saved baseline JSON file")
+parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown before flagging a regression")
+parser.add_argument("--memory-threshold", type=float, default=0.25, help="Allowed relative peak memory growth")
+parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs of each benchmark (best is reported)")
+parser.add_argument("--quick", action="store_true", help="Skip the largest sizes (10^7 points, 250m tiles)")
+parser.add_argument("--filter", nargs="*", default=None, help="Only run benchmarks whose name contains any of these")
+parser.add_argument(
+    "--import-target", type=float, default=0.05, help="Target seconds of package import plus a first conversion, beyond numpy"
+)
+
+# 峰值内存低于该值时不参与回退判断, 避免小分配的噪声
+MEMORY_NOISE_BYTES = 1 << 20
+
+# 纯坐标计算不应导入的重量级依赖
+HEAVY_MODULES = ("pyproj", "rasterio", "matplotlib", "PIL")
+
+STARTUP_CODE = """
+import sys, time
+start = time.perf_counter()
+import numpy
+numpy_done = time.perf_counter()
+from modis_sinusoidal_tile_converter import Sinusoidal
+Sinusoidal.GCS2ICSTile(40.0, 100.0)
+Sinusoidal.get_tile_bounds("h26v05")
+end = time.perf_counter()
+print(numpy_done - start, end - numpy_done, ",".join(m for m in %r if m in sys.modules))
+""" % (HEAVY_MODULES,)
+
+
+class Benchmark:
+    def __init__(self, name: str, func, items: int, repeat: int = None):
+        """
+        :param name: 名称, 以 "." 分组, 如 "conversion.bulk.GCS2PCS.n=1000"
+        :param func: 无参数的被测函数
+        :param items: 每次调用处理的项数(点数, 像素数, 图块数), 用于计算吞吐量
+        :param repeat: 计时次数, 为None时使用命令行参数
+        """
+        self.name = name
+        self.func = func
+        self.items = items
+        self.repeat = repeat
+
+    def run(self, repeat: int) -> dict:
+        # 首次运行同时作为预热, 并在tracemalloc下统计峰值内存; 计时运行不开启tracemalloc
+        tracemalloc.start()
+        self.func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        times = []
+        for _ in range(self.repeat or repeat):
+            start = time.perf_counter()
+            self.func()
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        return {
+            "seconds": best,
+            "median_seconds": statistics.median(times),
+            "items": self.items,
+            "items_per_second": self.items / best if best > 0 else float("inf"),
+            "peak_bytes": peak,
+        }
+
+
+def conversion_benchmarks(quick: bool) -> list:
+    benchmarks = []
+    rng = np.random.default_rng(0)
+
+    # 标量调用: 1000次逐点调用
+    lats, lons = rng.uniform(-89, 89, 1000), rng.uniform(-179, 179, 1000)
+    scalar_points = list(zip(lats.tolist(), lons.tolist()))
+    hvs = [f"h{h:02d}v{v:02d}" for h in range(36) for v in range(18)][:1000]
+    benchmarks += [
+        Benchmark("conversion.scalar.GCS2ICSTile", lambda: [Sinusoidal.GCS2ICSTile(a, b) for a, b in scalar_points], 1000),
+        Benchmark("conversion.scalar.GCS2PCS", lambda: [Sinusoidal.GCS2PCS(a, b) for a, b in scalar_points], 1000),
+        Benchmark("conversion.scalar.get_tile_transform", lambda: [Sinusoidal.get_tile_transform(hv) for hv in hvs], len(hvs)),
+    ]
+
+    # 批量转换
+    sizes = [1, 10**3, 10**5] if quick else [1, 10**3, 10**5, 10**7]
+    for n in sizes:
+        lat, lon = rng.uniform(-89, 89, n), rng.uniform(-179, 179, n)
+        x, y = Sinusoidal.GCS2PCS(lat, lon)
+        v, h, line, sample = Sinusoidal.GCS2ICSTile(lat, lon)
+        repeat = 1 if n >= 10**7 else None
+        benchmarks += [
+            Benchmark(f"conversion.bulk.GCS2ICSTile.n={n}", lambda lat=lat, lon=lon: Sinusoidal.GCS2ICSTile(lat, lon), n, repeat),
+            Benchmark(f"conversion.bulk.ICSTile2GCS.n={n}", lambda a=(v, h, line, sample): Sinusoidal.ICSTile2GCS(*a), n, repeat),
+            Benchmark(f"conversion.bulk.GCS2PCS.n={n}", lambda lat=lat, lon=lon: Sinusoidal.GCS2PCS(lat, lon), n, repeat),
+            Benchmark(f"conversion.bulk.PCS2GCS.n={n}", lambda x=x, y=y: Sinusoidal.PCS2GCS(x, y), n, repeat),
+        ]
+    return benchmarks
+
+
+def grid_benchmarks(quick: bool) -> list:
+    from modis_sinusoidal_tile_converter.tile_table import TileTable
+
+    v, h = np.mgrid[0:18, 0:36]
+    hvs = [f"h{hh:02d}v{vv:02d}" for hh in range(36) for vv in range(18)]
+    return [
+        Benchmark("grid.tile_table.1km", lambda: TileTable("1km"), v.size),
+        Benchmark("grid.tile_table.500m", lambda: TileTable("500m"), v.size),
+        Benchmark("grid.tile_GCSBox.all", lambda: Sinusoidal.tile_GCSBox(v, h), v.size),
+        Benchmark("grid.tile_PCSGRing.all", lambda: Sinusoidal.tile_PCSGRing(v, h), v.size),
+        Benchmark("grid.get_tile_bounds.all", lambda: [Sinusoidal.get_tile_bounds(hv) for hv in hvs], len(hvs)),
+        Benchmark("grid.tiles_in_bbox.global", lambda: Sinusoidal.tiles_in_bbox(-90, -180, 90, 180), v.size),
+    ]
+
+
+def _tile_sizes(quick: bool) -> list:
+    sizes = [("1km", 1200), ("500m", 2400)]
+    if not quick:
+        sizes.append(("250m", 4800))
+    return sizes
+
+
+def write_benchmarks(quick: bool, output_dir: str) -> list:
+    from modis_sinusoidal_tile_converter.convert import array2tiff
+
+    benchmarks = []
+    rng = np.random.default_rng(0)
+    for grid, pixels in _tile_sizes(quick):
+        arr = rng.integers(0, 10000, (pixels, pixels), dtype=np.int16)
+        path = os.path.join(output_dir, f"h26v05.{grid}.tif")
+        benchmarks.append(
+            Benchmark(f"write.array2tiff.{grid}", lambda arr=arr, path=path, grid=grid: array2tiff(arr, path, "h26v05", grid=grid), arr.size)
+        )
+    return benchmarks
+
+
+def render_benchmarks(quick: bool) -> list:
+    from modis_sinusoidal_tile_converter.renderer import Renderer
+
+    benchmarks = []
+    rng = np.random.default_rng(0)
+    for grid, pixels in _tile_sizes(quick):
+        data = rng.random((pixels, pixels), dtype=np.float32)
+        data[: pixels // 10] = np.nan
+        benchmarks.append(
+            Benchmark(
+                f"render.render_single_band.{grid}",
+                lambda data=data: Renderer.render_single_band(data, colormap="viridis", vmin=0, vmax=1),
+                data.size,
+            )
+        )
+    return benchmarks
+
+
+def startup_benchmark(repeat: int) -> dict:
+    """
+    在新的解释器中测量导入包并完成一次坐标转换的耗时(不含numpy自身的导入), 取多次中的最小值,
+    同时检查过程中是否导入了重量级依赖
+    """
+    times, numpy_times, heavy = [], [], ""
+    for _ in range(max(repeat, 3)):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_CODE], capture_output=True, text=True, check=True, env=env
+        ).stdout
+        numpy_time, package_time, *rest = output.split()
+        numpy_times.append(float(numpy_time))
+        times.append(float(package_time))
+        heavy = rest[0] if rest else ""
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "items": 1,
+        "items_per_second": 1 / min(times),
+        "peak_bytes": 0,
+        "numpy_seconds": min(numpy_times),
+        "heavy_modules": heavy.split(",") if heavy else [],
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, memory_threshold: float) -> list:
+    """与基线对比, 返回回退项的描述"""
+    regressions = []
+    print(f"\n{'benchmark':<48}{'time ratio':>12}{'memory ratio':>14}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48}{'new':>12}")
+            continue
+        time_ratio = result["seconds"] / base["seconds"] if base["seconds"] > 0 else 1.0
+        memory_ratio = result["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] > 0 else 1.0
+        flags = []
+        if time_ratio > 1 + threshold:
+            flags.append("SLOWER")
+            regressions.append(f"{name}: {time_ratio:.2f}x time")
+        if memory_ratio > 1 + memory_threshold and result["peak_bytes"] > MEMORY_NOISE_BYTES:
+            flags.append("MEMORY")
+            regressions.append(f"{name}: {memory_ratio:.2f}x peak memory")
+        print(f"{name:<48}{time_ratio:>11.2f}x{memory_ratio:>13.2f}x  {' '.join(flags)}")
+    return regressions
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as output_dir:
+        benchmarks = (
+            conversion_benchmarks(args.quick)
+            + grid_benchmarks(args.quick)
+            + write_benchmarks(args.quick, output_dir)
+            + render_benchmarks(args.quick)
+        )
+        if args.filter:
+            benchmarks = [b for b in benchmarks if any(f in b.name for f in args.filter)]
+        results = {}
+        print(f"{'benchmark':<48}{'seconds':>12}{'items/s':>14}{'peak MB':>10}")
+        failures = []
+        if not args.filter or any(f in "startup.import_and_convert" for f in args.filter):
+            result = startup_benchmark(args.repeat)
+            results["startup.import_and_convert"] = result
+            print(f"{'startup.import_and_convert':<48}{result['seconds']:>12.6f}{'':>14}{'':>10}")
+            if result["seconds"] > args.import_target:
+                failures.append(f"startup: {result['seconds']:.3f}s exceeds the import target {args.import_target:.3f}s")
+            if result["heavy_modules"]:
+                failures.append(f"startup: heavy modules imported: {', '.join(result['heavy_modules'])}")
+        for benchmark in benchmarks:
+            result = benchmark.run(args.repeat)
+            results[benchmark.name] = result
+            print(
+                f"{benchmark.name:<48}{result['seconds']:>12.6f}{result['items_per_second']:>14.4g}"
+                f"{result['peak_bytes'] / 2**20:>10.1f}"
+            )
+    report = {
+        "meta": {
+            "version": __version__,
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nbaseline saved to {args.save}")
+    regressions = failures
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions += compare(results, baseline, args.threshold, args.memory_threshold)
+    if regressions:
+        print("\nregressions:\n" + "\n".join(regressions))
+        return 1
+    print("\nno regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,153 @@
 import os
 import glob
 import re
+import json
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import pandas as pd
-from pyhdf.SD import SD, SDC, SDS
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.catalog import parse_granule_name
 
 parser = argparse.ArgumentParser(description="Get MODIS Sinusoidal Tile Grid Corner Coordinates")
-parser.add_argument("path", help="Path of MODIS Sinusoidal Tile Grid Corner Coordinates")
+parser.add_argument("path", nargs="*", help="Path (glob pattern) of MODIS HDF files")
+parser.add_argument("--output", default="MODIS_Sinusoidal_Tile_Grid_Corner_Coordinates.csv", help="Output CSV path")
+parser.add_argument("--cache", default=None, help="Resumable cache of extracted tiles, default <output>.cache.jsonl")
+parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+parser.add_argument("--tolerance", type=float, default=1.0, help="Tolerance (meters) of the cross-check against get_tile_bounds")
+parser.add_argument("--verify", action="store_true", help="Only cross-check the existing output CSV, no HDF is read")
+
+CORNER_PATTERN = re.compile(r"UpperLeftPointMtrs=\((.*?),(.*?)\).*?LowerRightMtrs=\((.*?),(.*?)\)", re.S)
 
 
 def get_corner_coordinates_from_modis_hdf(path):
+    from pyhdf.SD import SD, SDC
+
     # 使用pyhdf读取hdf文件
     fp = SD(path, mode=SDC.READ)
-    # 获取文件中的属性信息
-    infos = fp.attributes()["StructMetadata.0"]
-    # 从属性信息中提取坐标信息
-    coordinates = re.findall("UpperLeftPointMtrs=\((.*?),(.*?)\).*?LowerRightMtrs=\((.*?),(.*?)\)", infos, re.S)[0]
+    try:
+        # 获取文件中的属性信息
+        infos = fp.attributes()["StructMetadata.0"]
+    finally:
+        fp.end()
+    # 从属性信息中提取第一个网格的坐标信息, 找到即停止
+    match = CORNER_PATTERN.search(infos)
+    if match is None:
+        raise ValueError(f"No corner coordinates found in {path}")
     # 将坐标信息转换为浮点数
-    coordinates = [float(i) for i in coordinates]
-    return coordinates
+    return [float(i) for i in match.groups()]
+
+
+def group_paths_by_hv(paths: list) -> dict:
+    """按文件名中的分幅号分组, 无需打开文件; 每组内按路径排序"""
+    groups = {}
+    for path in sorted(paths):
+        # MODIS文件名中间的h09v07就是分幅号, h表示横向，v表示纵向, 如 MOD09GA.A2021002.h09v07.061.2021012063102.hdf
+        granule = parse_granule_name(path)
+        if granule is None or granule.hv is None:
+            continue
+        groups.setdefault(granule.hv, []).append(path)
+    return groups
+
+
+def extract_tile(hv: str, paths: list) -> dict:
+    """读取一个分幅的坐标信息, 在工作进程中执行; 文件损坏时依次尝试同分幅的其他文件"""
+    errors = []
+    for path in paths:
+        try:
+            coordinates = get_corner_coordinates_from_modis_hdf(path)
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+            continue
+        h, v = Sinusoidal.parse_hv(hv)
+        return {"hv": hv, "h": h, "v": v, "path": path, "coordinates": coordinates}
+    raise RuntimeError(f"Failed to read {hv}:\n" + "\n".join(errors))
+
+
+def check_tile_bounds(hv: str, coordinates: list, tolerance: float = 1.0) -> bool:
+    """与解析计算的 Sinusoidal.get_tile_bounds 对比, 各角点坐标之差均不超过 tolerance 米"""
+    expected = Sinusoidal.get_tile_bounds(hv)
+    return all(abs(a - b) <= tolerance for a, b in zip(coordinates, expected))
+
 
+def load_cache(cache_path: str) -> dict:
+    """读取断点缓存, 每行一个已提取分幅的JSON记录; 中断时未写完的最后一行忽略"""
+    records = {}
+    if not os.path.exists(cache_path):
+        return records
+    with open(cache_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["hv"]] = record
+    return records
 
-def batch_read_hdf_to_generate_hv_csv(paths: list):
+
+def batch_read_hdf_to_generate_hv_csv(paths: list, cache_path: str = None, workers: int = None, tolerance: float = 1.0):
     if not isinstance(paths, list):
         raise TypeError("Parameter(paths) must be list")
-    hvdict = {}
-    paths = sorted(paths)
-    for i in paths:
-        print(i)
-        # 获取文件名称
-        filename = os.path.basename(i)
-        # 获取文件分幅号, MODIS文件格式中，文件名中间的h09v07就是分幅号, h表示横向，v表示纵向
-        # MOD09GA.A2021002.h09v07.061.2021012063102.hdf
-        # MCD19A2.A2021365.h32v08.061.2023157173848.hdf
-        hv = filename.split(".")[2]  # h09v07
-        # 如果分幅号在字典中已经存在，则跳过
-        if hv in hvdict:
-            continue
-        # 获取分幅号对应的坐标信息
-        coordinates = get_corner_coordinates_from_modis_hdf(i)
-        h = int(hv[1:3])
-        v = int(hv[4:6])
-        # 将分幅号和坐标信息存入字典
-        hvdict[hv] = [h, v] + coordinates
+    groups = group_paths_by_hv(paths)
+    records = load_cache(cache_path) if cache_path else {}
+    todo = {hv: group for hv, group in groups.items() if hv not in records}
+    print(f"分幅数量: {len(groups)}, 已缓存: {len(groups) - len(todo)}, 待读取: {len(todo)}")
+    cache = open(cache_path, "a", encoding="utf-8") if cache_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(extract_tile, hv, group): hv for hv, group in todo.items()}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except RuntimeError as e:
+                    print(e)
+                    continue
+                records[record["hv"]] = record
+                print(record["path"])
+                # 每完成一个分幅立即写入缓存, 中断后重新运行时跳过
+                if cache is not None:
+                    cache.write(json.dumps(record) + "\n")
+                    cache.flush()
+    finally:
+        if cache is not None:
+            cache.close()
     # 将字典转换为DataFrame
-    if len(hvdict) == 0:
+    rows = [[r["hv"], r["h"], r["v"]] + r["coordinates"] for hv, r in records.items() if hv in groups]
+    if len(rows) == 0:
         return pd.DataFrame()
-    df = pd.DataFrame.from_dict(hvdict, orient="index").reset_index()
-    df.columns = ["hv", "h", "v", "ulx", "uly", "lrx", "lry"]
+    df = pd.DataFrame(rows, columns=["hv", "h", "v", "ulx", "uly", "lrx", "lry"])
     df.sort_values(["h", "v"], inplace=True)
     df["h"] = df["h"].astype(int)
     df["v"] = df["v"].astype(int)
+    report_mismatches(df, tolerance)
     return df
 
 
+def report_mismatches(df: pd.DataFrame, tolerance: float = 1.0) -> list:
+    """交叉检验每个分幅的坐标, 输出并返回与解析结果不一致的分幅"""
+    mismatches = [
+        row.hv
+        for row in df.itertuples(index=False)
+        if not check_tile_bounds(row.hv, [row.ulx, row.uly, row.lrx, row.lry], tolerance)
+    ]
+    for hv in mismatches:
+        print(f"不一致: {hv}, 文件 {df.loc[df.hv == hv, ['ulx', 'uly', 'lrx', 'lry']].values[0].tolist()}, "
+              f"解析 {list(Sinusoidal.get_tile_bounds(hv))}")
+    print(f"交叉检验: {len(df)} 个分幅, {len(mismatches)} 个不一致")
+    return mismatches
+
+
 if __name__ == "__main__":
     args = parser.parse_args()
+    if args.verify:
+        # 仅校验已有的CSV文件
+        mismatches = report_mismatches(pd.read_csv(args.output), args.tolerance)
+        raise SystemExit(1 if mismatches else 0)
     # 获取文件列表
-    path_re_str = args.path
-    paths = list(glob.glob(path_re_str, recursive=True))
+    paths = [p for pattern in args.path for p in glob.glob(pattern, recursive=True)]
     print(f"文件数量: {len(paths)}")  # 输出文件数量
     # 读取文件，生成MODIS_Sinusoidal_Tile_Grid_Corner_Coordinates.csv文件
-    df = batch_read_hdf_to_generate_hv_csv(paths)
-    df.to_csv("MODIS_Sinusoidal_Tile_Grid_Corner_Coordinates.csv", index=False)
+    cache_path = args.cache or args.output + ".cache.jsonl"
+    df = batch_read_hdf_to_generate_hv_csv(paths, cache_path, args.workers, args.tolerance)
+    df.to_csv(args.output, index=False)
@@ -1,8 +1,15 @@
-from importlib.metadata import version, PackageNotFoundError
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
 
-try:
-    __version__ = version(__package__)
-except PackageNotFoundError:
-    __version__ = "unknown version"
-    
-from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
\ No newline at end of file
+
+def __getattr__(name):
+    # 版本号在首次访问时才读取, importlib.metadata 的导入开销不计入包的导入时间
+    if name == "__version__":
+        from importlib.metadata import version, PackageNotFoundError
+
+        try:
+            value = version(__package__)
+        except PackageNotFoundError:
+            value = "unknown version"
+        globals()["__version__"] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
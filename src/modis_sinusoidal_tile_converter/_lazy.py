@@ -0,0 +1,22 @@
+"""延迟构建的类属性, 避免在导入时加载pyproj等较重的依赖"""
+
+
+class lazy_class_attribute:
+    """
+    类属性描述器: 首次访问时调用 factory 构建属性值, 并以该值替换描述器本身, 之后的访问与普通类属性相同
+
+    >>> class Sinusoidal:
+    ...     crs = lazy_class_attribute(lambda: CRS.from_wkt(wkt))
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.__doc__ = getattr(factory, "__doc__", None)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.factory()
+        setattr(owner, self.name, value)
+        return value
@@ -0,0 +1,211 @@
+"""
+250m / 500m / 1km 图块之间的多分辨率聚合
+
+三种网格的图块范围相同, 像元严格嵌套(250m -> 1km 为4x4, 500m -> 1km 为2x2, 250m -> 500m 为2x2),
+因此降分辨率只需对块内每个位置取步长为 f 的切片视图逐个归约, 无需通用重采样, 也不复制源数据.
+支持整幅波段堆栈, 也支持按行块流式处理, 输出可直接传给 convert.array2tiff / array2tiff_blocks.
+
+>>> ndvi_1km = aggregate(ndvi_250m, "250m", "1km", method="mean", nodata=-3000)
+>>> array2tiff(ndvi_1km, "ndvi.h26v05.1km.tif", "h26v05", grid="1km", nodata=-3000)
+"""
+from typing import Iterable, Iterator, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.stats import array_pixels, instrument
+
+__all__ = ["METHODS", "block_factor", "result_dtype", "aggregate", "iter_aggregate"]
+
+METHODS = ("mean", "sum", "min", "max", "mode", "valid_fraction")
+
+
+def block_factor(src_grid: Union[str, Grid], dst_grid: Union[str, Grid]) -> int:
+    """源网格到目标网格每个方向的聚合倍数, 如 250m -> 1km 为4"""
+    src_grid, dst_grid = get_grid(src_grid), get_grid(dst_grid)
+    factor, remainder = divmod(src_grid.pixels_per_tile, dst_grid.pixels_per_tile)
+    if factor < 1 or remainder:
+        raise ValueError(f"Cannot aggregate from {src_grid.name} to {dst_grid.name}, dst_grid should be coarser")
+    return factor
+
+
+def result_dtype(dtype, method: str) -> np.dtype:
+    """
+    聚合结果的数据类型
+    mean: 整数及float32输入为float32, float64输入为float64; sum: 整数为int64, 浮点为float64;
+    min/max/mode: 同输入; valid_fraction: float32
+    """
+    dtype = np.dtype(dtype)
+    if method == "mean":
+        return np.dtype(np.float64) if dtype == np.float64 else np.dtype(np.float32)
+    if method == "sum":
+        return np.dtype(np.float64) if dtype.kind == "f" else np.dtype(np.int64)
+    if method in ("min", "max", "mode"):
+        return dtype
+    if method == "valid_fraction":
+        return np.dtype(np.float32)
+    raise ValueError(f"method({method}) should be in {list(METHODS)}")
+
+
+def _valid_mask(values: np.ndarray, nodata):
+    """有效像元掩膜, 全部有效时返回None"""
+    if values.dtype.kind == "f":
+        valid = ~np.isnan(values)
+        if nodata is not None and not np.isnan(nodata):
+            valid &= values != nodata
+        return valid
+    if nodata is None:
+        return None
+    return values != nodata
+
+
+def _mode(parts, nodata) -> np.ndarray:
+    """块内众数, 票数相同时取较小值"""
+    # 每个块的像元排在最后一个轴并排序: (..., H', W', f*f), 相等的值连续成段
+    values = np.sort(np.stack(parts, axis=-1), axis=-1)
+    # 转为 (f*f, ..., H', W') 的连续数组, 逐个位置取出的切片是连续内存
+    values = np.ascontiguousarray(np.moveaxis(values, -1, 0))
+    # 有效性只取决于值本身, 同一段内的像元有效性相同; 逐个位置累计段长, 段长严格大于当前最大票数时更新众数
+    first = values[0]
+    valid = _valid_mask(first, nodata)
+    run = np.ones(first.shape, dtype=np.int16)
+    best_votes = run.copy() if valid is None else valid.astype(np.int16)
+    best = first.copy()
+    for k in range(1, len(values)):
+        current = values[k]
+        # 与前一个值相等时段长加1, 否则重新计为1
+        run *= current == values[k - 1]
+        run += 1
+        better = run > best_votes
+        valid = _valid_mask(current, nodata)
+        if valid is not None:
+            better &= valid
+        np.copyto(best_votes, run, where=better)
+        np.copyto(best, current, where=better)
+    return best
+
+
+def _aggregate_block(data: np.ndarray, factor: int, method: str, nodata, min_valid: float) -> np.ndarray:
+    height, width = data.shape[-2:]
+    if height % factor or width % factor:
+        raise ValueError(f"data shape ({height}, {width}) should be a multiple of {factor}")
+    # 块内每个位置对应一个步长为 factor 的切片视图, 逐个切片累加, 临时数组只有目标网格大小
+    parts = [data[..., i::factor, j::factor] for i in range(factor) for j in range(factor)]
+    valids = [_valid_mask(part, nodata) for part in parts]
+    n = factor * factor
+    count = None
+    if valids[0] is not None:
+        count = np.zeros(parts[0].shape, dtype=np.int16)
+        for valid in valids:
+            count += valid
+    dtype = result_dtype(data.dtype, method)
+
+    if method == "valid_fraction":
+        if count is None:
+            return np.ones(parts[0].shape, dtype=dtype)
+        return (count / n).astype(dtype)
+    if method in ("mean", "sum"):
+        total = np.zeros(parts[0].shape, dtype=np.float64 if dtype.kind == "f" else np.int64)
+        for part, valid in zip(parts, valids):
+            total += np.where(valid, part, 0) if valid is not None else part
+        if method == "sum":
+            out = total.astype(dtype, copy=False)
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out = (total / (count if count is not None else n)).astype(dtype)
+    elif method in ("min", "max"):
+        reduce = np.minimum if method == "min" else np.maximum
+        info = np.finfo(dtype) if dtype.kind == "f" else np.iinfo(dtype)
+        out = np.full(parts[0].shape, info.max if method == "min" else info.min, dtype=dtype)
+        for part, valid in zip(parts, valids):
+            reduce(out, part, out=out, where=valid if valid is not None else True)
+    elif method == "mode":
+        out = _mode(parts, nodata)
+    else:
+        raise ValueError(f"method({method}) should be in {list(METHODS)}")
+
+    if count is not None:
+        # 有效像元不足的块置为无效值: 给定nodata时使用nodata, 否则为NaN(仅浮点结果会出现)
+        required = max(1, int(np.ceil(min_valid * n)))
+        fill = nodata if nodata is not None else np.nan
+        out[count < required] = fill
+    return out
+
+
+@instrument("aggregate.aggregate", items=array_pixels)
+def aggregate(
+    data: np.ndarray,
+    src_grid: Union[str, Grid] = "250m",
+    dst_grid: Union[str, Grid] = "1km",
+    method: str = "mean",
+    nodata=None,
+    min_valid: float = 0.0,
+) -> np.ndarray:
+    """
+    将细网格图块数据按块聚合到粗网格
+    :param data: 形状为 (H, W) 或 (bands, H, W) 的数组, H/W 为 src_grid 的图块边长(或其中按块对齐的一部分)
+    :param src_grid: 源网格名称或 Grid 对象
+    :param dst_grid: 目标网格名称或 Grid 对象, 须不细于源网格
+    :param method: "mean", "sum", "min", "max", "mode" 或 "valid_fraction"(块内有效像元比例)
+    :param nodata: 源数据无效值, 不参与聚合; 浮点数据的NaN始终视为无效
+    :param min_valid: 块内有效像元比例低于该值时结果为无效值, 默认至少1个有效像元
+    :return: 形状为 (H/f, W/f) 或 (bands, H/f, W/f) 的数组, 数据类型见 result_dtype;
+             无效块为nodata, 未给定nodata时为NaN
+    """
+    data = np.asarray(data)
+    if data.ndim not in (2, 3):
+        raise ValueError("Only support 2D or 3D array")
+    if method not in METHODS:
+        raise ValueError(f"method({method}) should be in {list(METHODS)}")
+    return _aggregate_block(data, block_factor(src_grid, dst_grid), method, nodata, min_valid)
+
+
+def _window_bounds(window) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """支持 rasterio Window 或 ((row_start, row_stop), (col_start, col_stop))"""
+    if hasattr(window, "row_off"):
+        return (
+            (int(window.row_off), int(window.row_off + window.height)),
+            (int(window.col_off), int(window.col_off + window.width)),
+        )
+    (row_start, row_stop), (col_start, col_stop) = window
+    return (int(row_start), int(row_stop)), (int(col_start), int(col_stop))
+
+
+def iter_aggregate(
+    source: Union[np.ndarray, Iterable[Tuple[object, np.ndarray]]],
+    src_grid: Union[str, Grid] = "250m",
+    dst_grid: Union[str, Grid] = "1km",
+    method: str = "mean",
+    nodata=None,
+    min_valid: float = 0.0,
+    block_rows: int = 512,
+) -> Iterator[Tuple[Tuple[Tuple[int, int], Tuple[int, int]], np.ndarray]]:
+    """
+    流式聚合, 内存占用只与块大小有关, 产出可直接作为 convert.array2tiff_blocks 的 source
+    >>> blocks = iter_aggregate(np.load("ndvi_250m.npy", mmap_mode="r"), "250m", "1km")
+    >>> array2tiff_blocks(blocks, "ndvi.tif", "h26v05", grid="1km", count=1, dtype=result_dtype("int16", "mean"))
+
+    :param source: 可切片的数组对象(np.memmap等), 按 block_rows 行分块读取;
+                   或 (window, block) 迭代器, window 为 rasterio Window 或 ((row_start, row_stop), (col_start, col_stop)),
+                   窗口边界须为聚合倍数的整数倍
+    :param block_rows: source 为数组时每块的源数据行数, 向下取整为聚合倍数的整数倍
+    :return: 迭代产出 (((row_start, row_stop), (col_start, col_stop)), block), 窗口为目标网格中的位置
+    """
+    if method not in METHODS:
+        raise ValueError(f"method({method}) should be in {list(METHODS)}")
+    factor = block_factor(src_grid, dst_grid)
+    if hasattr(source, "shape") and hasattr(source, "__getitem__"):
+        height, width = source.shape[-2:]
+        step = max(factor, block_rows - block_rows % factor)
+        blocks = (
+            (((row, min(row + step, height)), (0, width)), source[..., row : row + step, :])
+            for row in range(0, height, step)
+        )
+    else:
+        blocks = source
+    for window, block in blocks:
+        (row_start, row_stop), (col_start, col_stop) = _window_bounds(window)
+        if row_start % factor or col_start % factor:
+            raise ValueError(f"window {window} is not aligned to the aggregation factor {factor}")
+        out = _aggregate_block(np.asarray(block), factor, method, nodata, min_valid)
+        yield ((row_start // factor, row_stop // factor), (col_start // factor, col_stop // factor)), out
@@ -0,0 +1,243 @@
+"""
+批量点坐标转换命令行工具
+
+按固定行数分块流式读取 CSV/Parquet/标准输入, 在 GCS(经纬度), PCS(正弦投影坐标), ICSTile(图块号及行列号)之间
+做向量化转换, 可选多进程并行, 每块转换完成后立即按输入顺序追加写出, 内存占用只与块大小和并行数有关.
+
+modis-tile-convert stations.csv tagged.csv --from gcs --to tile --grid 500m
+cat points.csv | modis-tile-convert - - --from pcs --to gcs
+"""
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.grid import GRIDS, Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+
+__all__ = ["COLUMNS", "convert_points", "convert_file", "main"]
+
+# 各坐标系的默认列名
+COLUMNS = {
+    "gcs": ["lat", "lon"],
+    "pcs": ["x", "y"],
+    "tile": ["vertical_tile", "horizontal_tile", "line", "sample"],
+}
+
+# 图块编码 h * 18 + v 到 "hXXvYY" 的查找表, 最后一项对应无效点
+_HV_NAMES = np.array([f"h{h:02d}v{v:02d}" for h in range(36) for v in range(18)] + [""], dtype=object)
+
+
+def convert_points(values: List[np.ndarray], src: str, dst: str, grid: Union[str, Grid] = "1km") -> List[np.ndarray]:
+    """
+    向量化坐标转换, 超出范围的点结果为NaN(图块号为-1)
+    :param values: 源坐标系各列数组, 顺序同 COLUMNS[src]
+    :param src: 源坐标系, "gcs", "pcs" 或 "tile"
+    :param dst: 目标坐标系, "gcs", "pcs" 或 "tile"
+    :param grid: 图块网格名称或 Grid 对象
+    :return: 目标坐标系各列数组, 顺序同 COLUMNS[dst]
+    """
+    if src not in COLUMNS or dst not in COLUMNS:
+        raise ValueError(f"src({src}) and dst({dst}) should be in {list(COLUMNS)}")
+    grid = get_grid(grid)
+    values = [np.asarray(value, dtype=float) for value in values]
+    if src == dst:
+        return values
+    # 先统一转换到经纬度, 再转换到目标坐标系
+    if src == "gcs":
+        lat, lon = values
+    elif src == "pcs":
+        lat, lon = Sinusoidal.PCS2GCS(*values)
+    else:
+        lat, lon = Sinusoidal.ICSTile2GCS(*values, grid=grid)
+    if dst == "gcs":
+        return [np.asarray(lat), np.asarray(lon)]
+    if dst == "pcs":
+        return [np.asarray(value) for value in Sinusoidal.GCS2PCS(lat, lon)]
+    # PCS2GCS/ICSTile2GCS 的无效结果为NaN, 由 GCS2ICSTile 统一置为-1/NaN
+    return [np.asarray(value) for value in Sinusoidal.GCS2ICSTile(lat, lon, grid)]
+
+
+def _convert_chunk(task: tuple) -> List[np.ndarray]:
+    """在工作进程中转换一个块"""
+    values, src, dst, grid = task
+    return convert_points(values, src, dst, grid)
+
+
+def _input_format(path: str, fmt: str = None) -> str:
+    if fmt:
+        return fmt
+    return "parquet" if path != "-" and path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def _read_chunks(path: str, fmt: str, chunk_size: int, columns: List[str] = None) -> Iterator:
+    """按块读取输入, 产出 pandas.DataFrame"""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    import pandas as pd
+
+    source = sys.stdin if path == "-" else path
+    yield from pd.read_csv(source, chunksize=chunk_size, usecols=columns)
+
+
+class _Writer:
+    """增量写出 CSV(可为标准输出) 或 Parquet, 首块确定表结构"""
+
+    def __init__(self, path: str, fmt: str, float_format: str = None):
+        self.path = path
+        self.fmt = fmt
+        self.float_format = float_format
+        self._parquet = None
+        self._csv = None
+
+    def write(self, frame):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+            return
+        header = self._csv is None
+        if self._csv is None:
+            self._csv = sys.stdout if self.path == "-" else open(self.path, "w", newline="", encoding="utf-8")
+        frame.to_csv(self._csv, header=header, index=False, float_format=self.float_format)
+        self._csv.flush()
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._csv is not None and self._csv is not sys.stdout:
+            self._csv.close()
+
+
+def convert_file(
+    input_path: str,
+    output_path: str,
+    src: str = "gcs",
+    dst: str = "tile",
+    grid: Union[str, Grid] = "1km",
+    input_columns: List[str] = None,
+    output_columns: List[str] = None,
+    keep_columns: bool = True,
+    chunk_size: int = 1_000_000,
+    workers: int = 1,
+    input_format: str = None,
+    output_format: str = None,
+    hv_column: str = None,
+    float_format: str = None,
+) -> int:
+    """
+    分块转换文件中的点坐标并增量写出
+    :param input_path: 输入路径, "-" 表示标准输入(CSV)
+    :param output_path: 输出路径, "-" 表示标准输出(CSV)
+    :param src: 源坐标系, "gcs", "pcs" 或 "tile"
+    :param dst: 目标坐标系, "gcs", "pcs" 或 "tile"
+    :param grid: 图块网格
+    :param input_columns: 输入中源坐标的列名, 默认 COLUMNS[src]
+    :param output_columns: 输出的目标坐标列名, 默认 COLUMNS[dst]
+    :param keep_columns: 是否保留输入的全部列, 否则只输出目标坐标列
+    :param chunk_size: 每块行数
+    :param workers: 并行进程数, 为1时在当前进程中转换
+    :param input_format: "csv" 或 "parquet", 默认按扩展名判断
+    :param output_format: "csv" 或 "parquet", 默认按扩展名判断
+    :param hv_column: 目标为 tile 时额外输出 "hXXvYY" 字符串列的列名
+    :param float_format: CSV 浮点数格式, 如 "%.6f"
+    :return: 处理的行数
+    """
+    input_columns = list(input_columns or COLUMNS[src])
+    output_columns = list(output_columns or COLUMNS[dst])
+    if len(input_columns) != len(COLUMNS[src]) or len(output_columns) != len(COLUMNS[dst]):
+        raise ValueError(f"{src} needs {len(COLUMNS[src])} input columns, {dst} needs {len(COLUMNS[dst])} output columns")
+    chunks = _read_chunks(
+        input_path, _input_format(input_path, input_format), chunk_size, None if keep_columns else input_columns
+    )
+    writer = _Writer(output_path, _input_format(output_path, output_format), float_format)
+
+    def finish(frame, result):
+        frame = frame if keep_columns else frame.iloc[:, :0]
+        frame = frame.assign(**dict(zip(output_columns, result)))
+        if dst == "tile":
+            vertical_tile, horizontal_tile = result[0], result[1]
+            frame[output_columns[0]] = vertical_tile.astype(np.int16)
+            frame[output_columns[1]] = horizontal_tile.astype(np.int16)
+            if hv_column:
+                # 按图块编码查表生成 "hXXvYY", 无效点为空字符串
+                code = np.where(vertical_tile < 0, _HV_NAMES.size - 1, horizontal_tile * 18 + vertical_tile)
+                frame[hv_column] = _HV_NAMES[code]
+        writer.write(frame)
+        return len(frame)
+
+    rows = 0
+    try:
+        if workers <= 1:
+            for frame in chunks:
+                result = convert_points([frame[c].to_numpy() for c in input_columns], src, dst, grid)
+                rows += finish(frame, result)
+            return rows
+        # 进行中的块数不超过 2 * workers, 按提交顺序写出, 保证输出行序与输入一致
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for frame in chunks:
+                task = ([frame[c].to_numpy() for c in input_columns], src, dst, grid)
+                pending.append((frame, executor.submit(_convert_chunk, task)))
+                if len(pending) >= 2 * workers:
+                    frame, future = pending.popleft()
+                    rows += finish(frame, future.result())
+            while pending:
+                frame, future = pending.popleft()
+                rows += finish(frame, future.result())
+        return rows
+    finally:
+        writer.close()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Convert points between GCS, PCS and MODIS tile coordinates in chunks")
+    parser.add_argument("input", help="Input CSV/Parquet path, '-' for CSV on stdin")
+    parser.add_argument("output", help="Output CSV/Parquet path, '-' for CSV on stdout")
+    parser.add_argument("--from", dest="src", default="gcs", choices=list(COLUMNS), help="Source coordinate system")
+    parser.add_argument("--to", dest="dst", default="tile", choices=list(COLUMNS), help="Target coordinate system")
+    parser.add_argument("--grid", default="1km", choices=list(GRIDS), help="Tile grid")
+    parser.add_argument("--input-columns", default=None, help="Comma separated source columns, e.g. 'latitude,longitude'")
+    parser.add_argument("--output-columns", default=None, help="Comma separated target columns")
+    parser.add_argument("--only-output", action="store_true", help="Only write the converted columns")
+    parser.add_argument("--hv-column", default=None, help="Also write a 'hXXvYY' column with this name (--to tile)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes, 0 for all CPUs")
+    parser.add_argument("--input-format", default=None, choices=["csv", "parquet"], help="Default: by extension")
+    parser.add_argument("--output-format", default=None, choices=["csv", "parquet"], help="Default: by extension")
+    parser.add_argument("--float-format", default=None, help="CSV float format, e.g. '%%.6f'")
+    args = parser.parse_args(argv)
+    rows = convert_file(
+        args.input,
+        args.output,
+        src=args.src,
+        dst=args.dst,
+        grid=args.grid,
+        input_columns=args.input_columns.split(",") if args.input_columns else None,
+        output_columns=args.output_columns.split(",") if args.output_columns else None,
+        keep_columns=not args.only_output,
+        chunk_size=args.chunk_size,
+        workers=args.workers or os.cpu_count(),
+        input_format=args.input_format,
+        output_format=args.output_format,
+        hv_column=args.hv_column,
+        float_format=args.float_format,
+    )
+    print(f"{rows} rows converted", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
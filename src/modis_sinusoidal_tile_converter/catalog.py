@@ -0,0 +1,390 @@
+"""
+MODIS 数据文件目录索引
+
+MODIS 文件名包含产品名, 观测日期(及过境时间), 图块编号, 数据集版本与生产时间:
+    MOD09GA.A2021002.h09v07.061.2021012063102.hdf
+    MOD021KM.A2021002.0300.061.2021002154516.hdf
+扫描归档目录时只解析一次文件名, 各字段以整数列(产品编号, 日期天数, 图块编码 h * 18 + v 等)保存,
+以 .npy 文件存放在磁盘上并以内存映射方式读取; 再次扫描时只解析新增文件.
+查询在按日期排序的列上先二分查找日期范围, 再对产品, 图块等整数列做向量化比较, 百万级文件也只需几毫秒.
+
+>>> catalog = GranuleCatalog.open("~/.cache/modis_catalog")
+>>> catalog.scan("/data/MODIS")
+>>> rows = catalog.query("MOD09GA", tiles=tiles_in_polygon(province), start="2021-01-01", end="2021-12-31")
+>>> paths = catalog.paths(rows)
+"""
+import datetime
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.stats import instrument
+
+__all__ = ["GRANULE_PATTERN", "COLUMNS", "Granule", "parse_granule_name", "GranuleCatalog"]
+
+# 产品名.A年积日[.时分][.hXXvYY][.版本][.生产时间], 之后可以是扩展名或其他工具追加的后缀(如HEG输出)
+GRANULE_PATTERN = re.compile(
+    r"^(?P<product>[A-Za-z0-9_]+)\.A(?P<year>\d{4})(?P<doy>\d{3})"
+    r"(?:\.(?P<hhmm>\d{4}))?"
+    r"(?:\.[hH](?P<h>\d{2})[vV](?P<v>\d{2}))?"
+    r"(?:\.(?P<collection>\d{3}))?"
+    r"(?:\.(?P<production>\d{13}))?"
+    r"(?=[._]|$)"
+)
+
+# 列名及数据类型; 缺失的字段为-1
+COLUMNS = {
+    "product": np.int16,  # 在 products 中的下标
+    "date": np.int32,  # 观测日期, 1970-01-01 起的天数
+    "minute": np.int16,  # 过境时间, 当天的分钟数
+    "tile": np.int16,  # 图块编码 h * 18 + v
+    "collection": np.int16,  # 数据集版本, 如 61
+    "production": np.int64,  # 生产时间, 1970-01-01 起的秒数
+    "dir": np.int32,  # 所在目录在 dirs 中的下标
+}
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class Granule:
+    """
+    从文件名解析出的一个 MODIS 数据文件
+
+    product: 产品名, 如 "MOD09GA"
+    date: 观测日期 datetime.date
+    minute: 过境时间(当天的分钟数), 文件名中没有时为 None
+    h, v: 图块编号, 非图块产品(如 L2 条带数据)为 None
+    collection: 数据集版本, 如 61, 文件名中没有时为 None
+    production: 生产时间 datetime.datetime, 文件名中没有时为 None
+    path: 文件路径
+    """
+
+    __slots__ = ("product", "date", "minute", "h", "v", "collection", "production", "path")
+
+    def __init__(self, product, date, minute=None, h=None, v=None, collection=None, production=None, path=None):
+        self.product = product
+        self.date = date
+        self.minute = minute
+        self.h = h
+        self.v = v
+        self.collection = collection
+        self.production = production
+        self.path = path
+
+    @property
+    def hv(self) -> Optional[str]:
+        return None if self.h is None else f"h{self.h:02d}v{self.v:02d}"
+
+    @property
+    def tile(self) -> int:
+        """图块编码 h * 18 + v, 非图块产品为-1"""
+        return -1 if self.h is None else self.h * 18 + self.v
+
+    @property
+    def acquired(self) -> datetime.datetime:
+        """观测时间, 没有过境时间时为当天0时"""
+        return datetime.datetime.combine(self.date, datetime.time()) + datetime.timedelta(minutes=self.minute or 0)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if getattr(self, name) is not None)
+        return f"Granule({fields})"
+
+
+def parse_granule_name(name: str) -> Optional[Granule]:
+    """
+    解析 MODIS 文件名
+    :param name: 文件名或路径, 只解析文件名部分
+    :return: Granule, 不符合 MODIS 命名规则时为 None
+    """
+    match = GRANULE_PATTERN.match(os.path.basename(name))
+    if match is None:
+        return None
+    fields = match.groupdict()
+    year, doy = int(fields["year"]), int(fields["doy"])
+    if not 1 <= doy <= 366:
+        return None
+    date = datetime.date(year, 1, 1) + datetime.timedelta(days=doy - 1)
+    minute = None
+    if fields["hhmm"] is not None:
+        minute = int(fields["hhmm"][:2]) * 60 + int(fields["hhmm"][2:])
+    h = v = None
+    if fields["h"] is not None:
+        h, v = int(fields["h"]), int(fields["v"])
+        if h > 35 or v > 17:
+            return None
+    collection = None if fields["collection"] is None else int(fields["collection"])
+    production = None
+    if fields["production"] is not None:
+        try:
+            production = datetime.datetime.strptime(fields["production"], "%Y%j%H%M%S")
+        except ValueError:
+            pass
+    return Granule(fields["product"], date, minute, h, v, collection, production, name)
+
+
+def _to_days(value) -> int:
+    """日期(datetime.date, datetime64 或 "YYYY-MM-DD"/"YYYYDDD" 字符串)转换为1970-01-01起的天数"""
+    if isinstance(value, str) and len(value) == 7 and value.isdigit():
+        value = datetime.datetime.strptime(value, "%Y%j")
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+class GranuleCatalog:
+    """
+    MODIS 文件列式索引
+
+    每个文件一行, 各列见 COLUMNS, 行按 (date, product, tile, minute) 排序; products/dirs 为字符串表,
+    文件名保存在 names (bytes) 列中. 使用 open 创建或读取磁盘上的索引, scan 之后自动保存.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = None):
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir is not None else None
+        self.products: List[str] = []
+        self.dirs: List[str] = []
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.names = np.empty(0, dtype="S1")
+
+    @classmethod
+    def open(cls, cache_dir: Union[str, Path]) -> "GranuleCatalog":
+        """读取磁盘上的索引, 不存在时创建空索引; 各列以内存映射方式只读打开"""
+        catalog = cls(cache_dir)
+        meta_path = catalog.cache_dir / "catalog.json"
+        if not meta_path.exists():
+            return catalog
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        catalog.products = meta["products"]
+        catalog.dirs = meta["dirs"]
+        columns = {name: np.load(catalog.cache_dir / f"{name}.npy", mmap_mode="r") for name in COLUMNS}
+        names = np.load(catalog.cache_dir / "names.npy", mmap_mode="r")
+        if any(len(column) != meta["rows"] for column in columns.values()) or len(names) != meta["rows"]:
+            raise ValueError(f"catalog in {catalog.cache_dir} is inconsistent, rebuild it with clear() and scan()")
+        catalog.columns, catalog.names = columns, names
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def save(self):
+        """保存到 cache_dir, 每列先写入临时文件再替换, 最后写入元数据"""
+        if self.cache_dir is None:
+            raise ValueError("cache_dir is not set")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        arrays = dict(self.columns, names=self.names)
+        for name, array in arrays.items():
+            path = self.cache_dir / f"{name}.npy"
+            tmp = self.cache_dir / f"{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp, np.asarray(array))
+            os.replace(tmp, path)
+        meta = {"rows": len(self), "products": self.products, "dirs": self.dirs}
+        tmp = self.cache_dir / f"catalog.{os.getpid()}.tmp.json"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.cache_dir / "catalog.json")
+        # 替换后重新以内存映射方式打开
+        self.columns = {name: np.load(self.cache_dir / f"{name}.npy", mmap_mode="r") for name in COLUMNS}
+        self.names = np.load(self.cache_dir / "names.npy", mmap_mode="r")
+
+    def clear(self, disk: bool = True):
+        """清空索引, disk 为 True 时同时删除磁盘上的文件"""
+        self.products, self.dirs = [], []
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.names = np.empty(0, dtype="S1")
+        if disk and self.cache_dir is not None and self.cache_dir.exists():
+            for path in list(self.cache_dir.glob("*.npy")) + list(self.cache_dir.glob("catalog*.json")):
+                path.unlink()
+
+    @staticmethod
+    def _walk(roots: Iterable[Union[str, Path]], suffixes: Tuple[str, ...]):
+        """遍历目录, 产出 (目录, [文件名]), 文件名按扩展名过滤"""
+        stack = [os.path.abspath(os.path.expanduser(str(root))) for root in roots]
+        while stack:
+            directory = stack.pop()
+            names = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif not suffixes or entry.name.lower().endswith(suffixes):
+                            names.append(entry.name)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            yield directory, names
+
+    @instrument("catalog.scan")
+    def scan(
+        self,
+        roots: Union[str, Path, Sequence[Union[str, Path]]],
+        suffixes: Sequence[str] = (".hdf", ".h5", ".tif", ".tiff"),
+        prune: bool = False,
+        save: bool = True,
+    ) -> int:
+        """
+        扫描目录(含子目录), 只解析索引中还没有的文件
+        :param roots: 一个或多个根目录
+        :param suffixes: 只索引这些扩展名的文件(不区分大小写), 为空时不过滤
+        :param prune: 是否删除扫描到的目录中已不存在的文件
+        :param save: 扫描后是否保存到 cache_dir(设置了 cache_dir 时)
+        :return: 新增的文件数
+        """
+        if isinstance(roots, (str, Path)):
+            roots = [roots]
+        suffixes = tuple(s.lower() for s in suffixes)
+        dir_index = {d: i for i, d in enumerate(self.dirs)}
+        product_index = {p: i for i, p in enumerate(self.products)}
+        # 每个目录中已索引的文件名, 只对扫描到的目录构建
+        rows_by_dir = {}
+        if len(self):
+            order = np.argsort(self.columns["dir"], kind="stable")
+            bounds = np.searchsorted(self.columns["dir"][order], np.arange(len(self.dirs) + 1))
+            rows_by_dir = {i: order[bounds[i] : bounds[i + 1]] for i in range(len(self.dirs))}
+
+        new = {name: [] for name in COLUMNS}
+        new_names = []
+        removed = []
+        for directory, names in self._walk(roots, suffixes):
+            index = dir_index.get(directory)
+            known = set()
+            if index is not None:
+                rows = rows_by_dir.get(index, np.empty(0, dtype=np.intp))
+                indexed = [name.decode("utf-8", "surrogateescape") for name in self.names[rows].tolist()]
+                known = set(indexed)
+                if prune:
+                    present = set(names)
+                    removed.extend(row for row, name in zip(rows.tolist(), indexed) if name not in present)
+            for name in names:
+                if name in known:
+                    continue
+                granule = parse_granule_name(name)
+                if granule is None:
+                    continue
+                if index is None:
+                    index = dir_index[directory] = len(self.dirs)
+                    self.dirs.append(directory)
+                if granule.product not in product_index:
+                    product_index[granule.product] = len(self.products)
+                    self.products.append(granule.product)
+                new["product"].append(product_index[granule.product])
+                new["date"].append((granule.date - _EPOCH.date()).days)
+                new["minute"].append(-1 if granule.minute is None else granule.minute)
+                new["tile"].append(granule.tile)
+                new["collection"].append(-1 if granule.collection is None else granule.collection)
+                new["production"].append(
+                    -1 if granule.production is None else int((granule.production - _EPOCH).total_seconds())
+                )
+                new["dir"].append(index)
+                new_names.append(name.encode("utf-8", "surrogateescape"))
+
+        if prune and removed:
+            keep = np.ones(len(self), dtype=bool)
+            keep[removed] = False
+        else:
+            keep = slice(None)
+        if new_names or (prune and removed):
+            columns = {
+                name: np.concatenate([np.asarray(self.columns[name])[keep], np.array(new[name], dtype=dtype)])
+                for name, dtype in COLUMNS.items()
+            }
+            names = np.concatenate([np.asarray(self.names)[keep], np.array(new_names, dtype="S")])
+            order = np.lexsort((columns["minute"], columns["tile"], columns["product"], columns["date"]))
+            self.columns = {name: column[order] for name, column in columns.items()}
+            self.names = names[order]
+            if save and self.cache_dir is not None:
+                self.save()
+        return len(new_names)
+
+    @instrument("catalog.query")
+    def query(
+        self,
+        product: Union[str, Sequence[str]] = None,
+        tiles: Sequence[Union[str, Tuple[int, int]]] = None,
+        start=None,
+        end=None,
+        region=None,
+        crs=None,
+        collection: int = None,
+        latest: bool = False,
+    ) -> np.ndarray:
+        """
+        查询符合条件的文件
+        :param product: 产品名或产品名列表, 如 "MOD09GA"
+        :param tiles: 图块编号列表, 如 ["h26v05", (27, 5)], 超出范围的编号抛出 ValueError
+        :param start: 起始日期(含), datetime.date, datetime64, "YYYY-MM-DD" 或 "YYYYDDD"
+        :param end: 结束日期(含)
+        :param region: 与 tiles 取交集的区域, 多边形顶点数组, GeoJSON 或 shapely 几何, 见 query.tiles_in_polygon
+        :param crs: region 的坐标系, None 表示经纬度
+        :param collection: 数据集版本, 如 61
+        :param latest: 同一产品, 日期, 过境时间与图块有多个文件(重新处理)时只保留生产时间最新的一个
+        :return: 行号数组, 按日期排序, 可传给 paths / granules
+        """
+        date = self.columns["date"]
+        lo = 0 if start is None else int(np.searchsorted(date, _to_days(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(date, _to_days(end), side="right"))
+        keep = np.ones(max(hi - lo, 0), dtype=bool)
+        if product is not None:
+            products = [product] if isinstance(product, str) else list(product)
+            codes = [self.products.index(p) for p in products if p in self.products]
+            keep &= np.isin(self.columns["product"][lo:hi], codes)
+        if tiles is not None or region is not None:
+            # 按图块编码查表, 图块编码-1(非图块产品)落在末尾的False上; parse_hv 校验 h/v 范围, 不会写到末尾或越界
+            wanted = np.zeros(36 * 18 + 1, dtype=bool)
+            if tiles is not None:
+                for hv in tiles:
+                    h, v = Sinusoidal.parse_hv(hv)
+                    wanted[h * 18 + v] = True
+            if region is not None:
+                from modis_sinusoidal_tile_converter.query import tiles_in_polygon
+
+                in_region = np.zeros_like(wanted)
+                for hv in tiles_in_polygon(region, crs):
+                    h, v = Sinusoidal.parse_hv(hv)
+                    in_region[h * 18 + v] = True
+                wanted = wanted & in_region if tiles is not None else in_region
+            keep &= wanted[self.columns["tile"][lo:hi]]
+        if collection is not None:
+            keep &= self.columns["collection"][lo:hi] == collection
+        rows = np.flatnonzero(keep) + lo
+        if latest and rows.size:
+            # 按 (重复键, 生产时间) 排序, 每组取最后一个
+            keys = [self.columns[name][rows] for name in ("production", "tile", "minute", "date", "product")]
+            order = np.lexsort(keys)
+            sorted_keys = np.stack(keys[1:])[:, order]
+            last = np.ones(order.size, dtype=bool)
+            last[:-1] = np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)
+            rows = np.sort(rows[order[last]])
+        return rows
+
+    def paths(self, rows: np.ndarray = None) -> List[str]:
+        """行号对应的文件路径, 默认全部"""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        dirs = self.columns["dir"][rows].tolist()
+        names = self.names[rows].tolist()
+        return [os.path.join(self.dirs[d], n.decode("utf-8", "surrogateescape")) for d, n in zip(dirs, names)]
+
+    def granules(self, rows: np.ndarray = None) -> List[Granule]:
+        """行号对应的 Granule 列表, 默认全部"""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        values = {name: self.columns[name][rows].tolist() for name in COLUMNS}
+        out = []
+        for i, path in enumerate(self.paths(rows)):
+            tile = values["tile"][i]
+            minute, collection, production = values["minute"][i], values["collection"][i], values["production"][i]
+            out.append(
+                Granule(
+                    self.products[values["product"][i]],
+                    _EPOCH.date() + datetime.timedelta(days=values["date"][i]),
+                    None if minute < 0 else minute,
+                    None if tile < 0 else tile // 18,
+                    None if tile < 0 else tile % 18,
+                    None if collection < 0 else collection,
+                    None if production < 0 else _EPOCH + datetime.timedelta(seconds=production),
+                    path,
+                )
+            )
+        return out
@@ -1,18 +1,63 @@
-from typing import Tuple, Union
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Sequence, Tuple, Union
 
 import numpy as np
 import rasterio as rio
+from rasterio.windows import Window
 
 from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.stats import array_pixels, instrument, timer
 
 
+def _tile_profile(
+    hv: Union[str, Tuple[int, int]], grid: Union[str, Grid], count: int, height: int, width: int, default_dtype, **kwargs
+):
+    """构建图块写出参数, 可选参数未传入时使用默认值"""
+    profile = kwargs
+    profile.update({"compress": kwargs.get("compress", "lzw"), "nodata": kwargs.get("nodata", None)})
+    # 必要的profile信息
+    transform = Sinusoidal.get_tile_transform(hv, zoom=grid)
+    crs = Sinusoidal.get_tile_crs(hv)
+    profile.update(
+        {
+            "dtype": kwargs.get("dtype", default_dtype),
+            "count": count,
+            "width": width,
+            "height": height,
+            "crs": crs,
+            "transform": transform,
+        }
+    )
+    return profile
+
+
+@instrument("convert.array2tiff", items=array_pixels)
 def array2tiff(
     arr: np.ndarray,
     tiff_path: str,
     hv: Union[str, Tuple[int, int]],
-    grid: str = "1km",
+    grid: Union[str, Grid] = "1km",
+    cog: bool = False,
+    blocksize: int = 512,
+    overview_levels: Sequence[int] = None,
+    overview_resampling: str = "average",
     **kwargs,
 ):
+    """
+    将数组写出为MODIS正弦投影图块GeoTIFF
+    :param arr: 形状为 (H, W) 或 (bands, H, W) 的数组
+    :param tiff_path: 输出路径
+    :param hv: 图块编号
+    :param grid: 网格, "1km", "500m", "250m" 或 Grid 对象
+    :param cog: 是否输出云优化GeoTIFF(COG), 内部分块并包含概览层, 支持HTTP范围读取
+    :param blocksize: COG内部分块大小
+    :param overview_levels: COG概览层降采样倍数, 如 [2, 4, 8], 默认逐级减半直至小于一个分块
+    :param overview_resampling: COG概览层重采样方法, 见 rasterio.enums.Resampling
+    :param kwargs: 其他写出参数, 如 compress("lzw", "deflate", "zstd", "lerc"等), predictor, nodata;
+                   COG模式下 predictor 可为 True/2/3, lerc 压缩可通过 max_z_error 指定最大误差
+    """
     # 检查数组维度, 如果是2D数组则增加一个维度
     if len(arr.shape) == 2:
         arr = np.expand_dims(arr, axis=0)
@@ -20,30 +65,229 @@ def array2tiff(
         raise ValueError("Only support 2D or 3D array")
     # 获取数组的bands, height, width
     bands, height, width = arr.shape
-    # 可选的profile信息, 如果没有传入则使用默认值
-    profile = kwargs
-    profile.update({"compress": kwargs.get("compress", "lzw"), "nodata": kwargs.get("nodata", None)})
-    # 必要的profile信息
-    if grid == "1km":
-        zoom = 1000
-    elif grid == "500m":
-        zoom = 500
-    elif grid == "250m":
-        zoom = 250
+    if cog:
+        _array2cog(arr, tiff_path, hv, grid, blocksize, overview_levels, overview_resampling, **kwargs)
+        return
+    profile = _tile_profile(hv, grid, bands, height, width, arr.dtype, **kwargs)
+    # 写入tiff文件, 分别统计写入(含分块压缩)与关闭(剩余块压缩及落盘)耗时
+    ds = rio.open(tiff_path, "w", **profile)
+    try:
+        with timer("convert.array2tiff.write", items=arr.size):
+            ds.write(arr)
+    finally:
+        with timer("convert.array2tiff.close"):
+            ds.close()
+
+
+def _array2cog(
+    arr: np.ndarray,
+    tiff_path: str,
+    hv: Union[str, Tuple[int, int]],
+    grid: Union[str, Grid],
+    blocksize: int,
+    overview_levels: Sequence[int],
+    overview_resampling: str,
+    **kwargs,
+):
+    """
+    写出云优化GeoTIFF: 在内存中写入数据并构建概览层, 再由GDAL COG驱动一次性整理为COG布局
+    """
+    from rasterio.enums import Resampling
+    from rasterio.io import MemoryFile
+    from rasterio.shutil import copy
+
+    bands, height, width = arr.shape
+    compress = str(kwargs.pop("compress", "deflate")).upper()
+    predictor = kwargs.pop("predictor", None)
+    max_z_error = kwargs.pop("max_z_error", None)
+    profile = _tile_profile(hv, grid, bands, height, width, arr.dtype, compress=None, **kwargs)
+    profile.update({"driver": "GTiff", "tiled": True, "blockxsize": blocksize, "blockysize": blocksize})
+    if overview_levels is None:
+        overview_levels = []
+        factor = 2
+        while max(height, width) / factor >= blocksize / 2:
+            overview_levels.append(factor)
+            factor *= 2
+    creation_options = {"BLOCKSIZE": blocksize, "COMPRESS": compress, "OVERVIEWS": "FORCE_USE_EXISTING"}
+    if predictor is not None:
+        creation_options["PREDICTOR"] = {True: "YES", False: "NO", 2: "STANDARD", 3: "FLOATING_POINT"}.get(
+            predictor, predictor
+        )
+    if max_z_error is not None:
+        creation_options["MAX_Z_ERROR"] = max_z_error
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as ds:
+            with timer("convert.array2tiff.write", items=arr.size):
+                ds.write(arr)
+            if overview_levels:
+                with timer("convert.array2tiff.overviews"):
+                    ds.build_overviews(list(overview_levels), Resampling[overview_resampling])
+        with memfile.open() as ds, timer("convert.array2tiff.cog_copy"):
+            copy(ds, tiff_path, driver="COG", **creation_options)
+
+
+def _release_memmap_pages(arr):
+    """
+    释放np.memmap已读取的页面, 避免整个文件逐渐驻留内存
+    仅用于只读/共享映射, 写时复制(mode="c")映射释放页面会丢失修改, 跳过
+    """
+    mm = getattr(arr, "_mmap", None)
+    if mm is None or not hasattr(mm, "madvise") or getattr(arr, "mode", None) == "c":
+        return
+    import mmap
+
+    if hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED)
+
+
+def _iter_array_blocks(arr, block_size: int) -> Iterator[Tuple[Window, np.ndarray]]:
+    """按块遍历支持切片的数组对象(np.ndarray, np.memmap, dask数组等), 每次只取出一个块"""
+    height, width = arr.shape[-2:]
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            rows = slice(row, min(row + block_size, height))
+            cols = slice(col, min(col + block_size, width))
+            block = arr[..., rows, cols]
+            # dask等惰性数组在此处才真正计算
+            block = block.compute() if hasattr(block, "compute") else np.array(block)
+            yield Window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start), block
+        if isinstance(arr, np.memmap):
+            _release_memmap_pages(arr)
+
+
+def _as_window(window) -> Window:
+    """支持 Window 或 ((row_start, row_stop), (col_start, col_stop))"""
+    if isinstance(window, Window):
+        return window
+    return Window.from_slices(*window)
+
+
+@instrument("convert.array2tiff_blocks", items=array_pixels)
+def array2tiff_blocks(
+    source: Union[np.ndarray, Iterable[Tuple[Window, np.ndarray]]],
+    tiff_path: str,
+    hv: Union[str, Tuple[int, int]],
+    grid: Union[str, Grid] = "1km",
+    count: int = None,
+    dtype=None,
+    block_size: int = 512,
+    cache_max_mb: int = 64,
+    **kwargs,
+):
+    """
+    按块流式写出图块GeoTIFF, 峰值内存约为一行块(block_size 行)的数据, 不随整幅数组大小增长
+    输出为内部分块(tiled)的GeoTIFF, 块大小为 block_size; np.memmap 输入每写完一行块即释放已读取的页面
+
+    :param source: 形状为 (H, W) 或 (bands, H, W) 的可切片数组对象(np.memmap, dask数组等),
+                   或 (window, block) 迭代器, window 为 rasterio Window 或 ((row_start, row_stop), (col_start, col_stop)),
+                   block 形状为 (h, w) 或 (bands, h, w)
+    :param tiff_path: 输出路径
+    :param hv: 图块编号
+    :param grid: 网格, "1km", "500m", "250m" 或 Grid 对象
+    :param count: 波段数, source 为迭代器时必须提供
+    :param dtype: 数据类型, source 为迭代器时必须提供
+    :param block_size: 内部分块大小, 须为16的倍数
+    :param cache_max_mb: GDAL块缓存上限(MB), 限制写出过程中的缓存占用
+    :param kwargs: 其他写出参数, 如 compress, nodata
+    """
+    if block_size % 16 != 0:
+        raise ValueError(f"block_size({block_size}) should be a multiple of 16")
+    if hasattr(source, "shape") and hasattr(source, "__getitem__"):
+        if len(source.shape) not in (2, 3):
+            raise ValueError("Only support 2D or 3D array")
+        height, width = source.shape[-2:]
+        count = source.shape[0] if len(source.shape) == 3 else 1
+        dtype = dtype or source.dtype
+        blocks = _iter_array_blocks(source, block_size)
     else:
-        raise ValueError(f"Invalid grid {grid}, should be in range of [1km, 500m, 250m]")
-    transform = Sinusoidal.get_tile_transform(hv, zoom=zoom)
-    crs = Sinusoidal.get_tile_crs(hv)
-    profile.update(
-        {
-            "dtype": kwargs.get("dtype", arr.dtype),
-            "count": bands,
-            "width": width,
-            "height": height,
-            "crs": crs,
-            "transform": transform,
-        }
-    )
-    # 写入tiff文件
-    with rio.open(tiff_path, "w", **profile) as ds:
-        ds.write(arr)
+        if count is None or dtype is None:
+            raise ValueError("count and dtype are required when source is an iterator of (window, block)")
+        height = width = get_grid(grid).pixels_per_tile
+        blocks = source
+    kwargs.update({"tiled": True, "blockxsize": block_size, "blockysize": block_size})
+    profile = _tile_profile(hv, grid, count, height, width, dtype, **kwargs)
+    with rio.Env(GDAL_CACHEMAX=cache_max_mb), rio.open(tiff_path, "w", **profile) as ds:
+        for window, block in blocks:
+            if block.ndim == 2:
+                block = block[np.newaxis]
+            with timer("convert.array2tiff_blocks.write", items=block.size):
+                ds.write(block, window=_as_window(window))
+
+
+def _write_tile(arr: np.ndarray, tiff_path: str, hv: str, grid: Grid, kwargs: dict) -> str:
+    """在工作线程中写出一个图块, 失败时删除不完整的文件"""
+    try:
+        array2tiff(arr, tiff_path, hv, grid=grid, **kwargs)
+    except BaseException:
+        if os.path.exists(tiff_path):
+            os.remove(tiff_path)
+        raise
+    return tiff_path
+
+
+@instrument("convert.array2tiff_batch")
+def array2tiff_batch(
+    items: Iterable[Tuple[Union[str, Tuple[int, int]], np.ndarray]],
+    path_template: str,
+    grid: Union[str, Grid] = "1km",
+    max_workers: int = 4,
+    max_pending: int = None,
+    **kwargs,
+) -> Tuple[Dict[str, str], Dict[str, Exception]]:
+    """
+    并发写出多个图块GeoTIFF
+    由线程池同时压缩和写盘(GDAL在此期间释放GIL); items 在当前线程中依次取出, 进行中的图块数不超过 max_pending,
+    生成器按需计算数组时内存占用只与 max_pending 有关. 单个图块失败不影响其余图块.
+
+    >>> written, failed = array2tiff_batch(((hv, compute(hv)) for hv in hvs), "/data/NDVI.{hv}.tif", compress="zstd")
+
+    :param items: (hv, arr) 的可迭代对象, arr 同 array2tiff
+    :param path_template: 输出路径模板, 可用字段 {hv}, {h}, {v}, {grid}
+    :param grid: 网格, "1km", "500m", "250m" 或 Grid 对象
+    :param max_workers: 并行线程数
+    :param max_pending: 同时持有的最大图块数(含排队与写出中), 默认 2 * max_workers
+    :param kwargs: 传递给 array2tiff 的其他参数, 如 cog, compress, nodata
+    :return: (written, failed), written 为 {hv: 输出路径}, failed 为 {hv: 异常};
+             无法解析的图块编号以 str(原值) 作为键; 与已提交图块输出路径相同的重复图块不写出, 记入 failed
+    """
+    grid = get_grid(grid)
+    max_pending = max_pending or 2 * max_workers
+    written, failed = {}, {}
+    directories = set()
+    paths = {}
+
+    def collect(done):
+        for future in done:
+            hv = pending.pop(future)
+            try:
+                written[hv] = future.result()
+            except Exception as e:
+                failed[hv] = e
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for hv, arr in items:
+            # 图块编号或输出目录有误时只记录该图块失败
+            try:
+                h, v = Sinusoidal.parse_hv(hv)
+                hv = f"h{h:02d}v{v:02d}"
+                tiff_path = path_template.format(hv=hv, h=h, v=v, grid=grid.name)
+                # 同一文件被两个线程同时写出会损坏, 重复的图块只保留第一个
+                if tiff_path in paths:
+                    raise ValueError(f"{hv} is duplicated, {tiff_path} is already written by {paths[tiff_path]}")
+                directory = os.path.dirname(tiff_path)
+                if directory and directory not in directories:
+                    os.makedirs(directory, exist_ok=True)
+                    directories.add(directory)
+            except Exception as e:
+                failed[hv if isinstance(hv, str) else str(hv)] = e
+                continue
+            paths[tiff_path] = hv
+            # 达到上限时等待任一图块写完再继续取数据
+            while len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(_write_tile, arr, tiff_path, hv, grid, kwargs)] = hv
+            del arr
+        collect(wait(pending).done)
+    return written, failed
@@ -0,0 +1,191 @@
+"""
+图块逐像元地理定位数组
+
+MODIS正弦投影图块中每个像元中心的纬度只与行号有关, 投影坐标 x/y 分别只与列号/行号有关,
+因此整块的经纬度(或投影坐标)可由一维的行/列坐标广播一次算出, 无需逐像元调用 Sinusoidal.ICSTile2GCS.
+GeolocationCache 按 (hv, grid, kind, dtype) 将结果保存为磁盘上的 .npy 文件, 之后以内存映射方式零拷贝读取.
+
+>>> lat, lon = tile_geolocation("h26v05", "500m", dtype="float32")
+>>> cache = GeolocationCache("~/.cache/modis_geolocation")
+>>> lat, lon = cache.get("h26v05", "250m")
+"""
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.stats import instrument
+
+__all__ = ["KINDS", "tile_geolocation", "iter_tile_geolocation", "GeolocationCache"]
+
+# gcs: (lat, lon) 经纬度; pcs: (x, y) 正弦投影坐标
+KINDS = ("gcs", "pcs")
+
+
+def _check_args(kind: str, dtype) -> np.dtype:
+    if kind not in KINDS:
+        raise ValueError(f"kind({kind}) should be in {list(KINDS)}")
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype({dtype}) should be in ['float32', 'float64']")
+    return dtype
+
+
+def _compute_rows(hv, grid: Grid, kind: str, start: int, stop: int, dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """计算图块第 start~stop 行的地理定位数组, 先以float64计算再转换为目标类型"""
+    h, v = Sinusoidal.parse_hv(hv)
+    pixels = grid.pixels_per_tile
+    line = np.arange(start, stop, dtype=float)[:, None]
+    sample = np.arange(pixels, dtype=float)[None, :]
+    if kind == "pcs":
+        ulx, uly, _, _ = Sinusoidal.get_tile_bounds((h, v))
+        x = ulx + (sample + 0.5) * grid.pixel_size
+        y = uly - (line + 0.5) * grid.pixel_size
+        shape = (stop - start, pixels)
+        return np.broadcast_to(x, shape).astype(dtype), np.broadcast_to(y, shape).astype(dtype)
+    # 与 ICSTile2ICSGeo/ICSGeo2GCS 相同的公式: 纬度只与行号有关, 经度为 lon_tile / cos(lat)
+    ppd = grid.pixels_per_degree
+    lat = 90 - v * 10 - (line + 0.5) / ppd
+    lon_tile = -180 + h * 10 + (sample + 0.5) / ppd
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lon = lon_tile / np.cos(np.radians(lat))
+    # 投影有效区域(地球)外的像元经度超出±180, 置为NaN
+    outside = ~(np.abs(lon) <= 180)
+    lat = np.broadcast_to(lat, lon.shape).astype(dtype)
+    lon = lon.astype(dtype, copy=False)
+    lat[outside] = np.nan
+    lon[outside] = np.nan
+    return lat, lon
+
+
+def iter_tile_geolocation(
+    hv: Union[str, Tuple[int, int]],
+    grid: Union[str, Grid] = "1km",
+    kind: str = "gcs",
+    dtype="float64",
+    chunk_rows: int = 512,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    按行分块计算图块的地理定位数组, 内存占用只与块大小有关
+    :param hv: 图块编号
+    :param grid: 网格名称或 Grid 对象
+    :param kind: "gcs" 产出 (lat, lon), "pcs" 产出 (x, y)
+    :param dtype: "float64" 或 "float32"
+    :param chunk_rows: 每块行数
+    :return: 迭代产出 (起始行号, 数组1, 数组2), 数组形状为 (块行数, 图块边长)
+    """
+    grid = get_grid(grid)
+    dtype = _check_args(kind, dtype)
+    pixels = grid.pixels_per_tile
+    for start in range(0, pixels, chunk_rows):
+        stop = min(start + chunk_rows, pixels)
+        yield (start,) + _compute_rows(hv, grid, kind, start, stop, dtype)
+
+
+@instrument("geolocation.tile_geolocation")
+def tile_geolocation(
+    hv: Union[str, Tuple[int, int]],
+    grid: Union[str, Grid] = "1km",
+    kind: str = "gcs",
+    dtype="float64",
+    rows: Tuple[int, int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算图块每个像元中心的经纬度或投影坐标, 结果与逐像元调用 ICSTile2GCS 一致;
+    gcs 结果中位于投影有效区域外的像元为NaN
+    :param hv: 图块编号
+    :param grid: 网格名称或 Grid 对象
+    :param kind: "gcs" 返回 (lat, lon), "pcs" 返回 (x, y)
+    :param dtype: "float64" 或 "float32"
+    :param rows: (起始行, 结束行), 只计算其中的行, 默认整个图块
+    :return: 两个形状为 (行数, 图块边长) 的数组
+    """
+    grid = get_grid(grid)
+    dtype = _check_args(kind, dtype)
+    start, stop = rows if rows is not None else (0, grid.pixels_per_tile)
+    if not 0 <= start <= stop <= grid.pixels_per_tile:
+        raise ValueError(f"rows({rows}) should be in range of [0, {grid.pixels_per_tile}]")
+    return _compute_rows(hv, grid, kind, start, stop, dtype)
+
+
+class GeolocationCache:
+    """
+    地理定位数组的两级缓存: 内存LRU + 磁盘上可内存映射的 .npy 文件
+    每个 (hv, grid, kind, dtype) 对应一个形状为 (2, N, N) 的文件, 按行分块写入, 250m图块也不需要一次性占用整块内存
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, maxsize: int = 16, chunk_rows: int = 512):
+        """
+        :param cache_dir: 磁盘缓存目录, 为None时仅使用内存缓存
+        :param maxsize: 内存中最多保留的图块个数, 超出时淘汰最久未用的
+        :param chunk_rows: 计算时每块行数
+        """
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir is not None else None
+        self.maxsize = maxsize
+        self.chunk_rows = chunk_rows
+        self._memory = OrderedDict()
+
+    @staticmethod
+    def _key(hv, grid: Grid, kind: str, dtype: np.dtype) -> str:
+        hv = "h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv))
+        return f"{hv}.{grid.name}.{kind}.{dtype.name}"
+
+    def _compute(self, hv, grid: Grid, kind: str, dtype: np.dtype) -> np.ndarray:
+        pixels = grid.pixels_per_tile
+        if self.cache_dir is None:
+            arr = np.empty((2, pixels, pixels), dtype=dtype)
+        else:
+            # 先写临时文件再改名, 多进程同时计算同一图块时不会读到不完整的文件
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{self._key(hv, grid, kind, dtype)}.{os.getpid()}.tmp.npy"
+            arr = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(2, pixels, pixels))
+        for start, first, second in iter_tile_geolocation(hv, grid, kind, dtype, self.chunk_rows):
+            arr[0, start : start + len(first)] = first
+            arr[1, start : start + len(second)] = second
+        if self.cache_dir is None:
+            return arr
+        arr.flush()
+        del arr
+        path = self.cache_dir / f"{self._key(hv, grid, kind, dtype)}.npy"
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode="r")
+
+    def get(
+        self,
+        hv: Union[str, Tuple[int, int]],
+        grid: Union[str, Grid] = "1km",
+        kind: str = "gcs",
+        dtype="float64",
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        获取图块的地理定位数组, 依次查找内存缓存, 磁盘缓存, 均未命中时计算并写入缓存
+        使用磁盘缓存时返回只读的内存映射数组
+        :return: gcs 为 (lat, lon), pcs 为 (x, y)
+        """
+        grid = get_grid(grid)
+        dtype = _check_args(kind, dtype)
+        key = self._key(hv, grid, kind, dtype)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            arr = self._memory[key]
+            return arr[0], arr[1]
+        arr = None
+        if self.cache_dir is not None and (self.cache_dir / f"{key}.npy").exists():
+            arr = np.load(self.cache_dir / f"{key}.npy", mmap_mode="r")
+        if arr is None:
+            arr = self._compute(hv, grid, kind, dtype)
+        self._memory[key] = arr
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return arr[0], arr[1]
+
+    def clear(self, disk: bool = False):
+        """清空内存缓存, disk为True时同时删除磁盘缓存文件"""
+        self._memory.clear()
+        if disk and self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("h??v??.*.npy"):
+                path.unlink()
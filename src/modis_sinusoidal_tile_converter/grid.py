@@ -0,0 +1,56 @@
+from typing import Union
+
+__all__ = ["Grid", "GRID_1KM", "GRID_500M", "GRID_250M", "GRIDS", "get_grid"]
+
+
+class Grid:
+    """
+    MODIS正弦投影网格描述, 包含逐点计算所需的全部常量
+    各API的 grid 参数可传入网格名称或 Grid 对象, 在每次调用的入口处解析一次, 之后的计算不再按字符串分支
+
+    name: 网格名称, "1km", "500m" 或 "250m"
+    nominal_size: 像元名义大小(米), 1000, 500 或 250
+    pixel_size: 像元实际大小(米)
+    pixels_per_tile: 图块边长像素数
+    pixels_per_degree: ICSGeo空间中每度对应的像素数(图块为10度)
+    last_index: 图块最后一个像元的中心行列号, 图块外边缘为 last_index + 0.5
+    """
+
+    __slots__ = ("name", "nominal_size", "pixel_size", "pixels_per_tile", "pixels_per_degree", "last_index")
+
+    def __init__(self, name: str, nominal_size: int, pixel_size: float, pixels_per_tile: int):
+        self.name = name
+        self.nominal_size = nominal_size
+        self.pixel_size = pixel_size
+        self.pixels_per_tile = pixels_per_tile
+        self.pixels_per_degree = pixels_per_tile // 10
+        self.last_index = pixels_per_tile - 0.5
+
+    def __repr__(self):
+        return f"Grid({self.name!r}, pixel_size={self.pixel_size}, pixels_per_tile={self.pixels_per_tile})"
+
+    def __reduce__(self):
+        # 进程间传递时还原为同一个模块级实例
+        return get_grid, (self.name,)
+
+
+GRID_1KM = Grid("1km", 1000, 926.625433055833, 1200)
+GRID_500M = Grid("500m", 500, 463.312716527917, 2400)
+GRID_250M = Grid("250m", 250, 231.656358263958, 4800)
+
+GRIDS = {grid.name: grid for grid in (GRID_1KM, GRID_500M, GRID_250M)}
+# 兼容以像元名义大小(如 get_tile_transform 的 zoom 参数)指定网格
+_GRIDS_BY_KEY = {**GRIDS, **{grid.nominal_size: grid for grid in GRIDS.values()}}
+
+
+def get_grid(grid: Union[str, int, Grid] = "1km") -> Grid:
+    """
+    解析网格
+    :param grid: 网格名称("1km", "500m", "250m"), 像元名义大小(1000, 500, 250)或 Grid 对象
+    """
+    if isinstance(grid, Grid):
+        return grid
+    try:
+        return _GRIDS_BY_KEY[grid]
+    except (KeyError, TypeError):
+        raise ValueError(f"grid({grid}) should be in ['1km', '500m', '250m']") from None
@@ -0,0 +1,166 @@
+"""
+带邻域边缘(halo)的图块读取
+
+滤波, 填补缺失值, 纹理特征等需要图块边缘外的若干像元, 否则图块边缘会出现伪影.
+本模块只读取中心图块及最多8个相邻图块中与之相接的边缘窗口, 拼成 (N + 2 * halo) 的数组,
+每个图块可独立并行处理, 无需先拼接全球镶嵌.
+
+>>> data = read_tile_with_halo("h26v05", "/data/NDVI.{hv}.tif", halo=3)
+>>> smoothed = apply_with_halo(lambda a: uniform_filter(a, 7), hvs, "/data/NDVI.{hv}.tif", halo=3, max_workers=8)
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.tile_table import get_tile_table
+
+__all__ = ["OFFSETS", "tile_neighbors", "read_tile_with_halo", "crop_halo", "apply_with_halo"]
+
+# 8个相邻方向的 (dv, dh), dv 向南为正, dh 向东为正
+OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def tile_neighbors(hv: Union[str, Tuple[int, int]], land_only: bool = True) -> Dict[Tuple[int, int], Optional[str]]:
+    """
+    获取图块的8个相邻图块
+    相邻关系按正弦投影平面计算: 正弦投影中180度经线两侧的像元并不相接(除赤道附近外相距很远),
+    因此 h00 的西侧与 h35 的东侧不环绕, 视为无相邻图块; 垂直方向在南北极处同样无相邻图块
+    :param hv: 图块编号
+    :param land_only: 不在 MODIS_SINUSOIDAL_TILE_USED 中的(海洋)图块视为不存在
+    :return: {(dv, dh): hv 或 None}, 键见 OFFSETS
+    """
+    h, v = Sinusoidal.parse_hv(hv)
+    is_land = get_tile_table().is_land
+    neighbors = {}
+    for dv, dh in OFFSETS:
+        nv, nh = v + dv, h + dh
+        if not (0 <= nv < 18 and 0 <= nh < 36) or (land_only and not is_land[nv, nh]):
+            neighbors[(dv, dh)] = None
+        else:
+            neighbors[(dv, dh)] = f"h{nh:02d}v{nv:02d}"
+    return neighbors
+
+
+def _edge_slices(offset: int, halo: int, pixels: int) -> Tuple[slice, slice]:
+    """
+    一个方向上相邻图块的读取范围与在输出数组中的位置
+    :return: (源图块中的切片, 输出数组中的切片)
+    """
+    if offset < 0:
+        return slice(pixels - halo, pixels), slice(0, halo)
+    if offset > 0:
+        return slice(0, halo), slice(halo + pixels, 2 * halo + pixels)
+    return slice(0, pixels), slice(halo, halo + pixels)
+
+
+def read_tile_with_halo(
+    hv: Union[str, Tuple[int, int]],
+    path_template: str,
+    halo: int,
+    grid: Union[str, Grid] = "1km",
+    bands: Sequence[int] = None,
+    fill_value=None,
+    land_only: bool = True,
+) -> np.ndarray:
+    """
+    读取图块及其四周 halo 个像元, 相邻图块只读取相接的边缘窗口
+    :param hv: 图块编号
+    :param path_template: 图块文件路径模板, 可用字段 {hv}, {h}, {v}, {grid}
+    :param halo: 边缘宽度(像元), 不超过图块边长
+    :param grid: 网格名称或 Grid 对象
+    :param bands: 波段号(从1开始), 默认全部波段
+    :param fill_value: 缺失的相邻图块(海洋, 极区或文件不存在)的填充值, 默认使用文件的 nodata, 未设置时浮点为NaN, 整数为0
+    :param land_only: 不在 MODIS_SINUSOIDAL_TILE_USED 中的相邻图块视为缺失, 不尝试打开
+    :return: 单波段为 (N + 2 * halo, N + 2 * halo), 多波段为 (bands, N + 2 * halo, N + 2 * halo)
+    """
+    import rasterio as rio
+    from rasterio.windows import Window
+
+    grid = get_grid(grid)
+    pixels = grid.pixels_per_tile
+    if not 0 <= halo <= pixels:
+        raise ValueError(f"halo({halo}) should be in range of [0, {pixels}]")
+    h, v = Sinusoidal.parse_hv(hv)
+
+    def tile_path(h, v):
+        return path_template.format(hv=f"h{h:02d}v{v:02d}", h=h, v=v, grid=grid.name)
+
+    size = pixels + 2 * halo
+    with rio.open(tile_path(h, v)) as ds:
+        if ds.width != pixels or ds.height != pixels:
+            raise ValueError(f"{ds.name} has shape ({ds.height}, {ds.width}), expected ({pixels}, {pixels})")
+        bands = list(bands) if bands else list(range(1, ds.count + 1))
+        dtype = np.dtype(ds.dtypes[bands[0] - 1])
+        if fill_value is None:
+            fill_value = ds.nodata if ds.nodata is not None else (np.nan if dtype.kind == "f" else 0)
+        out = np.full((len(bands), size, size), fill_value, dtype=dtype)
+        ds.read(bands, out=out[:, halo : halo + pixels, halo : halo + pixels])
+
+    if halo > 0:
+        for (dv, dh), neighbor in tile_neighbors((h, v), land_only).items():
+            if neighbor is None:
+                continue
+            path = tile_path(*Sinusoidal.parse_hv(neighbor))
+            if not os.path.exists(path):
+                continue
+            src_rows, dst_rows = _edge_slices(dv, halo, pixels)
+            src_cols, dst_cols = _edge_slices(dh, halo, pixels)
+            window = Window.from_slices(src_rows, src_cols)
+            with rio.open(path) as ds:
+                out[:, dst_rows, dst_cols] = ds.read(bands, window=window)
+    return out[0] if len(bands) == 1 else out
+
+
+def crop_halo(arr: np.ndarray, halo: int) -> np.ndarray:
+    """去掉数组最后两维四周 halo 个像元, 返回视图"""
+    if halo == 0:
+        return arr
+    return arr[..., halo:-halo, halo:-halo]
+
+
+def _apply_task(task: dict):
+    data = read_tile_with_halo(
+        task["hv"], task["path_template"], task["halo"], task["grid"], task["bands"], task["fill_value"], task["land_only"]
+    )
+    return crop_halo(task["func"](data), task["halo"])
+
+
+def apply_with_halo(
+    func: Callable[[np.ndarray], np.ndarray],
+    hvs: Sequence[Union[str, Tuple[int, int]]],
+    path_template: str,
+    halo: int,
+    grid: Union[str, Grid] = "1km",
+    bands: Sequence[int] = None,
+    fill_value=None,
+    land_only: bool = True,
+    max_workers: int = None,
+) -> Dict[str, np.ndarray]:
+    """
+    并行地对每个图块(含 halo)执行 func, 并裁去 halo 得到与图块同样大小的结果
+    :param func: 输入 read_tile_with_halo 的结果, 返回最后两维形状相同的数组; 在线程池中执行
+    :param hvs: 图块编号列表
+    :param max_workers: 并行线程数
+    其余参数同 read_tile_with_halo
+    :return: {hv: 结果数组}
+    """
+    grid = get_grid(grid)
+    tasks = [
+        {
+            "func": func,
+            "hv": "h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv)),
+            "path_template": path_template,
+            "halo": halo,
+            "grid": grid,
+            "bands": list(bands) if bands else None,
+            "fill_value": fill_value,
+            "land_only": land_only,
+        }
+        for hv in hvs
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return {task["hv"]: result for task, result in zip(tasks, executor.map(_apply_task, tasks))}
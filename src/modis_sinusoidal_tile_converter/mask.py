@@ -0,0 +1,254 @@
+"""
+多边形到图块像元掩膜的栅格化
+
+经纬度多边形的顶点按 GCS2ICSGeo 的解析关系 (lat, lon * cos(lat)) 一次投影到地理影像坐标系, 对任一图块
+只需平移缩放即得到图块内的行列号(同 ICSGeo2ICSTile), 无需逐图块重投影; 再以扫描线算法按奇偶规则填充,
+内环(洞)与 MultiPolygon 自然处理. 覆盖比例由每个像元内 s x s 个子采样点统计.
+MaskCache 按 (区域, hv, grid) 缓存掩膜, 相同区域的重复运行直接读取.
+
+>>> masks = polygon_masks(province, "500m")              # {hv: (2400, 2400) bool}
+>>> cache = MaskCache("~/.cache/modis_masks")
+>>> fraction = cache.get(province, "h26v05", "1km", mode="fraction")
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.query import _densify, _polygon_rings, _unwrap_ring, tiles_in_polygon
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.stats import instrument
+
+__all__ = ["MODES", "Region", "polygon_mask", "polygon_masks", "MaskCache"]
+
+MODES = ("boolean", "fraction")
+
+
+class Region:
+    """
+    投影到地理影像坐标系(ICSGeo)的多边形, 供多个图块重复栅格化
+    rings: [(lat, x), ...], x = lon * cos(lat), 已展开180度经线并包含跨越经线所需的平移副本
+    """
+
+    def __init__(self, polygon, crs=None, max_segment_degrees: float = 0.1):
+        """
+        :param polygon: (N, 2) 顶点数组, crs 为 None 时为 (lat, lon), 否则为该坐标系下的 (x, y);
+                        也可为带 __geo_interface__ 的对象(如shapely几何)或 GeoJSON 字典, 支持内环与 MultiPolygon
+        :param crs: 多边形顶点所在坐标系, 任何 pyproj 可识别的输入; None 表示经纬度
+        :param max_segment_degrees: 边加密的最大步长(度), 经纬度空间中的直线边在正弦投影中为曲线
+        """
+        self.polygon = polygon
+        self.crs = crs
+        rings = []
+        for lat, lon in _polygon_rings(polygon, crs, holes=True):
+            if lat.size < 3:
+                raise ValueError("polygon should have at least 3 vertices")
+            if lat[0] != lat[-1] or lon[0] != lon[-1]:
+                lat, lon = np.append(lat, lat[0]), np.append(lon, lon[0])
+            lat, lon = _unwrap_ring(np.clip(lat, -90, 90), lon)
+            rings.append(_densify(lat, lon, max_segment_degrees))
+        lon_min = min(lon.min() for _, lon in rings)
+        lon_max = max(lon.max() for _, lon in rings)
+        # 展开后的经度可能超出 [-180, 180], 加入平移 360 度的副本; 奇偶规则下副本与洞的组合仍然正确
+        self.rings = []
+        for k in range(int(np.ceil((-180 - lon_max) / 360)), int(np.floor((180 - lon_min) / 360)) + 1):
+            for lat, lon in rings:
+                self.rings.append((lat, (lon + 360 * k) * np.cos(np.radians(lat))))
+        self.key = self._digest(rings, max_segment_degrees)
+
+    @staticmethod
+    def _digest(rings, max_segment_degrees: float) -> str:
+        sha1 = hashlib.sha1(repr(max_segment_degrees).encode("utf-8"))
+        for lat, lon in rings:
+            sha1.update(np.ascontiguousarray(lat).tobytes())
+            sha1.update(np.ascontiguousarray(lon).tobytes())
+        return sha1.hexdigest()[:16]
+
+    def tile_edges(self, h: int, v: int, grid: Grid) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """各环在图块 (h, v) 中的 (line, sample) 顶点"""
+        ppd = grid.pixels_per_degree
+        return [((90 - v * 10 - lat) * ppd - 0.5, (x + 180 - h * 10) * ppd - 0.5) for lat, x in self.rings]
+
+
+def _as_region(polygon, crs=None) -> Region:
+    return polygon if isinstance(polygon, Region) else Region(polygon, crs)
+
+
+def _rasterize(rings: List[Tuple[np.ndarray, np.ndarray]], pixels: int, supersample: int) -> np.ndarray:
+    """
+    扫描线栅格化, 奇偶规则
+    每个像元内取 supersample x supersample 个子采样点, 返回各像元内位于多边形内的子采样点个数, 形状为 (pixels, pixels)
+    """
+    s = supersample
+    size = pixels * s
+    rows, xs = [], []
+    for line, sample in rings:
+        # 像元坐标转换为子采样坐标, 子采样点中心为整数
+        y = (line + 0.5) * s - 0.5
+        x = (sample + 0.5) * s - 0.5
+        y0, y1, x0, x1 = y[:-1], y[1:], x[:-1], x[1:]
+        # 半开规则: 边覆盖满足 min(y) <= r < max(y) 的扫描线, 水平边不产生交点
+        lo = np.clip(np.ceil(np.minimum(y0, y1)), 0, size).astype(np.int64)
+        hi = np.clip(np.ceil(np.maximum(y0, y1)), 0, size).astype(np.int64)
+        counts = hi - lo
+        if counts.sum() == 0:
+            continue
+        edge = np.repeat(np.arange(counts.size), counts)
+        r = lo[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = (r - y0[edge]) / (y1[edge] - y0[edge])
+        rows.append(r)
+        xs.append(x0[edge] + t * (x1[edge] - x0[edge]))
+    counts = np.zeros((pixels, pixels + 1), dtype=np.int32)
+    if not rows:
+        return counts[:, :pixels]
+    r = np.concatenate(rows)
+    x = np.concatenate(xs)
+    order = np.lexsort((x, r))
+    r, x = r[order], x[order]
+    # 同一扫描线上的交点两两配对, 子采样点 c 满足 xa <= c < xb 时位于内部
+    r, a, b = r[0::2], x[0::2], x[1::2]
+    a = np.clip(np.ceil(a), 0, size).astype(np.int64)
+    b = np.clip(np.ceil(b), 0, size).astype(np.int64)
+    keep = b > a
+    row, a, b = r[keep] // s, a[keep], b[keep]
+    # 区间 [a, b) 在像元 pa 中占 s - ra 个子采样点, 在 pa+1 ~ pb-1 中各占 s 个, 在 pb 中占 rb 个
+    pa, ra = np.divmod(a, s)
+    pb, rb = np.divmod(b, s)
+    same = pa == pb
+    np.add.at(counts, (row[same], pa[same]), (b - a)[same])
+    row, pa, ra, pb, rb = row[~same], pa[~same], ra[~same], pb[~same], rb[~same]
+    np.add.at(counts, (row, pa), s - ra)
+    np.add.at(counts, (row, pb), rb)
+    full = np.zeros((pixels, pixels + 2), dtype=np.int32)
+    np.add.at(full, (row, pa + 1), s)
+    np.add.at(full, (row, pb), -s)
+    counts += np.cumsum(full, axis=1)[:, : pixels + 1]
+    return counts[:, :pixels]
+
+
+@instrument("mask.polygon_mask")
+def polygon_mask(
+    polygon,
+    hv: Union[str, Tuple[int, int]],
+    grid: Union[str, Grid] = "1km",
+    mode: str = "boolean",
+    supersample: int = 4,
+    crs=None,
+) -> np.ndarray:
+    """
+    栅格化多边形在一个图块中的掩膜
+    :param polygon: 多边形, 见 Region; 对多个图块重复栅格化时可先构造 Region 以免重复投影
+    :param hv: 图块编号
+    :param grid: 网格名称或 Grid 对象
+    :param mode: "boolean" 以像元中心是否在多边形内判断; "fraction" 返回像元被覆盖的比例
+    :param supersample: fraction 模式下每个像元每个方向的子采样数, 比例的精度为 1 / supersample**2
+    :param crs: polygon 顶点所在坐标系, None 表示经纬度
+    :return: (N, N) 的bool数组或float32数组
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode({mode}) should be in {list(MODES)}")
+    grid = get_grid(grid)
+    region = _as_region(polygon, crs)
+    h, v = Sinusoidal.parse_hv(hv)
+    s = supersample if mode == "fraction" else 1
+    counts = _rasterize(region.tile_edges(h, v, grid), grid.pixels_per_tile, s)
+    if mode == "boolean":
+        return counts > 0
+    return (counts / (s * s)).astype(np.float32)
+
+
+def polygon_masks(
+    polygon,
+    grid: Union[str, Grid] = "1km",
+    mode: str = "boolean",
+    supersample: int = 4,
+    crs=None,
+    land_only: bool = False,
+    skip_empty: bool = True,
+) -> Dict[str, np.ndarray]:
+    """
+    栅格化多边形在其覆盖的全部图块中的掩膜, 参数同 polygon_mask
+    :param land_only: 只处理陆地图块
+    :param skip_empty: 跳过没有任何像元被覆盖的图块(多边形只与图块边缘接触时)
+    :return: {hv: 掩膜}
+    """
+    region = _as_region(polygon, crs)
+    masks = {}
+    for hv in tiles_in_polygon(region.polygon, region.crs, land_only=land_only):
+        mask = polygon_mask(region, hv, grid, mode, supersample)
+        if skip_empty and not mask.any():
+            continue
+        masks[hv] = mask
+    return masks
+
+
+class MaskCache:
+    """
+    掩膜的两级缓存: 内存LRU + 磁盘上可内存映射的 .npy 文件
+    键为 (区域, hv, grid, mode), 区域由加密后多边形顶点的摘要确定, 几何不变即可命中
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, maxsize: int = 256):
+        """
+        :param cache_dir: 磁盘缓存目录, 为None时仅使用内存缓存
+        :param maxsize: 内存中最多保留的掩膜个数, 超出时淘汰最久未用的
+        """
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir is not None else None
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+
+    @staticmethod
+    def _key(region: Region, hv, grid: Grid, mode: str, supersample: int) -> str:
+        hv = "h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv))
+        mode = mode if mode == "boolean" else f"{mode}{supersample}"
+        return f"{region.key}.{hv}.{grid.name}.{mode}"
+
+    def get(
+        self,
+        polygon,
+        hv: Union[str, Tuple[int, int]],
+        grid: Union[str, Grid] = "1km",
+        mode: str = "boolean",
+        supersample: int = 4,
+        crs=None,
+    ) -> np.ndarray:
+        """
+        获取掩膜, 依次查找内存缓存, 磁盘缓存, 均未命中时栅格化并写入缓存; 使用磁盘缓存时返回只读的内存映射数组
+        :param polygon: 多边形或 Region, 同一区域查询多个图块时传入 Region 可避免重复投影
+        其余参数同 polygon_mask
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode({mode}) should be in {list(MODES)}")
+        grid = get_grid(grid)
+        projected = _as_region(polygon, crs)
+        key = self._key(projected, hv, grid, mode, supersample)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        mask = None
+        path = self.cache_dir / f"{key}.npy" if self.cache_dir is not None else None
+        if path is not None and path.exists():
+            mask = np.load(path, mmap_mode="r")
+        if mask is None:
+            mask = polygon_mask(projected, hv, grid, mode, supersample)
+            if path is not None:
+                # 先写临时文件再改名, 多进程同时写入同一掩膜时不会读到不完整的文件
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.cache_dir / f"{key}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, mask)
+                os.replace(tmp_path, path)
+        self._memory[key] = mask
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return mask
+
+    def clear(self, disk: bool = False):
+        """清空内存缓存, disk为True时同时删除磁盘缓存文件"""
+        self._memory.clear()
+        if disk and self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.h??v??.*.npy"):
+                path.unlink()
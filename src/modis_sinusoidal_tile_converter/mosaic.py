@@ -0,0 +1,315 @@
+"""
+全球正弦投影镶嵌
+
+MODIS图块在全球正弦投影栅格中的位置固定(第 v 行, 第 h 列, 各 N x N 像元), 无需逐个重投影或拼接数组:
+- build_vrt: 生成引用现有图块文件的 GDAL VRT, 不复制任何像元, rasterio/GDAL 可直接按窗口读取;
+- build_memmap: 多线程把各图块原位写入磁盘上的稀疏 .npy 内存映射文件, 未写入的(海洋)图块不占用磁盘空间,
+  读取时按图块存在掩膜填充无效值.
+
+>>> build_vrt("/data/NDVI.{hv}.tif", "/data/NDVI.global.vrt")
+>>> mosaic = build_memmap("/data/NDVI.{hv}.tif", "/data/NDVI.global.npy", nodata=-3000, max_workers=8)
+>>> china = mosaic.read(mosaic_window(18, 73, 54, 135))
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple, Union
+from xml.etree import ElementTree
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.constant import MODIS_SINUSOIDAL_TILE_USED
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.stats import instrument
+
+__all__ = ["mosaic_shape", "mosaic_transform", "mosaic_window", "tile_window", "build_vrt", "build_memmap", "MemmapMosaic"]
+
+# numpy 数据类型到 GDAL 数据类型名称
+_GDAL_TYPES = {
+    "uint8": "Byte",
+    "int8": "Int8",
+    "uint16": "UInt16",
+    "int16": "Int16",
+    "uint32": "UInt32",
+    "int32": "Int32",
+    "uint64": "UInt64",
+    "int64": "Int64",
+    "float32": "Float32",
+    "float64": "Float64",
+}
+
+Window = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+def mosaic_shape(grid: Union[str, Grid] = "1km") -> Tuple[int, int]:
+    """全球镶嵌的 (height, width), 1km 为 (21600, 43200)"""
+    pixels = get_grid(grid).pixels_per_tile
+    return 18 * pixels, 36 * pixels
+
+
+def mosaic_transform(grid: Union[str, Grid] = "1km") -> Tuple[float, ...]:
+    """全球镶嵌GDAL顺序的六参数, 即 h00v00 图块的变换"""
+    return tuple(Sinusoidal.tile_table(grid).transforms[0, 0].tolist())
+
+
+def tile_window(hv: Union[str, Tuple[int, int]], grid: Union[str, Grid] = "1km") -> Window:
+    """图块在全球镶嵌中的窗口 ((row_start, row_stop), (col_start, col_stop))"""
+    h, v = Sinusoidal.parse_hv(hv)
+    pixels = get_grid(grid).pixels_per_tile
+    return (v * pixels, (v + 1) * pixels), (h * pixels, (h + 1) * pixels)
+
+
+def mosaic_window(
+    lat_min: float, lon_min: float, lat_max: float, lon_max: float, grid: Union[str, Grid] = "1km"
+) -> Window:
+    """
+    覆盖经纬度矩形的全球镶嵌窗口 ((row_start, row_stop), (col_start, col_stop))
+    正弦投影中同一经度的 x 随纬度绝对值增大而趋近0, 因此 x 范围取纬度绝对值最小和最大两处的极值
+    """
+    Sinusoidal._check_geo(lat_min, lon_min)
+    Sinusoidal._check_geo(lat_max, lon_max)
+    if lat_min > lat_max or lon_min > lon_max:
+        raise ValueError(f"({lat_min}, {lon_min}, {lat_max}, {lon_max}) should be (lat_min, lon_min, lat_max, lon_max)")
+    grid = get_grid(grid)
+    nearest = 0.0 if lat_min <= 0 <= lat_max else min(abs(lat_min), abs(lat_max))
+    farthest = max(abs(lat_min), abs(lat_max))
+    x, _ = Sinusoidal.GCS2PCS(np.array([nearest, farthest] * 2), np.array([lon_min, lon_min, lon_max, lon_max]))
+    _, y = Sinusoidal.GCS2PCS(np.array([lat_max, lat_min]), np.zeros(2))
+    ulx, pixel_size, _, uly, _, _ = mosaic_transform(grid)
+    height, width = mosaic_shape(grid)
+    col_start = int(np.clip(np.floor((np.min(x) - ulx) / pixel_size), 0, width))
+    col_stop = int(np.clip(np.ceil((np.max(x) - ulx) / pixel_size), 0, width))
+    row_start = int(np.clip(np.floor((uly - y[0]) / pixel_size), 0, height))
+    row_stop = int(np.clip(np.ceil((uly - y[1]) / pixel_size), 0, height))
+    return (row_start, max(row_stop, row_start + 1)), (col_start, max(col_stop, col_start + 1))
+
+
+def _tile_paths(tiles: Union[str, Dict[str, str]], grid: Grid, land_only: bool = True) -> Dict[str, str]:
+    """
+    解析图块文件: 路径模板(可用字段 {hv}, {h}, {v}, {grid})只保留存在的文件, 字典原样使用
+    :return: {hv: 路径}, 按 hv 排序
+    """
+    if isinstance(tiles, dict):
+        return {"h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv)): path for hv, path in sorted(tiles.items())}
+    hvs = MODIS_SINUSOIDAL_TILE_USED if land_only else [f"h{h:02d}v{v:02d}" for h in range(36) for v in range(18)]
+    paths = {}
+    for hv in sorted(hvs):
+        h, v = Sinusoidal.parse_hv(hv)
+        path = tiles.format(hv=hv, h=h, v=v, grid=grid.name)
+        if os.path.exists(path):
+            paths[hv] = path
+    return paths
+
+
+@instrument("mosaic.build_vrt")
+def build_vrt(
+    tiles: Union[str, Dict[str, str]],
+    vrt_path: str,
+    grid: Union[str, Grid] = "1km",
+    bands: Sequence[int] = None,
+    nodata=None,
+    land_only: bool = True,
+    relative: bool = True,
+) -> str:
+    """
+    生成引用图块文件的全球镶嵌 VRT, 不复制像元; 未提供的图块在读取时为 nodata
+    各图块文件的数据类型, 波段数与分块方式需一致, 以第一个文件为准
+    :param tiles: 图块文件路径模板(如 "/data/NDVI.{hv}.tif") 或 {hv: 路径}
+    :param vrt_path: 输出 VRT 路径
+    :param grid: 网格名称或 Grid 对象
+    :param bands: 引用的波段号(从1开始), 默认全部波段
+    :param nodata: 镶嵌的无效值, 默认使用图块文件的 nodata
+    :param land_only: tiles 为模板时只查找陆地图块
+    :param relative: 以相对于 VRT 所在目录的路径引用图块文件
+    :return: vrt_path
+    """
+    import rasterio as rio
+
+    grid = get_grid(grid)
+    paths = _tile_paths(tiles, grid, land_only)
+    if not paths:
+        raise ValueError(f"No tile file found for {tiles}")
+    with rio.open(next(iter(paths.values()))) as ds:
+        bands = list(bands) if bands else list(range(1, ds.count + 1))
+        dtypes = [ds.dtypes[band - 1] for band in bands]
+        block_shapes = [ds.block_shapes[band - 1] for band in bands]
+        nodata = ds.nodata if nodata is None else nodata
+
+    pixels = grid.pixels_per_tile
+    height, width = mosaic_shape(grid)
+    vrt_dir = os.path.dirname(os.path.abspath(vrt_path))
+    root = ElementTree.Element("VRTDataset", rasterXSize=str(width), rasterYSize=str(height))
+    ElementTree.SubElement(root, "SRS").text = Sinusoidal.wkt
+    ElementTree.SubElement(root, "GeoTransform").text = ", ".join(repr(value) for value in mosaic_transform(grid))
+    for index, (band, dtype, (block_height, block_width)) in enumerate(zip(bands, dtypes, block_shapes), start=1):
+        band_element = ElementTree.SubElement(root, "VRTRasterBand", dataType=_GDAL_TYPES[dtype], band=str(index))
+        if nodata is not None:
+            ElementTree.SubElement(band_element, "NoDataValue").text = repr(float(nodata))
+        for hv, path in paths.items():
+            (row_start, _), (col_start, _) = tile_window(hv, grid)
+            source = ElementTree.SubElement(band_element, "SimpleSource")
+            if relative:
+                filename = ElementTree.SubElement(source, "SourceFilename", relativeToVRT="1")
+                filename.text = os.path.relpath(os.path.abspath(path), vrt_dir)
+            else:
+                filename = ElementTree.SubElement(source, "SourceFilename", relativeToVRT="0")
+                filename.text = os.path.abspath(path)
+            ElementTree.SubElement(source, "SourceBand").text = str(band)
+            # 提供源文件属性, GDAL打开VRT时无需逐个打开图块文件
+            ElementTree.SubElement(
+                source,
+                "SourceProperties",
+                RasterXSize=str(pixels),
+                RasterYSize=str(pixels),
+                DataType=_GDAL_TYPES[dtype],
+                BlockXSize=str(block_width),
+                BlockYSize=str(block_height),
+            )
+            ElementTree.SubElement(source, "SrcRect", xOff="0", yOff="0", xSize=str(pixels), ySize=str(pixels))
+            ElementTree.SubElement(
+                source, "DstRect", xOff=str(col_start), yOff=str(row_start), xSize=str(pixels), ySize=str(pixels)
+            )
+    ElementTree.ElementTree(root).write(vrt_path, encoding="utf-8")
+    return vrt_path
+
+
+class MemmapMosaic:
+    """
+    磁盘上的全球镶嵌内存映射数组, 形状为 (H, W) 或 (bands, H, W)
+
+    数据文件为 .npy, 创建时只扩展文件长度(稀疏文件), 只有写入的图块占用磁盘空间;
+    同名的 .json 记录网格, 无效值和已写入的图块, read 时未写入的图块填充无效值.
+    """
+
+    def __init__(self, path: str, mode: str = "r"):
+        """
+        打开已有的镶嵌
+        :param path: .npy 数据文件路径
+        :param mode: "r" 只读, "r+" 可写
+        """
+        self.path = str(path)
+        with open(self._meta_path(self.path), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.grid = get_grid(meta["grid"])
+        self.nodata = meta["nodata"]
+        self.tiles = set(meta["tiles"])
+        self.mode = mode
+        self.data = np.load(self.path, mmap_mode=mode)
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".json"
+
+    @classmethod
+    def create(cls, path: str, grid: Union[str, Grid] = "1km", dtype="int16", count: int = 1, nodata=None):
+        """
+        创建空的镶嵌
+        :param count: 波段数, 为1时数组形状为 (H, W)
+        :param nodata: 未写入图块的填充值, 默认为0
+        """
+        grid = get_grid(grid)
+        shape = mosaic_shape(grid) if count == 1 else (count,) + mosaic_shape(grid)
+        # open_memmap 只在文件末尾写入1个字节, 其余部分在文件系统中为空洞
+        np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(dtype), shape=shape).flush()
+        nodata = 0 if nodata is None else (nodata.item() if hasattr(nodata, "item") else nodata)
+        with open(cls._meta_path(path), "w", encoding="utf-8") as f:
+            json.dump({"grid": grid.name, "nodata": nodata, "tiles": []}, f)
+        return cls(path, "r+")
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.data.shape
+
+    @property
+    def transform(self) -> Tuple[float, ...]:
+        """GDAL顺序的六参数"""
+        return mosaic_transform(self.grid)
+
+    def write_tile(self, hv: Union[str, Tuple[int, int]], arr: np.ndarray):
+        """
+        将图块数组原位写入镶嵌, 不同图块可由多个线程同时写入
+        写入后需调用 flush 保存已写入图块的记录
+        """
+        if self.mode == "r":
+            raise ValueError(f"{self.path} is opened read-only")
+        h, v = Sinusoidal.parse_hv(hv)
+        (row_start, row_stop), (col_start, col_stop) = tile_window((h, v), self.grid)
+        self.data[..., row_start:row_stop, col_start:col_stop] = arr
+        self.tiles.add(f"h{h:02d}v{v:02d}")
+
+    def flush(self):
+        """写回数据与已写入图块的记录"""
+        self.data.flush()
+        with open(self._meta_path(self.path), "w", encoding="utf-8") as f:
+            json.dump({"grid": self.grid.name, "nodata": self.nodata, "tiles": sorted(self.tiles)}, f)
+
+    def read(self, window: Optional[Window] = None) -> np.ndarray:
+        """
+        按窗口读取镶嵌, 未写入的图块填充无效值
+        :param window: ((row_start, row_stop), (col_start, col_stop)), 可由 mosaic_window/tile_window 得到, 默认整幅
+        """
+        height, width = self.data.shape[-2:]
+        (row_start, row_stop), (col_start, col_stop) = window if window is not None else ((0, height), (0, width))
+        out = np.array(self.data[..., row_start:row_stop, col_start:col_stop])
+        if self.nodata == 0:
+            # 空洞部分读出即为0, 无需再填充
+            return out
+        pixels = self.grid.pixels_per_tile
+        for v in range(row_start // pixels, (row_stop - 1) // pixels + 1):
+            for h in range(col_start // pixels, (col_stop - 1) // pixels + 1):
+                if f"h{h:02d}v{v:02d}" in self.tiles:
+                    continue
+                rows = slice(max(v * pixels, row_start) - row_start, min((v + 1) * pixels, row_stop) - row_start)
+                cols = slice(max(h * pixels, col_start) - col_start, min((h + 1) * pixels, col_stop) - col_start)
+                out[..., rows, cols] = self.nodata
+        return out
+
+
+def _read_into(task: tuple) -> str:
+    """读取一个图块文件并写入镶嵌, 在线程池中执行"""
+    import rasterio as rio
+
+    mosaic, hv, path, bands = task
+    with rio.open(path) as ds:
+        data = ds.read(bands or list(range(1, ds.count + 1)))
+    mosaic.write_tile(hv, data[0] if mosaic.data.ndim == 2 else data)
+    return hv
+
+
+@instrument("mosaic.build_memmap")
+def build_memmap(
+    tiles: Union[str, Dict[str, str]],
+    path: str,
+    grid: Union[str, Grid] = "1km",
+    bands: Sequence[int] = None,
+    nodata=None,
+    land_only: bool = True,
+    max_workers: int = None,
+) -> MemmapMosaic:
+    """
+    多线程读取图块文件并原位写入全球镶嵌内存映射文件, 每个线程同时只持有一个图块
+    :param tiles: 图块文件路径模板(如 "/data/NDVI.{hv}.tif") 或 {hv: 路径}
+    :param path: 输出 .npy 路径, 同时写出同名 .json
+    :param grid: 网格名称或 Grid 对象
+    :param bands: 读取的波段号(从1开始), 默认全部波段
+    :param nodata: 未写入图块的填充值, 默认使用图块文件的 nodata
+    :param land_only: tiles 为模板时只查找陆地图块
+    :param max_workers: 并行线程数
+    """
+    import rasterio as rio
+
+    grid = get_grid(grid)
+    paths = _tile_paths(tiles, grid, land_only)
+    if not paths:
+        raise ValueError(f"No tile file found for {tiles}")
+    with rio.open(next(iter(paths.values()))) as ds:
+        count = len(bands) if bands else ds.count
+        dtype = ds.dtypes[(bands[0] if bands else 1) - 1]
+        nodata = ds.nodata if nodata is None else nodata
+    mosaic = MemmapMosaic.create(path, grid, dtype, count, nodata)
+    tasks = [(mosaic, hv, tile_path, list(bands) if bands else None) for hv, tile_path in paths.items()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_read_into, tasks))
+    mosaic.flush()
+    return MemmapMosaic(path)
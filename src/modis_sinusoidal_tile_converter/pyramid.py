@@ -0,0 +1,212 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio as rio
+from PIL import Image
+from rasterio.warp import Resampling, reproject
+from rasterio.windows import Window
+
+from modis_sinusoidal_tile_converter.renderer import Renderer
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.webmercator import WebMercator
+
+__all__ = ["xyz_tiles_of_sinusoidal_tile", "build_xyz_pyramid"]
+
+
+def _sample_grid(left: float, top: float, right: float, bottom: float, samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    xs, ys = np.meshgrid(np.linspace(left, right, samples), np.linspace(top, bottom, samples))
+    return xs.ravel(), ys.ravel()
+
+
+def xyz_tiles_of_sinusoidal_tile(hv: str, z: int, samples: int = 33) -> List[Tuple[int, int]]:
+    """
+    计算正弦投影图块在z级下覆盖的Web墨卡托瓦片
+    在图块内均匀取样, 投影有效区外的样点剔除后换算到墨卡托瓦片号, 取其外包范围
+    :return: [(x, y), ...]
+    """
+    ulx, uly, lrx, lry = Sinusoidal.get_tile_bounds(hv)
+    lat, lon = Sinusoidal.PCS2GCS(*_sample_grid(ulx, uly, lrx, lry, samples))
+    valid = ~np.isnan(lat) & (np.abs(lat) <= WebMercator.max_latitude)
+    if not valid.any():
+        return []
+    tile_x, tile_y = WebMercator.PCS2ICSTile(*WebMercator.GCS2PCS(lat[valid], lon[valid]), z)
+    tile_count = 2**z
+    x_min, x_max = max(tile_x.min(), 0), min(tile_x.max(), tile_count - 1)
+    y_min, y_max = max(tile_y.min(), 0), min(tile_y.max(), tile_count - 1)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def _source_window(hv: str, grid_size: int, x: int, y: int, z: int, samples: int = 9, pad: int = 2) -> Optional[Window]:
+    """Web墨卡托瓦片在正弦投影图块中所需的最小像素窗口"""
+    left, top, right, bottom = WebMercator.get_tile_bounds(x, y, z)
+    lat, lon = WebMercator.PCS2GCS(*_sample_grid(left, top, right, bottom, samples))
+    sin_x, sin_y = Sinusoidal.GCS2PCS(lat, lon)
+    ulx, uly, lrx, lry = Sinusoidal.get_tile_bounds(hv)
+    pixel_size = (lrx - ulx) / grid_size
+    cols = (np.asarray(sin_x) - ulx) / pixel_size
+    rows = (uly - np.asarray(sin_y)) / pixel_size
+    col_off = max(int(np.floor(np.nanmin(cols))) - pad, 0)
+    row_off = max(int(np.floor(np.nanmin(rows))) - pad, 0)
+    col_end = min(int(np.ceil(np.nanmax(cols))) + pad, grid_size)
+    row_end = min(int(np.ceil(np.nanmax(rows))) + pad, grid_size)
+    if col_end <= col_off or row_end <= row_off:
+        return None
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def _tile_path(output_dir: str, z: int, x: int, y: int, format: str) -> Path:
+    return Path(output_dir) / str(z) / str(x) / f"{y}.{format.lower()}"
+
+
+def _render_max_zoom_tile(task: dict) -> Optional[Tuple[int, int]]:
+    """渲染最高级别的一张瓦片: 从各正弦投影图块读取所需窗口并重投影, 全部无效时跳过"""
+    x, y, z = task["x"], task["y"], task["z"]
+    size = WebMercator.pixels_per_tile
+    destination = np.full((size, size), np.nan, dtype=np.float32)
+    dst_transform = WebMercator.get_tile_transform(x, y, z)
+    for hv, path in task["sources"]:
+        with rio.open(path) as src:
+            window = _source_window(hv, src.width, x, y, z)
+            if window is None:
+                continue
+            raw = src.read(task["band"], window=window)
+            src_nodata = src.nodata
+            src_transform = src.window_transform(window)
+            src_crs = src.crs
+        # 无效值须在重投影前置为NaN, 否则会被插值混入相邻的有效像元
+        data = raw.astype(np.float32)
+        for invalid in (src_nodata, task["nan_value"]):
+            if invalid is not None:
+                data[raw == invalid] = np.nan
+        # 多个图块依次写入同一目标数组, 已有值不会被源数据范围外的区域覆盖
+        reproject(
+            source=data,
+            destination=destination,
+            src_transform=src_transform,
+            src_crs=src_crs,
+            src_nodata=np.nan,
+            dst_transform=dst_transform,
+            dst_crs=WebMercator.crs,
+            dst_nodata=np.nan,
+            init_dest_nodata=False,
+            resampling=Resampling[task["resampling"]],
+        )
+    if np.isnan(destination).all():
+        return None
+    Renderer.render_single_band(
+        destination,
+        str(_tile_path(task["output_dir"], z, x, y, task["format"])),
+        format=task["format"],
+        colormap=task["colormap"],
+        vmin=task["vmin"],
+        vmax=task["vmax"],
+    )
+    return x, y
+
+
+def _downsample_rgba(canvas: np.ndarray) -> np.ndarray:
+    """2x2 块按透明度加权平均, 将 (2N, 2N, 4) 的RGBA降采样为 (N, N, 4)"""
+    n = canvas.shape[0] // 2
+    blocks = canvas.reshape(n, 2, n, 2, 4).astype(np.uint32)
+    alpha = blocks[..., 3].sum(axis=(1, 3))
+    rgb = (blocks[..., :3] * blocks[..., 3:4]).sum(axis=(1, 3))
+    out = np.zeros((n, n, 4), dtype=np.uint8)
+    visible = alpha > 0
+    out[visible, :3] = (rgb[visible] // alpha[visible, None]).astype(np.uint8)
+    out[..., 3] = (alpha // 4).astype(np.uint8)
+    return out
+
+
+def _render_parent_tile(task: dict) -> Optional[Tuple[int, int]]:
+    """由已渲染的4张子瓦片拼接并降采样生成父瓦片, 无需重新从源数据重投影"""
+    x, y, z = task["x"], task["y"], task["z"]
+    size = WebMercator.pixels_per_tile
+    canvas = np.zeros((size * 2, size * 2, 4), dtype=np.uint8)
+    found = False
+    for dx in (0, 1):
+        for dy in (0, 1):
+            child = _tile_path(task["output_dir"], z + 1, 2 * x + dx, 2 * y + dy, task["format"])
+            if not child.exists():
+                continue
+            with Image.open(child) as image:
+                canvas[dy * size : (dy + 1) * size, dx * size : (dx + 1) * size] = np.asarray(image.convert("RGBA"))
+            found = True
+    if not found:
+        return None
+    Renderer.save(Renderer.to_image(_downsample_rgba(canvas)), str(_tile_path(task["output_dir"], z, x, y, task["format"])), task["format"])
+    return x, y
+
+
+def build_xyz_pyramid(
+    tiles: Dict[str, str],
+    output_dir: str,
+    max_zoom: int,
+    min_zoom: int = 0,
+    band: int = 1,
+    colormap: str = "gray",
+    vmin=0,
+    vmax=1,
+    nan_value=None,
+    format: str = "PNG",
+    resampling: str = "nearest",
+    max_workers: int = None,
+) -> Dict[int, int]:
+    """
+    由MODIS正弦投影图块生成Web墨卡托 z/x/y 瓦片金字塔
+    最高级别的每张瓦片只从与其相交的正弦投影图块中读取所需窗口并重投影渲染,
+    较低级别由已渲染的子瓦片逐级降采样得到, 各级别内部由进程池并行处理
+
+    :param tiles: {hv: GeoTIFF路径}, 如 array2tiff 写出的图块
+    :param output_dir: 输出目录, 瓦片路径为 {output_dir}/{z}/{x}/{y}.{format}
+    :param max_zoom: 最高级别
+    :param min_zoom: 最低级别
+    :param band: 渲染的波段号
+    :param colormap: 色带名称
+    :param vmin: 数据范围最小值
+    :param vmax: 数据范围最大值
+    :param nan_value: 额外视为无效值的数值(文件nodata始终视为无效)
+    :param format: 瓦片图像格式, "PNG" 或 "WEBP"
+    :param resampling: 最高级别重投影的重采样方法
+    :param max_workers: 并行进程数
+    :return: {z: 该级别写出的瓦片数}
+    """
+    if not 0 <= min_zoom <= max_zoom < 21:
+        raise ValueError(f"zoom range [{min_zoom}, {max_zoom}] should be within [0, 21)")
+    sources = defaultdict(list)
+    for hv, path in tiles.items():
+        for x, y in xyz_tiles_of_sinusoidal_tile(hv, max_zoom):
+            sources[(x, y)].append((hv, str(path)))
+    common = {"output_dir": str(output_dir), "format": format}
+    tasks = [
+        dict(
+            common,
+            x=x,
+            y=y,
+            z=max_zoom,
+            sources=hv_paths,
+            band=band,
+            colormap=colormap,
+            vmin=vmin,
+            vmax=vmax,
+            nan_value=nan_value,
+            resampling=resampling,
+        )
+        for (x, y), hv_paths in sorted(sources.items())
+    ]
+    counts = {}
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, len(tasks) // (4 * max_workers))
+        rendered = {xy for xy in executor.map(_render_max_zoom_tile, tasks, chunksize=chunksize) if xy}
+        counts[max_zoom] = len(rendered)
+        for z in range(max_zoom - 1, min_zoom - 1, -1):
+            parents = sorted({(x // 2, y // 2) for x, y in rendered})
+            tasks = [dict(common, x=x, y=y, z=z) for x, y in parents]
+            chunksize = max(1, len(tasks) // (4 * max_workers))
+            rendered = {xy for xy in executor.map(_render_parent_tile, tasks, chunksize=chunksize) if xy}
+            counts[z] = len(rendered)
+    return counts
@@ -0,0 +1,270 @@
+"""
+图块空间查询
+
+在地理影像坐标系(ICSGeo, 即 (lat, lon * cos(lat)))中, 每个图块都是一个 10x10 度的矩形,
+因此只需把查询几何体的边界变换到 ICSGeo 中, 按图块行(10度纬度带)统计其覆盖的水平范围即可得到精确结果:
+    1. 多边形的边在经纬度空间中按直线处理, 加密后在每条纬度带边界(10度整数倍)处切分,
+       切分后的每段落在唯一一个图块行内, 其水平范围直接标记该行的图块;
+    2. 纬度带边界线与多边形的交点两两配对, 得到边界线上位于多边形内部的区间, 标记该边界上下两行的图块.
+经线(常量经度)在纬度带内 lon * cos(lat) 单调, 因此矩形范围查询在图块边界上是精确的.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+
+__all__ = ["tiles_in_bbox", "tiles_in_polygon", "tiles_of_points"]
+
+# 图块行边界纬度, 自北向南
+_ROW_LATS = 90.0 - 10.0 * np.arange(19)
+# 判断是否落在图块竖直边界上的容差(图块宽度的比例), 吸收 lon * cos(lat) 的舍入误差
+_EDGE_TOLERANCE = 1e-9
+
+
+def _covered_to_hv(covered: np.ndarray, land_only: bool) -> List[str]:
+    """将 (18, 36) 覆盖掩膜转换为按 hv 排序的图块编号列表"""
+    if land_only:
+        covered = covered & Sinusoidal.tile_table().is_land
+    h, v = np.nonzero(covered.T)
+    return [f"h{hi:02d}v{vi:02d}" for hi, vi in zip(h.tolist(), v.tolist())]
+
+
+def _mark(covered: np.ndarray, rows: np.ndarray, x_min: np.ndarray, x_max: np.ndarray):
+    """在 covered 中标记 rows 行内 ICSGeo 经度范围 [x_min, x_max] 覆盖的图块"""
+    if rows.size == 0:
+        return
+    h_lo = np.clip(np.floor((x_min + 180) / 10 + _EDGE_TOLERANCE), 0, 35).astype(int)
+    h_hi = np.clip(np.ceil((x_max + 180) / 10 - _EDGE_TOLERANCE) - 1, 0, 35).astype(int)
+    # 恰好落在图块竖直边界上的零宽区间仅与图块接触, 不计为相交
+    keep = h_hi >= h_lo
+    rows, h_lo, h_hi = rows[keep], h_lo[keep], h_hi[keep]
+    # 差分数组, 一次性标记所有区间
+    diff = np.zeros((18, 37), dtype=np.int32)
+    np.add.at(diff, (rows, h_lo), 1)
+    np.add.at(diff, (rows, h_hi + 1), -1)
+    covered |= np.cumsum(diff, axis=1)[:, :36] > 0
+
+
+def _split_at(lat: np.ndarray, lon: np.ndarray, levels: np.ndarray, along_lat: bool):
+    """在纬度(along_lat=True)或经度穿越 levels(升序) 中各值处插入切分点"""
+    values = lat if along_lat else lon
+    idx0 = np.searchsorted(levels, values[:-1], side="right")
+    idx1 = np.searchsorted(levels, values[1:], side="right")
+    lo = np.minimum(idx0, idx1)
+    counts = np.abs(idx1 - idx0)
+    if counts.sum() == 0:
+        return lat, lon
+    # 每段穿越的切分值按行进方向排列
+    seg = np.repeat(np.arange(counts.size), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    level_idx = np.where(idx1[seg] > idx0[seg], lo[seg] + j, lo[seg] + counts[seg] - 1 - j)
+    level = levels[level_idx]
+    # 端点恰好落在切分值上时无需插入
+    keep = (level != values[seg]) & (level != values[seg + 1])
+    seg, level = seg[keep], level[keep]
+    t = (level - values[seg]) / (values[seg + 1] - values[seg])
+    new_lat = lat[seg] + t * (lat[seg + 1] - lat[seg])
+    new_lon = lon[seg] + t * (lon[seg + 1] - lon[seg])
+    # 切分点精确落在边界线上, 避免浮点误差
+    if along_lat:
+        new_lat = level
+    else:
+        new_lon = level
+    return np.insert(lat, seg + 1, new_lat), np.insert(lon, seg + 1, new_lon)
+
+
+def _densify(lat: np.ndarray, lon: np.ndarray, max_segment_degrees: float):
+    """按最大步长加密闭合环的边"""
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    counts = np.maximum(np.ceil(np.maximum(np.abs(dlat), np.abs(dlon)) / max_segment_degrees), 1).astype(int)
+    starts = np.repeat(np.arange(counts.size), counts)
+    t = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = t / counts[starts]
+    new_lat = np.append(lat[starts] + t * dlat[starts], lat[-1])
+    new_lon = np.append(lon[starts] + t * dlon[starts], lon[-1])
+    return new_lat, new_lon
+
+
+def _unwrap_ring(lat: np.ndarray, lon: np.ndarray):
+    """展开跨越180度经线的环, 使相邻顶点经度差不超过180度; 环绕极点的环补充极点处的边"""
+    dlon = np.diff(lon)
+    dlon = dlon - 360 * np.round(dlon / 360)
+    lon = np.concatenate([[lon[0]], lon[0] + np.cumsum(dlon)])
+    lat = lat.copy()
+    shift = lon[-1] - lon[0]
+    if abs(shift) > 180:
+        # 环绕极点: 沿极点所在纬线闭合
+        pole = 90.0 if np.mean(lat) > 0 else -90.0
+        lat = np.concatenate([lat, [pole, pole, lat[0]]])
+        lon = np.concatenate([lon, [lon[-1], lon[0], lon[0]]])
+    return lat, lon
+
+
+def _mark_ring(covered: np.ndarray, lat: np.ndarray, lon: np.ndarray, max_segment_degrees: float):
+    """标记单个闭合环(经纬度顶点)覆盖的图块"""
+    if lat[0] != lat[-1] or lon[0] != lon[-1]:
+        lat, lon = np.append(lat, lat[0]), np.append(lon, lon[0])
+    lat = np.clip(lat, -90, 90)
+    lat, lon = _unwrap_ring(lat, lon)
+    lat, lon = _densify(lat, lon, max_segment_degrees)
+    lat, lon = _split_at(lat, lon, _ROW_LATS[::-1].copy(), along_lat=True)
+    lon_lines = 180.0 + 360.0 * np.arange(np.floor((lon.min() - 180) / 360), np.ceil((lon.max() - 180) / 360) + 1)
+    lat, lon = _split_at(lat, lon, lon_lines, along_lat=False)
+
+    # 1. 各段所在图块行及 ICSGeo 水平范围
+    lat0, lat1 = lat[:-1], lat[1:]
+    lon0, lon1 = lon[:-1], lon[1:]
+    wrap = 360.0 * np.floor(((lon0 + lon1) / 2 + 180) / 360)
+    x0 = (lon0 - wrap) * np.cos(np.radians(lat0))
+    x1 = (lon1 - wrap) * np.cos(np.radians(lat1))
+    rows = np.clip(np.floor((90 - (lat0 + lat1) / 2) / 10), 0, 17).astype(int)
+    # 与纬度带边界重合的水平段只属于多边形内部一侧的行, 由第2步在该侧的边界线区间中标记;
+    # 与180度经线重合的经线段在两侧分别对应 x = +-180 * cos(lat), 无法按中点判断属于哪一侧, 同样跳过.
+    # 行内其余边界连通了这两类段的端点, 且它们在行内 x 单调, 跳过后水平范围不变
+    on_line = (lat0 == lat1) & (lat0 % 10 == 0)
+    on_line |= (lon0 == lon1) & ((lon0 - 180) % 360 == 0)
+    _mark(covered, rows[~on_line], np.minimum(x0, x1)[~on_line], np.maximum(x0, x1)[~on_line])
+
+    # 2. 纬度带边界线上位于多边形内部的区间, 分别按边界线以北/以南紧邻处计算:
+    #    顶点恰好在边界线上时, 以北一侧视其在线以南(<=), 以南一侧视其在线以北(<), 即把扫描线向该侧平移一个无穷小量,
+    #    这样重合于边界线的边只计入内部一侧的行, 仅在边界线上接触的多边形不会标记另一侧的行
+    lines = np.arange(1, 18)
+    line_lats = _ROW_LATS[lines]
+    for below, row_offset in ((np.less_equal, -1), (np.less, 0)):
+        cross = below(lat0[:, None], line_lats) != below(lat1[:, None], line_lats)
+        edge, line = np.nonzero(cross)
+        if edge.size == 0:
+            continue
+        t = (line_lats[line] - lat0[edge]) / (lat1[edge] - lat0[edge])
+        lon_cross = lon0[edge] + t * (lon1[edge] - lon0[edge])
+        order = np.lexsort((lon_cross, line))
+        line, lon_cross = line[order], lon_cross[order]
+        lon_a, lon_b, line = lon_cross[0::2], lon_cross[1::2], lines[line[0::2]]
+        # 零宽区间(顶点从另一侧接触边界线)仅为接触
+        keep = lon_b > lon_a
+        lon_a, lon_b, line = lon_a[keep], lon_b[keep], line[keep]
+        if line.size == 0:
+            continue
+        # 区间可能跨越180度经线, 拆分到 [-180, 180] 内
+        k_lo = np.floor((lon_a + 180) / 360).astype(int)
+        k_hi = np.ceil((lon_b + 180) / 360).astype(int) - 1
+        for k in range(int(k_lo.min()), int(k_hi.max()) + 1):
+            sel = (k_lo <= k) & (k_hi >= k)
+            a = np.maximum(lon_a[sel] - 360 * k, -180)
+            b = np.minimum(lon_b[sel] - 360 * k, 180)
+            cos_lat = np.cos(np.radians(_ROW_LATS[line[sel]]))
+            # 边界线 k 是第 k-1 行的下边界, 第 k 行的上边界
+            _mark(covered, line[sel] + row_offset, a * cos_lat, b * cos_lat)
+
+
+def _polygon_rings(polygon, crs=None, holes: bool = False) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    将多边形输入统一为经纬度环列表 [(lat, lon), ...]
+    内环(洞)只会缩小覆盖范围, 图块查询按保守结果忽略; holes 为True时一并返回(用于按奇偶规则栅格化)
+    """
+    if isinstance(polygon, dict) or hasattr(polygon, "__geo_interface__"):
+        geometry = getattr(polygon, "__geo_interface__", polygon)
+        if geometry.get("type") == "Feature":
+            geometry = geometry["geometry"]
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"geometry type({geometry['type']}) should be in ['Polygon', 'MultiPolygon']")
+        # GeoJSON 坐标顺序为 (x, y), 即 (lon, lat)
+        xy_rings = [
+            np.asarray(ring, dtype=float)[:, :2]
+            for coordinates in polygons
+            for ring in (coordinates if holes else coordinates[:1])
+        ]
+    else:
+        ring = np.asarray(polygon, dtype=float)
+        if ring.ndim != 2 or ring.shape[1] != 2:
+            raise ValueError("polygon should be an array of shape (N, 2)")
+        if crs is None:
+            return [(ring[:, 0], ring[:, 1])]
+        xy_rings = [ring]
+    if crs is None:
+        return [(ring[:, 1], ring[:, 0]) for ring in xy_rings]
+    from pyproj import Transformer
+
+    transformer = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+    rings = []
+    for ring in xy_rings:
+        lon, lat = transformer.transform(ring[:, 0], ring[:, 1])
+        rings.append((np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)))
+    return rings
+
+
+def tiles_in_polygon(polygon, crs=None, land_only: bool = False, max_segment_degrees: float = 0.25) -> List[str]:
+    """
+    获取与多边形相交的图块编号
+    :param polygon: (N, 2) 顶点数组, crs 为 None 时为 (lat, lon), 否则为该坐标系下的 (x, y);
+                    也可为带 __geo_interface__ 的对象(如shapely几何)或 GeoJSON 字典, 其坐标按 (x, y) 即 (lon, lat) 解释
+    :param crs: 多边形顶点所在坐标系, 任何 pyproj 可识别的输入; None 表示经纬度
+    :param land_only: 仅返回 MODIS_SINUSOIDAL_TILE_USED 中的陆地图块
+    :param max_segment_degrees: 边加密的最大步长(度)
+    :return: 按 hv 排序的图块编号列表, 如 ["h26v05", "h27v05"]
+    """
+    covered = np.zeros((18, 36), dtype=bool)
+    for lat, lon in _polygon_rings(polygon, crs):
+        if lat.size < 3:
+            raise ValueError("polygon should have at least 3 vertices")
+        _mark_ring(covered, lat, lon, max_segment_degrees)
+    return _covered_to_hv(covered, land_only)
+
+
+def tiles_in_bbox(
+    lat_min: float, lon_min: float, lat_max: float, lon_max: float, land_only: bool = False
+) -> List[str]:
+    """
+    获取与经纬度矩形相交的图块编号
+    lon_min > lon_max 时表示矩形跨越180度经线
+    :return: 按 hv 排序的图块编号列表
+    """
+    Sinusoidal._check_geo(lat_min, lon_min)
+    Sinusoidal._check_geo(lat_max, lon_max)
+    if lat_min > lat_max:
+        raise ValueError(f"lat_min({lat_min}) should not be greater than lat_max({lat_max})")
+    if lon_min > lon_max:
+        lon_max += 360
+    # 上下两条纬线边各拆为4段, 保证相邻顶点经度差小于180度, 展开时不会被误判为跨越180度经线
+    lon_edge = np.linspace(lon_min, lon_max, 5)
+    lat = np.concatenate([np.full(5, lat_max), np.full(5, lat_min), [lat_max]]).astype(float)
+    lon = np.concatenate([lon_edge, lon_edge[::-1], [lon_min]]).astype(float)
+    covered = np.zeros((18, 36), dtype=bool)
+    # 经线边在纬度带内单调, 纬线边在 ICSGeo 中为水平线, 无需细密加密即为精确结果
+    _mark_ring(covered, lat, lon, max_segment_degrees=90.0)
+    return _covered_to_hv(covered, land_only)
+
+
+def tiles_of_points(lat_gcs, lon_gcs, land_only: bool = False) -> Tuple[List[str], np.ndarray]:
+    """
+    一次向量化计算所有点所在的图块
+    :param lat_gcs: 纬度数组
+    :param lon_gcs: 经度数组
+    :param land_only: 非陆地图块上的点视为无效
+    :return: (tiles, index), tiles 为点所落入图块的编号列表(按 hv 排序),
+             index 为每个点在 tiles 中的下标, 非法点(或 land_only 时落在非陆地图块的点)为 -1
+    """
+    lat_gcs, lon_gcs = np.broadcast_arrays(np.asarray(lat_gcs, dtype=float), np.asarray(lon_gcs, dtype=float))
+    valid = Sinusoidal.valid_geo(lat_gcs, lon_gcs)
+    lat = np.where(valid, lat_gcs, 0.0)
+    lon_tile = np.where(valid, lon_gcs, 0.0) * np.cos(np.radians(lat))
+    vertical_tile = np.clip(np.floor((90 - lat) / 10), 0, 17).astype(int)
+    horizontal_tile = np.clip(np.floor((lon_tile + 180) / 10), 0, 35).astype(int)
+    if land_only:
+        valid &= Sinusoidal.tile_table().is_land[vertical_tile, horizontal_tile]
+    # h 在高位, 使排序结果与 hv 字符串顺序一致
+    code = np.where(valid, horizontal_tile * 18 + vertical_tile, -1)
+    codes, inverse = np.unique(code, return_inverse=True)
+    inverse = inverse.reshape(code.shape)
+    if codes.size and codes[0] == -1:
+        codes = codes[1:]
+        inverse = inverse - 1
+    tiles = [f"h{c // 18:02d}v{c % 18:02d}" for c in codes.tolist()]
+    return tiles, inverse
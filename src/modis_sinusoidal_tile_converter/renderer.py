@@ -1,56 +1,161 @@
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import os
 from pathlib import Path
-from PIL import Image
-from matplotlib import colormaps
+from typing import TYPE_CHECKING, Dict, Iterable, Sequence, Tuple, Union
+
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+from modis_sinusoidal_tile_converter.stats import first_arg_size, instrument
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+@lru_cache(maxsize=32)
+def _colormap_lut(colormap: str, n: int) -> np.ndarray:
+    """构建色带的uint8 RGBA查找表, 形状为(n + 1, 4), 最后一项为无效值(bad)颜色; 按(色带, 级数)缓存, 超出容量时淘汰最久未用的"""
+    # matplotlib仅在首次构建查找表时导入
+    from matplotlib import colormaps
+
+    cmap = colormaps[colormap].resampled(n) if colormaps[colormap].N != n else colormaps[colormap]
+    lut = np.empty((n + 1, 4), dtype=np.uint8)
+    lut[:n] = (cmap(np.arange(n)) * 255).astype(np.uint8)
+    lut[n] = (np.asarray(cmap.get_bad()) * 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
 
 class Renderer:
     """瓦片渲染器
-    
+
     将瓦片数据渲染为各种格式的图像
     """
 
+    # quantize 每次处理的元素个数, 决定float32中间数组的大小
+    quantize_chunk_size = 1 << 20
+
     @staticmethod
-    def clip_and_normalize(data, vmin=0, vmax=1):
+    def clip_and_normalize(data, vmin=0, vmax=1, out=None):
         """剪裁和归一化数据
-        
+
+        Args:
+            data: 输入数据数组
+            vmin: 数据范围最小值
+            vmax: 数据范围最大值
+            out: 可选的输出数组(可为data本身以原地计算), 为None时分配新数组
+        """
+        data = np.asarray(data)
+        if out is None:
+            out = np.empty(data.shape, dtype=data.dtype if data.dtype.kind == "f" else np.float64)
+        np.clip(data, vmin, vmax, out=out)
+        out -= vmin
+        out /= vmax - vmin
+        return out
+
+    @staticmethod
+    def get_lut(colormap: str = "gray", n: int = 256) -> np.ndarray:
+        """获取色带的uint8 RGBA查找表(只读), 形状为(n + 1, 4), 下标n为无效值颜色
+
+        Args:
+            colormap: 色带名称
+            n: 量化级数
+        """
+        return _colormap_lut(colormap, n)
+
+    @staticmethod
+    @instrument("renderer.quantize", items=first_arg_size)
+    def quantize(data: np.ndarray, vmin=0, vmax=1, n: int = 256, out: np.ndarray = None) -> np.ndarray:
+        """将数据一次性量化为[0, n)的色带下标, 与matplotlib色带的分箱规则一致
+
         Args:
             data: 输入数据数组
             vmin: 数据范围最小值
             vmax: 数据范围最大值
+            n: 量化级数
+            out: 可选的下标输出数组, 为None时分配(n <= 256时为uint8)
+
+        NaN 量化为 0, 需由调用方通过掩膜另行处理
         """
-        data = np.clip(data, vmin, vmax)
-        data = (data - vmin) / (vmax - vmin)
-        return data
+        data = np.asarray(data)
+        if out is None:
+            out = np.empty(data.shape, dtype=np.uint8 if n <= 256 else np.uint16)
+        if data.ndim == 0:
+            return Renderer.quantize(data[np.newaxis], vmin, vmax, n, out[np.newaxis])[0]
+        # 按行分块处理, 仅复用一个较小的float32中间数组, 其余运算均原地进行
+        step = max(1, Renderer.quantize_chunk_size // max(1, data[0].size))
+        scratch = np.empty((min(step, data.shape[0]),) + data.shape[1:], dtype=np.float32)
+        scale = n / (vmax - vmin)
+        for start in range(0, data.shape[0], step):
+            stop = min(start + step, data.shape[0])
+            buf = scratch[: stop - start]
+            np.subtract(data[start:stop], vmin, out=buf, casting="unsafe")
+            buf *= scale
+            np.clip(buf, 0, n - 1, out=buf)
+            np.nan_to_num(buf, copy=False, nan=0)
+            # 非负数的截断即向下取整
+            np.copyto(out[start:stop], buf, casting="unsafe")
+        return out
 
     @staticmethod
-    def to_image(rgba) -> Image.Image:
+    def to_image(rgba) -> "Image.Image":
+        from PIL import Image
+
         return Image.fromarray(rgba, mode='RGBA')
 
 
     @staticmethod
-    def to_rgba(data: np.ndarray, nan_mask: np.ndarray = None, colormap: str = "gray") -> np.ndarray:
-        # 应用色带
-        cmap = colormaps[colormap]
-        rgba = cmap(data)  # 返回RGBA数组，shape为(H, W, 4)
-        
-        # 将RGBA从0-1范围转换到0-255
-        rgba = (rgba * 255).astype(np.uint8)
-        
-        # 将nan位置设为完全透明
-        rgba[nan_mask, 3] = 0
-        
+    @instrument("renderer.to_rgba", items=first_arg_size)
+    def to_rgba(data: np.ndarray, nan_mask: np.ndarray = None, colormap: str = "gray", n: int = 256) -> np.ndarray:
+        """将量化下标或[0, 1]归一化数据通过查找表映射为uint8 RGBA
+
+        Args:
+            data: 整数下标数组(来自quantize), 或[0, 1]范围的浮点数组
+            nan_mask: 无效值掩膜, 对应位置使用色带的无效值颜色(默认完全透明)
+            colormap: 色带名称
+            n: 量化级数
+        """
+        if data.dtype.kind == "f":
+            if nan_mask is None:
+                nan_mask = np.isnan(data)
+            data = Renderer.quantize(data, 0, 1, n)
+        return Renderer.apply_lut(data, Renderer.get_lut(colormap, n), nan_mask)
+
+    @staticmethod
+    def apply_lut(index: np.ndarray, lut: np.ndarray, nan_mask: np.ndarray = None) -> np.ndarray:
+        """通过查找表将量化下标映射为uint8 RGBA, nan_mask 对应位置使用查找表最后一项(无效值颜色)"""
+        # 将每行RGBA视为一个uint32, 花式索引按块转换下标, 不会像np.take那样先生成完整的intp下标数组
+        rgba = lut.view(np.uint32)[:, 0][index].view(np.uint8).reshape(index.shape + (4,))
+
+        # 将nan位置设为无效值颜色
+        if nan_mask is not None:
+            rgba[nan_mask] = lut[-1]
+
         return rgba
-    
+
     @staticmethod
-    def save(image: Image.Image, output_path: str, format: str = "PNG"):
+    @instrument("renderer.save")
+    def save(image: "Image.Image", output_path: str, format: str = "PNG", **options):
+        """保存图像
+
+        Args:
+            image: PIL图像
+            output_path: 输出文件路径
+            format: 输出文件格式
+            options: 传递给PIL编码器的参数, 用于在速度与体积/质量之间取舍, 如
+                     WEBP: quality(0~100), method(0最快~6最慢, 默认4), lossless;
+                     PNG: compress_level(0~9, 默认6, 1最快), optimize
+        """
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        image.save(output_path, format)
-    
+        image.save(output_path, format, **options)
+
     @staticmethod
+    @instrument("renderer.render_single_band", items=first_arg_size)
     def render_single_band(data: np.ndarray, output_path: str=None, format: str="WEBP", colormap: str = "gray",
-                       vmin=0, vmax=1, nan_value=None):
-        """渲染为彩色图像（使用matplotlib色带）
-        
+                       vmin=0, vmax=1, nan_value=None, n: int = 256, **options):
+        """渲染为彩色图像（使用matplotlib色带的uint8查找表）
+
         Args:
             data: 输入数据数组
             output_path: 输出文件路径
@@ -58,23 +163,111 @@ class Renderer:
             colormap: 色带名称，如 'viridis', 'jet', 'plasma' 等
             vmin: 数据范围最小值
             vmax: 数据范围最大值
-            nan_value: 指定哪个值应被视为NaN，如果为None，则使用np.isnan(data)
+            nan_value: 指定哪个值应被视为NaN，NaN本身始终视为无效值
+            n: 色带量化级数
+            options: 编码器参数, 见 save
         """
         if data.ndim != 2:
             raise ValueError("数据必须是2D数组")
-        data_copy = data.copy()
-
-        # 处理nan_value
-        nan_mask = np.zeros_like(data_copy, dtype=bool)
-        if nan_value is not None:
-            nan_mask[data_copy == nan_value] = True
-        else:
-            nan_mask = np.isnan(data_copy)
 
-        clipped_data = Renderer.clip_and_normalize(data_copy, vmin, vmax)
-        rgba = Renderer.to_rgba(clipped_data, nan_mask, colormap)
+        index, nan_mask = Renderer._quantize_with_mask(data, vmin, vmax, nan_value, n)
+        rgba = Renderer.to_rgba(index, nan_mask, colormap, n)
         image = Renderer.to_image(rgba)
         if output_path is not None:
-            Renderer.save(image, output_path, format)
+            Renderer.save(image, output_path, format, **options)
         return image
-    
\ No newline at end of file
+
+    @staticmethod
+    def _quantize_with_mask(data: np.ndarray, vmin, vmax, nan_value, n: int):
+        """量化数据并生成无效值掩膜, 不复制输入数据"""
+        nan_mask = np.isnan(data) if data.dtype.kind == "f" else np.zeros(data.shape, dtype=bool)
+        if nan_value is not None:
+            nan_mask |= data == nan_value
+        return Renderer.quantize(data, vmin, vmax, n), nan_mask
+
+    @staticmethod
+    @instrument("renderer.render_batch")
+    def render_batch(
+        items: Union[np.ndarray, Iterable[Tuple[str, object, np.ndarray]]],
+        output_template: str,
+        format: str = "WEBP",
+        colormap: str = "gray",
+        vmin=0,
+        vmax=1,
+        nan_value=None,
+        n: int = 256,
+        hv: str = None,
+        dates: Sequence = None,
+        max_workers: int = None,
+        max_pending: int = None,
+        **options,
+    ) -> Dict[Tuple[str, object], str]:
+        """批量渲染图块时间序列, 在进程池中量化, 着色并编码, 各进程直接写出文件
+
+        整批共用同一组 vmin/vmax 与色带查找表(只在当前进程构建一次); items 依次取出, 进行中的数组数不超过 max_pending,
+        内存占用与批次大小无关.
+
+        Args:
+            items: (hv, date, array) 的可迭代对象, 或形状为 (T, H, W) 的数组(需同时给出 hv 与 dates)
+            output_template: 输出路径模板, 可用字段 {hv}, {h}, {v}, {date}, date 为日期对象时可带格式, 如 "{hv}/{date:%Y%j}.webp"
+            format: 输出文件格式
+            colormap: 色带名称
+            vmin: 数据范围最小值
+            vmax: 数据范围最大值
+            nan_value: 指定哪个值应被视为NaN，NaN本身始终视为无效值
+            n: 色带量化级数
+            hv: items 为数组时的图块编号
+            dates: items 为数组时每一层的日期
+            max_workers: 并行进程数, 为1时在当前进程中依次渲染
+            max_pending: 同时持有的最大数组个数, 默认 2 * max_workers
+            options: 编码器参数, 见 save, 如 method=0, lossless=True, compress_level=1
+
+        Returns:
+            {(hv, date): 输出路径}
+        """
+        if isinstance(items, np.ndarray):
+            if hv is None or dates is None or len(dates) != len(items):
+                raise ValueError("hv and dates (one per layer) are required when items is an array")
+            items = ((hv, date, layer) for date, layer in zip(dates, items))
+        lut = Renderer.get_lut(colormap, n)
+        common = {"format": format, "lut": lut, "vmin": vmin, "vmax": vmax, "nan_value": nan_value, "n": n,
+                  "options": options}
+
+        def tasks():
+            for item_hv, date, data in items:
+                h, v = Sinusoidal.parse_hv(item_hv)
+                item_hv = f"h{h:02d}v{v:02d}"
+                path = output_template.format(hv=item_hv, h=h, v=v, date=date)
+                yield (item_hv, date), dict(common, data=data, output_path=path)
+
+        outputs = {}
+        if max_workers == 1:
+            for key, task in tasks():
+                outputs[key] = _render_task(task)
+            return outputs
+        # 进行中的任务数不超过 max_pending, 按提交顺序收集结果
+        max_workers = max_workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * max_workers
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for key, task in tasks():
+                pending.append((key, executor.submit(_render_task, task)))
+                if len(pending) >= max_pending:
+                    key, future = pending.popleft()
+                    outputs[key] = future.result()
+            while pending:
+                key, future = pending.popleft()
+                outputs[key] = future.result()
+        return outputs
+
+
+def _render_task(task: dict) -> str:
+    """在工作进程中渲染并写出一个数组, 使用传入的查找表, 工作进程无需导入matplotlib"""
+    data = np.asarray(task["data"])
+    if data.ndim != 2:
+        raise ValueError("数据必须是2D数组")
+    index, nan_mask = Renderer._quantize_with_mask(data, task["vmin"], task["vmax"], task["nan_value"], task["n"])
+    image = Renderer.to_image(Renderer.apply_lut(index, task["lut"], nan_mask))
+    Renderer.save(image, task["output_path"], task["format"], **task["options"])
+    return task["output_path"]
+
@@ -0,0 +1,152 @@
+"""
+从图块GeoTIFF批量提取点值
+
+先一次向量化计算所有点所在的图块及行列号, 再按图块分组: 每个图块文件只打开一次,
+按文件内部分块把该图块内的点再分组, 每组只读取覆盖其中点的最小窗口, 结果按输入顺序返回.
+可选线程池并行处理多个图块(GDAL读取时释放GIL).
+
+>>> values = sample_tiles([lat, lon], "/data/NDVI.{hv}.tif", grid="500m", max_workers=8)
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.bulk import convert_points
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.stats import instrument
+
+__all__ = ["locate_points", "sample_tiles"]
+
+# 读取窗口网格的最小边长, 条带存储(每块只有一行或几行)的文件按该行数合并读取
+_MIN_WINDOW = 256
+
+
+def locate_points(coords: Sequence[np.ndarray], src: str = "gcs", grid: Union[str, Grid] = "1km"):
+    """
+    计算点所在的图块编码及像元行列号
+    :param coords: 源坐标系各列数组, 顺序同 bulk.COLUMNS[src]
+    :param src: 源坐标系, "gcs", "pcs" 或 "tile"
+    :param grid: 网格名称或 Grid 对象
+    :return: (code, row, col), code 为 h * 18 + v, 超出范围的点为-1; row/col 为整数像元行列号
+    """
+    grid = get_grid(grid)
+    vertical_tile, horizontal_tile, line, sample = convert_points(coords, src, "tile", grid)
+    vertical_tile = np.atleast_1d(vertical_tile).astype(np.int64)
+    horizontal_tile = np.atleast_1d(horizontal_tile).astype(np.int64)
+    invalid = (vertical_tile < 0) | np.isnan(line) | np.isnan(sample)
+    code = np.where(invalid, -1, horizontal_tile * 18 + vertical_tile)
+    # 行列号以像元中心为整数, 像元边界为 .5; 图块外边缘上的点归入最后一行/列
+    last = grid.pixels_per_tile - 1
+    row = np.clip(np.floor(np.where(invalid, 0, line) + 0.5), 0, last).astype(np.int64)
+    col = np.clip(np.floor(np.where(invalid, 0, sample) + 0.5), 0, last).astype(np.int64)
+    return np.atleast_1d(code), np.atleast_1d(row), np.atleast_1d(col)
+
+
+def _sample_tile(task: dict) -> np.ndarray:
+    """读取一个图块内全部点的值, 在线程池中执行"""
+    import rasterio as rio
+    from rasterio.windows import Window
+
+    path, row, col = task["path"], task["row"], task["col"]
+    pixels = task["pixels"]
+    with rio.open(path) as ds:
+        if ds.width != pixels or ds.height != pixels:
+            raise ValueError(f"{path} has shape ({ds.height}, {ds.width}), expected ({pixels}, {pixels})")
+        bands = task["bands"] or list(range(1, ds.count + 1))
+        block_height, block_width = ds.block_shapes[bands[0] - 1]
+        cell_height = max(block_height, _MIN_WINDOW)
+        cell_width = max(block_width, _MIN_WINDOW)
+        nodata = ds.nodata
+        values = np.empty((len(bands), row.size), dtype=task["dtype"])
+        # 按读取窗口网格分组, 每组读取包含其中所有点的最小矩形
+        cell = (row // cell_height) * (pixels // cell_width + 1) + col // cell_width
+        order = np.argsort(cell, kind="stable")
+        starts = np.flatnonzero(np.diff(cell[order])) + 1
+        for group in np.split(order, starts):
+            rows, cols = row[group], col[group]
+            row0, col0 = rows.min(), cols.min()
+            window = Window(col0, row0, cols.max() - col0 + 1, rows.max() - row0 + 1)
+            data = ds.read(bands, window=window)
+            values[:, group] = data[:, rows - row0, cols - col0]
+        if task["mask_nodata"] and nodata is not None:
+            nodata_mask = np.isnan(values) if np.isnan(nodata) else values == nodata
+            values[nodata_mask] = task["fill_value"]
+    return values
+
+
+def _tile_path(path_template: str, code: int, grid: Grid) -> str:
+    h, v = divmod(int(code), 18)
+    return path_template.format(hv=f"h{h:02d}v{v:02d}", h=h, v=v, grid=grid.name)
+
+
+@instrument("sample.sample_tiles", items=lambda coords, *args, **kwargs: int(np.size(coords[0])))
+def sample_tiles(
+    coords: Sequence[np.ndarray],
+    path_template: str,
+    src: str = "gcs",
+    grid: Union[str, Grid] = "1km",
+    bands: Sequence[int] = None,
+    fill_value=np.nan,
+    dtype="float64",
+    mask_nodata: bool = True,
+    max_workers: int = None,
+) -> np.ndarray:
+    """
+    从按图块存储的GeoTIFF(如 convert.array2tiff / split.split_raster_to_tiles 的输出)中提取点值
+    :param coords: 源坐标系各列数组, 顺序同 bulk.COLUMNS[src], 如 [lat, lon]
+    :param path_template: 图块文件路径模板, 可用字段 {hv}, {h}, {v}, {grid}, 如 "/data/NDVI.{hv}.tif"
+    :param src: 源坐标系, "gcs", "pcs" 或 "tile"
+    :param grid: 图块网格名称或 Grid 对象, 需与文件一致
+    :param bands: 需要提取的波段号(从1开始), 默认全部波段(各文件波段数需一致)
+    :param fill_value: 无效点, 缺失图块(如未写出的海洋图块)及nodata像元的填充值
+    :param dtype: 结果数据类型
+    :param mask_nodata: 是否将等于文件nodata的值替换为 fill_value
+    :param max_workers: 并行线程数, 为1时在当前线程中依次处理
+    :return: 单波段时形状为 (n,), 多波段时为 (n, bands), 与输入点顺序一致
+    """
+    grid = get_grid(grid)
+    code, row, col = locate_points(coords, src, grid)
+    order = np.argsort(code, kind="stable")
+    sorted_code = code[order]
+    starts = np.flatnonzero(np.diff(sorted_code)) + 1
+    tasks, groups = [], []
+    for group in np.split(order, starts):
+        if group.size == 0 or code[group[0]] < 0:
+            continue
+        path = _tile_path(path_template, code[group[0]], grid)
+        if not os.path.exists(path):
+            continue
+        groups.append(group)
+        tasks.append(
+            {
+                "path": path,
+                "row": row[group],
+                "col": col[group],
+                "pixels": grid.pixels_per_tile,
+                "bands": list(bands) if bands else None,
+                "fill_value": fill_value,
+                "dtype": dtype,
+                "mask_nodata": mask_nodata,
+            }
+        )
+    if max_workers == 1:
+        results = map(_sample_tile, tasks)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        results = executor.map(_sample_tile, tasks)
+    out = None
+    try:
+        for task, group, values in zip(tasks, groups, results):
+            if out is None:
+                out = np.full((values.shape[0], code.size), fill_value, dtype=dtype)
+            elif values.shape[0] != out.shape[0]:
+                raise ValueError(f"band count of {task['path']} does not match the other tiles")
+            out[:, group] = values
+    finally:
+        if max_workers != 1:
+            executor.shutdown()
+    if out is None:
+        out = np.full((len(bands) if bands else 1, code.size), fill_value, dtype=dtype)
+    return out[0] if out.shape[0] == 1 else out.T
@@ -1,12 +1,43 @@
 import math
+from functools import lru_cache
 
-from pyproj import CRS, Proj
-from typing import Tuple
-from rasterio import Affine
+import numpy as np
+
+from typing import TYPE_CHECKING, List, Tuple, Union
+
+from modis_sinusoidal_tile_converter._lazy import lazy_class_attribute
+from modis_sinusoidal_tile_converter.grid import GRID_1KM, GRID_250M, GRID_500M, Grid, get_grid
+from modis_sinusoidal_tile_converter.stats import first_arg_size, instrument
+
+if TYPE_CHECKING:
+    from affine import Affine
+    from pyproj import CRS
 
 __all__ = ["Sinusoidal"]
 
 
+def _is_scalar(*values) -> bool:
+    """判断输入是否全部为标量"""
+    for value in values:
+        # Python数值(及np.float64)直接判断, 避免np.ndim的开销
+        if not isinstance(value, (int, float)) and np.ndim(value) != 0:
+            return False
+    return True
+
+
+def _round(value: float, ndigits: int) -> float:
+    """与 np.round 相同的标量舍入(先乘10的幂, 再四舍六入五成双, 再除回), 保证标量与数组结果逐位一致"""
+    scale = 10.0 ** ndigits
+    return round(value * scale) / scale
+
+
+def _to_output(value):
+    """0维结果还原为Python标量, 数组结果原样返回"""
+    if np.ndim(value) == 0:
+        return np.asarray(value).item()
+    return value
+
+
 class Sinusoidal:
     """
     Sinusoidal正弦投影
@@ -22,150 +53,273 @@ class Sinusoidal:
     ICSTile: Tile/Image Coordinates System, 用图块编号表示的平铺/影像坐标系:
             垂直图块号(vertical_tile), 数值范围为0~17;
             水平图块号(horizontal_tile), 数值范围为0~35;
-            垂直行号(line), 数值范围为-0.5~1199.5(1km)2399.5(500m);
-            水平列号(sample), 数值范围为-0.5~1199.5(1km)2399.5(500m);
+            垂直行号(line), 数值范围为-0.5~1199.5(1km)2399.5(500m)4799.5(250m);
+            水平列号(sample), 数值范围为-0.5~1199.5(1km)2399.5(500m)4799.5(250m);
 
     ICSGeo: Geographic Tile/Image Coordinate System, 用经纬度表示的平铺/影像坐标系:
             纬度(lat_tile), 数值范围为-90~90;
             经度(lon_tile), 数值范围为-180~180;
 
     注意: 此处图块左上角的像素中心坐标为 (0.0, 0.0), 图块左上角的像素左上角坐标为 (-0.5, -0.5)
+
+    所有坐标转换均支持标量与NumPy数组输入(按广播规则), 标量输入返回标量, 数组输入返回数组;
+    标量输入超出范围时抛出ValueError, 数组输入中超出范围的元素置为NaN(图块号置为-1), 可配合valid_geo/valid_tile获取有效掩膜
     """
 
     wkt = 'PROJCS["MODIS_Sinusoidal",GEOGCS["GCS_Sphere",DATUM["D_Sphere",SPHEROID["Sphere",6371007.181,0]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]],PROJECTION["Sinusoidal"],PARAMETER["longitude_of_center",0],PARAMETER["false_easting",0],PARAMETER["false_northing",0],UNIT["metre",1,AUTHORITY["EPSG","9001"]]]'
 
-    tile_size_meters_1km = 926.625433055833
-    tile_size_meters_500m = 463.312716527917
-    tile_size_meters_250m = 231.656358263958
+    earth_radius = 6371007.181
+
+    tile_size_meters_1km = GRID_1KM.pixel_size
+    tile_size_meters_500m = GRID_500M.pixel_size
+    tile_size_meters_250m = GRID_250M.pixel_size
     tile_meters_ulx = -20015109.354
     tile_meters_uly = 10007554.677
     
 
-    crs = CRS.from_wkt(wkt)
+    @lazy_class_attribute
+    def crs():
+        """投影坐标系, 首次访问时才导入pyproj并构建"""
+        from pyproj import CRS
+
+        return CRS.from_wkt(Sinusoidal.wkt)
 
     default_precision = 8
 
     @staticmethod
-    def _check_tile(vertical_tile: int, horizontal_tile: int):
-        """检查图块编号是否合法"""
-        if vertical_tile < 0 or vertical_tile > 17:
+    def valid_tile(vertical_tile, horizontal_tile):
+        """图块编号有效性掩膜
+        :param vertical_tile: 垂直图块号, 标量或数组
+        :param horizontal_tile: 水平图块号, 标量或数组
+        :return: 与输入广播后形状一致的布尔掩膜, True表示合法"""
+        vertical_tile = np.asarray(vertical_tile)
+        horizontal_tile = np.asarray(horizontal_tile)
+        return (vertical_tile >= 0) & (vertical_tile <= 17) & (horizontal_tile >= 0) & (horizontal_tile <= 35)
+
+    @staticmethod
+    def valid_geo(lat, lon):
+        """经纬度有效性掩膜, NaN视为非法
+        :param lat: 纬度, 标量或数组
+        :param lon: 经度, 标量或数组
+        :return: 与输入广播后形状一致的布尔掩膜, True表示合法"""
+        lat = np.asarray(lat)
+        lon = np.asarray(lon)
+        return (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)
+
+    @staticmethod
+    def _check_tile(vertical_tile, horizontal_tile):
+        """检查图块编号是否合法
+        标量输入非法时抛出异常, 数组输入返回有效掩膜(非法元素由调用方置为NaN)"""
+        if not _is_scalar(vertical_tile, horizontal_tile):
+            return Sinusoidal.valid_tile(vertical_tile, horizontal_tile)
+        if not 0 <= vertical_tile <= 17:
             raise ValueError(f"vertical_tile({vertical_tile}) should be in range of [0, 17]")
-        if horizontal_tile < 0 or horizontal_tile > 35:
+        if not 0 <= horizontal_tile <= 35:
             raise ValueError(f"horizontal_tile({horizontal_tile}) should be in range of [0, 35]")
+        return True
 
     @staticmethod
-    def _check_geo(lat: float, lon: float):
-        """检查经纬度是否合法"""
-        if lat < -90 or lat > 90:
+    def _check_geo(lat, lon):
+        """检查经纬度是否合法
+        标量输入非法时抛出异常, 数组输入返回有效掩膜(非法元素由调用方置为NaN)"""
+        if not _is_scalar(lat, lon):
+            return Sinusoidal.valid_geo(lat, lon)
+        if not -90 <= lat <= 90:
             raise ValueError(f"lat({lat}) should be in range of [-90, 90]")
-        if lon < -180 or lon > 180:
-            raise ValueError(f"lon({lat}) should be in range of [-180, 180]")
+        if not -180 <= lon <= 180:
+            raise ValueError(f"lon({lon}) should be in range of [-180, 180]")
+        return True
 
     @staticmethod
+    @instrument("sinusoidal.ICSTile2ICSGeo", items=first_arg_size)
     def ICSTile2ICSGeo(vertical_tile, horizontal_tile, line, sample, grid="1km"):
         """转换平铺坐标系到地理影像坐标系
         :param vertical_tile: 垂直图块号
         :param horizontal_tile: 水平图块号
         :param line: 垂直行号
         :param sample: 水平列号
-        :return: (lat_tile, lon_tile), 纬度为南北方向, 经度为东西方向"""
-        Sinusoidal._check_tile(vertical_tile, horizontal_tile)
-        if grid == "1km":
-            lat_tile = 90 - vertical_tile * 10 - (line + 0.5) / 120
-            lon_tile = -180 + horizontal_tile * 10 + (sample + 0.5) / 120
-        elif grid == "500m":
-            lat_tile = 90 - vertical_tile * 10 - (line + 0.5) / 240
-            lon_tile = -180 + horizontal_tile * 10 + (sample + 0.5) / 240
-        else:
-            raise ValueError(f"grid({grid}) should be in ['1km', '500m']")
-        return lat_tile, lon_tile
+        :param grid: 网格名称或 Grid 对象
+        :return: (lat_tile, lon_tile), 纬度为南北方向, 经度为东西方向; 数组输入中非法图块对应位置为NaN"""
+        valid = Sinusoidal._check_tile(vertical_tile, horizontal_tile)
+        pixels = get_grid(grid).pixels_per_degree
+        # 标量输入走纯Python计算, 避免NumPy 0维数组的开销
+        if valid is True and _is_scalar(line, sample):
+            lat_tile = 90 - vertical_tile * 10 - (line + 0.5) / pixels
+            lon_tile = -180 + horizontal_tile * 10 + (sample + 0.5) / pixels
+            return float(lat_tile), float(lon_tile)
+        lat_tile = 90 - np.asarray(vertical_tile) * 10 - (np.asarray(line) + 0.5) / pixels
+        lon_tile = -180 + np.asarray(horizontal_tile) * 10 + (np.asarray(sample) + 0.5) / pixels
+        if valid is not True:
+            lat_tile = np.where(valid, lat_tile, np.nan)
+            lon_tile = np.where(valid, lon_tile, np.nan)
+        return _to_output(lat_tile), _to_output(lon_tile)
 
     @staticmethod
+    @instrument("sinusoidal.ICSGeo2ICSTile", items=first_arg_size)
     def ICSGeo2ICSTile(lat_tile, lon_tile, grid="1km"):
         """转换地理影像坐标系到平铺坐标系
         :param lat_tile: 纬度
         :param lon_tile: 经度
-        :return: (vertical_tile, horizontal_tile, line, sample)"""
-        Sinusoidal._check_geo(lat_tile, lon_tile)
-        vertical_tile = int((90 - lat_tile) / 10)
-        horizontal_tile = int((lon_tile + 180) / 10)
-        if grid == "1km":
-            line = round(-(lat_tile - 90 + vertical_tile * 10) * 120 - 0.5, Sinusoidal.default_precision)
-            sample = round((180 - horizontal_tile * 10 + lon_tile) * 120 - 0.5, Sinusoidal.default_precision)
-        elif grid == "500m":
-            line = round(-(lat_tile - 90 + vertical_tile * 10) * 240 - 0.5, Sinusoidal.default_precision)
-            sample = round((180 - horizontal_tile * 10 + lon_tile) * 240 - 0.5, Sinusoidal.default_precision)
-        else:
-            raise ValueError(f"grid({grid}) should be in ['1km', '500m']")
-        return vertical_tile, horizontal_tile, line, sample
+        :param grid: 网格名称或 Grid 对象
+        :return: (vertical_tile, horizontal_tile, line, sample); 数组输入中非法位置的图块号为-1, 行列号为NaN"""
+        valid = Sinusoidal._check_geo(lat_tile, lon_tile)
+        pixels = get_grid(grid).pixels_per_degree
+        if valid is True:
+            lat_tile, lon_tile = float(lat_tile), float(lon_tile)
+            vertical_tile = min(max(math.floor((90 - lat_tile) / 10), 0), 17)
+            horizontal_tile = min(max(math.floor((lon_tile + 180) / 10), 0), 35)
+            line = _round(-(lat_tile - 90 + vertical_tile * 10) * pixels - 0.5, Sinusoidal.default_precision)
+            sample = _round((180 - horizontal_tile * 10 + lon_tile) * pixels - 0.5, Sinusoidal.default_precision)
+            return vertical_tile, horizontal_tile, line, sample
+        lat_tile, lon_tile = np.broadcast_arrays(np.asarray(lat_tile, dtype=float), np.asarray(lon_tile, dtype=float))
+        if valid is not True:
+            lat_tile = np.where(valid, lat_tile, 90.0)
+            lon_tile = np.where(valid, lon_tile, -180.0)
+        # 南极/180度经线上的点归入最后一行/列图块
+        vertical_tile = np.clip(np.floor((90 - lat_tile) / 10), 0, 17).astype(int)
+        horizontal_tile = np.clip(np.floor((lon_tile + 180) / 10), 0, 35).astype(int)
+        line = np.round(-(lat_tile - 90 + vertical_tile * 10) * pixels - 0.5, Sinusoidal.default_precision)
+        sample = np.round((180 - horizontal_tile * 10 + lon_tile) * pixels - 0.5, Sinusoidal.default_precision)
+        if valid is not True:
+            vertical_tile = np.where(valid, vertical_tile, -1)
+            horizontal_tile = np.where(valid, horizontal_tile, -1)
+            line = np.where(valid, line, np.nan)
+            sample = np.where(valid, sample, np.nan)
+        return _to_output(vertical_tile), _to_output(horizontal_tile), _to_output(line), _to_output(sample)
 
     @staticmethod
+    @instrument("sinusoidal.ICSGeo2GCS", items=first_arg_size)
     def ICSGeo2GCS(lat_tile, lon_tile):
         """转换地理影像坐标系到地理坐标系
         :param lat_tile: 纬度
         :param lon_tile: 经度
-        :return: (lat_gcs, lon_gcs), 纬度为南北方向, 经度为东西方向"""
-        Sinusoidal._check_geo(lat_tile, lon_tile)
-        lat_gcs = lat_tile
-        lon_gcs = lon_tile / math.cos(math.radians(lat_gcs))
-        return lat_gcs, lon_gcs
+        :return: (lat_gcs, lon_gcs), 纬度为南北方向, 经度为东西方向; 数组输入中非法位置为NaN"""
+        valid = Sinusoidal._check_geo(lat_tile, lon_tile)
+        if valid is True:
+            lat_gcs = float(lat_tile)
+            # 弧度制下 cos(±90°) 不为0, 无需处理除零
+            return lat_gcs, lon_tile / math.cos(math.radians(lat_gcs))
+        lat_gcs = np.asarray(lat_tile, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_gcs = np.asarray(lon_tile) / np.cos(np.radians(lat_gcs))
+        if valid is not True:
+            lat_gcs = np.where(valid, lat_gcs, np.nan)
+            lon_gcs = np.where(valid, lon_gcs, np.nan)
+        return _to_output(lat_gcs), _to_output(lon_gcs)
 
     @staticmethod
+    @instrument("sinusoidal.GCS2ICSGeo", items=first_arg_size)
     def GCS2ICSGeo(lat_gcs, lon_gcs):
         """转换地理坐标系到地理影像坐标系
         :param lat_gcs: 纬度
         :param lon_gcs: 经度
-        :return: (lat_tile, lon_tile), 纬度为南北方向, 经度为东西方向"""
-        Sinusoidal._check_geo(lat_gcs, lon_gcs)
-        lat_tile = lat_gcs
-        lon_tile = lon_gcs * math.cos(math.radians(lat_gcs))
-        return lat_tile, lon_tile
+        :return: (lat_tile, lon_tile), 纬度为南北方向, 经度为东西方向; 数组输入中非法位置为NaN"""
+        valid = Sinusoidal._check_geo(lat_gcs, lon_gcs)
+        if valid is True:
+            lat_tile = float(lat_gcs)
+            return lat_tile, lon_gcs * math.cos(math.radians(lat_tile))
+        lat_tile = np.asarray(lat_gcs, dtype=float)
+        lon_tile = np.asarray(lon_gcs) * np.cos(np.radians(lat_tile))
+        if valid is not True:
+            lat_tile = np.where(valid, lat_tile, np.nan)
+            lon_tile = np.where(valid, lon_tile, np.nan)
+        return _to_output(lat_tile), _to_output(lon_tile)
 
     @staticmethod
+    @instrument("sinusoidal.ICSTile2GCS", items=first_arg_size)
     def ICSTile2GCS(vertical_tile, horizontal_tile, line, sample, grid="1km"):
         """转换平铺坐标系到地理坐标系
         :param vertical_tile: 垂直图块号
         :param horizontal_tile: 水平图块号
         :param line: 垂直行号
         :param sample: 水平列号
+        :param grid: 网格名称或 Grid 对象
         :return: (lat_gcs, lon_gcs), 纬度为南北方向, 经度为东西方向"""
-        lat_tile, lon_tile = Sinusoidal.ICSTile2ICSGeo(vertical_tile, horizontal_tile, line, sample, grid)
+        lat_tile, lon_tile = Sinusoidal.ICSTile2ICSGeo(vertical_tile, horizontal_tile, line, sample, get_grid(grid))
         lat_gcs, lon_gcs = Sinusoidal.ICSGeo2GCS(lat_tile, lon_tile)
         return lat_gcs, lon_gcs
 
     @staticmethod
+    @instrument("sinusoidal.GCS2ICSTile", items=first_arg_size)
     def GCS2ICSTile(lat_gcs, lon_gcs, grid="1km"):
         """转换地理坐标系到平铺坐标系
         :param lat_gcs: 纬度
         :param lon_gcs: 经度
+        :param grid: 网格名称或 Grid 对象
         :return: (vertical_tile, horizontal_tile, line, sample)"""
         lat_tile, lon_tile = Sinusoidal.GCS2ICSGeo(lat_gcs, lon_gcs)
-        vertical_tile, horizontal_tile, line, sample = Sinusoidal.ICSGeo2ICSTile(lat_tile, lon_tile, grid)
+        vertical_tile, horizontal_tile, line, sample = Sinusoidal.ICSGeo2ICSTile(lat_tile, lon_tile, get_grid(grid))
         return vertical_tile, horizontal_tile, line, sample
 
     @staticmethod
-    def GCS2PCS(lat_gcs, lon_gcs):
+    @instrument("sinusoidal.GCS2PCS", items=first_arg_size)
+    def GCS2PCS(lat_gcs, lon_gcs, backend="numpy"):
         """
         地理坐标系转投影坐标系
+        MODIS正弦投影基于半径为earth_radius的正球体, 正算公式为 x = R * lon * cos(lat), y = R * lat (弧度)
         :param lat_gcs: 纬度
         :param lon_gcs: 经度
-        :return: (x, y), x 为东西方向, y 为南北方向
+        :param backend: "numpy"使用解析公式(默认, 不依赖pyproj), "pyproj"使用pyproj作为参考实现
+        :return: (x, y), x 为东西方向, y 为南北方向; 标量输入超出经纬度范围时抛出异常, 数组输入中超出范围的元素为NaN
         """
-        x, y = Proj(Sinusoidal.crs)(lon_gcs, lat_gcs)
-        return x, y
+        valid = Sinusoidal._check_geo(lat_gcs, lon_gcs)
+        if backend == "pyproj":
+            x, y = Sinusoidal._proj()(lon_gcs, lat_gcs)
+            return x, y
+        Sinusoidal._check_backend(backend)
+        lat_rad = np.radians(lat_gcs)
+        x = Sinusoidal.earth_radius * np.radians(lon_gcs) * np.cos(lat_rad)
+        y = Sinusoidal.earth_radius * lat_rad
+        x, y = np.where(valid, x, np.nan), np.where(valid, y, np.nan)
+        return _to_output(x), _to_output(y)
 
     @staticmethod
-    def PCS2GCS(x, y):
+    @instrument("sinusoidal.PCS2GCS", items=first_arg_size)
+    def PCS2GCS(x, y, backend="numpy"):
         """
         投影坐标系转地理坐标系
+        反算公式为 lat = y / R, lon = x / (R * cos(lat)) (弧度)
         :param x: x, 东西方向
         :param y: y, 南北方向
-        :return: (lat_gcs, lon_gcs), 纬度为南北方向, 经度为东西方向
+        :param backend: "numpy"使用解析公式(默认, 不依赖pyproj), "pyproj"使用pyproj作为参考实现
+        :return: (lat_gcs, lon_gcs), 纬度为南北方向, 经度为东西方向; 位于投影有效区域外的元素为NaN
         """
-        lon_gcs, lat_gcs = Proj(Sinusoidal.crs)(x, y, inverse=True)
-        return lat_gcs, lon_gcs
+        if backend == "pyproj":
+            lon_gcs, lat_gcs = Sinusoidal._proj()(x, y, inverse=True)
+            return lat_gcs, lon_gcs
+        Sinusoidal._check_backend(backend)
+        lat_rad = np.asarray(y, dtype=float) / Sinusoidal.earth_radius
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_rad = np.asarray(x, dtype=float) / (Sinusoidal.earth_radius * np.cos(lat_rad))
+        lat_gcs, lon_gcs = np.degrees(lat_rad), np.degrees(lon_rad)
+        # 容许浮点误差, 避免图块边界/投影边缘上的点被判为非法
+        eps = 1e-9
+        valid = (np.abs(lat_gcs) <= 90 + eps) & (np.abs(lon_gcs) <= 180 + eps)
+        lat_gcs = np.where(valid, np.clip(lat_gcs, -90, 90), np.nan)
+        lon_gcs = np.where(valid, np.clip(lon_gcs, -180, 180), np.nan)
+        return _to_output(lat_gcs), _to_output(lon_gcs)
+
+    @staticmethod
+    def _check_backend(backend):
+        if backend != "numpy":
+            raise ValueError(f"backend({backend}) should be in ['numpy', 'pyproj']")
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _proj():
+        """pyproj参考实现, 仅在backend="pyproj"时构造一次"""
+        from pyproj import Proj
+
+        return Proj(Sinusoidal.crs)
+
+    @staticmethod
+    def _tile_corner_lines(grid: Grid):
+        """图块四个角点(左上, 右上, 右下, 左下)的(line, sample)"""
+        last = grid.last_index
+        return ((-0.5, -0.5), (-0.5, last), (last, last), (last, -0.5))
 
     @staticmethod
+    @instrument("sinusoidal.tile_GCSBox", items=first_arg_size)
     def tile_GCSBox(vertical_tile, horizontal_tile, grid="1km"):
         """
         获取指定图块的地理坐标系矩形范围
@@ -173,24 +327,25 @@ class Sinusoidal:
         :param horizontal_tile: 水平图块号
         :return: (lat_min, lon_min, lat_max, lon_max)
         """
+        grid = get_grid(grid)
+        # 角点位于图块外边缘, 其位置与网格分辨率无关, 标量图块直接查表
+        if Sinusoidal._is_table_tile(vertical_tile, horizontal_tile):
+            return Sinusoidal.tile_table().get_gcs_box(horizontal_tile, vertical_tile)
         # 分别计算四个角点的经纬度, 由于是正弦投影, 所以四个角点都要计算经纬度
-        if grid == "1km":
-            lat_ul, lon_ul = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, -0.5)  # 左上角
-            lat_ur, lon_ur = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, 1199.5)  # 右上角
-            lat_lr, lon_lr = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 1199.5, 1199.5)  # 右下角
-            lat_ll, lon_ll = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 1199.5, -0.5)  # 左下角
-        elif grid == "500m":
-            lat_ul, lon_ul = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, -0.5)
-            lat_ur, lon_ur = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, 2399.5)
-            lat_lr, lon_lr = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 2399.5, 2399.5)
-            lat_ll, lon_ll = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 2399.5, -0.5)
-        lat_min = min(lat_ul, lat_lr, lat_ur, lat_ll)
-        lat_max = max(lat_ul, lat_lr, lat_ur, lat_ll)
-        lon_min = min(lon_ul, lon_lr, lon_ur, lon_ll)
-        lon_max = max(lon_ul, lon_lr, lon_ur, lon_ll)
+        corners = [
+            Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, line, sample, grid)
+            for line, sample in Sinusoidal._tile_corner_lines(grid)
+        ]
+        lats = [lat for lat, _ in corners]
+        lons = [lon for _, lon in corners]
+        lat_min = _to_output(np.minimum.reduce(lats))
+        lat_max = _to_output(np.maximum.reduce(lats))
+        lon_min = _to_output(np.minimum.reduce(lons))
+        lon_max = _to_output(np.maximum.reduce(lons))
         return lat_min, lon_min, lat_max, lon_max
 
     @staticmethod
+    @instrument("sinusoidal.tile_PCSGRing", items=first_arg_size)
     def tile_PCSGRing(vertical_tile, horizontal_tile, grid="1km"):
         """
         获取指定图块的环直角坐标(GRing, 四个角点的坐标), 高纬度地区失效
@@ -198,48 +353,122 @@ class Sinusoidal:
         :param horizontal_tile: 水平图块号
         :return: (x_ul, y_ul, x_ur, y_ur, x_lr, y_lr, x_ll, y_ll), x 为东西方向, y 为南北方向
         """
-        if grid == "1km":
-            lat_ul, lon_ul = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, -0.5)
-            x_ul, y_ul = Sinusoidal.GCS2PCS(lat_ul, lon_ul)
-            lat_ur, lon_ur = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, 1199.5)
-            x_ur, y_ur = Sinusoidal.GCS2PCS(lat_ur, lon_ur)
-            lat_lr, lon_lr = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 1199.5, 1199.5)
-            x_lr, y_lr = Sinusoidal.GCS2PCS(lat_lr, lon_lr)
-            lat_ll, lon_ll = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 1199.5, -0.5)
-            x_ll, y_ll = Sinusoidal.GCS2PCS(lat_ll, lon_ll)
-        elif grid == "500m":
-            lat_ul, lon_ul = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, -0.5)
-            x_ul, y_ul = Sinusoidal.GCS2PCS(lat_ul, lon_ul)
-            lat_ur, lon_ur = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, -0.5, 2399.5)
-            x_ur, y_ur = Sinusoidal.GCS2PCS(lat_ur, lon_ur)
-            lat_lr, lon_lr = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 2399.5, 2399.5)
-            x_lr, y_lr = Sinusoidal.GCS2PCS(lat_lr, lon_lr)
-            lat_ll, lon_ll = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, 2399.5, -0.5)
-            x_ll, y_ll = Sinusoidal.GCS2PCS(lat_ll, lon_ll)
-        return x_ul, y_ul, x_ur, y_ur, x_lr, y_lr, x_ll, y_ll
-
-    @staticmethod
-    def get_tile_bounds(hv: str) -> Tuple[float, float]:
-        h = int(hv[1:3])
-        v = int(hv[4:6])
-        dh = Sinusoidal.tile_meters_ulx / 18 
-        dv = Sinusoidal.tile_meters_uly / 9
-        h_ulx = Sinusoidal.tile_meters_ulx - h * dh
-        v_uly = Sinusoidal.tile_meters_uly - v * dv
-        h_brx = Sinusoidal.tile_meters_ulx - (h+1) * dh
-        v_bry = Sinusoidal.tile_meters_uly - (v+1) * dv
-        return round(h_ulx, 6), round(v_uly, 6), round(h_brx, 6), round(v_bry, 6)
-
-    @staticmethod
-    def get_tile_crs(hv: str=None) -> CRS:
+        grid = get_grid(grid)
+        # 角点位于图块外边缘, 其位置与网格分辨率无关, 标量图块直接查表
+        if Sinusoidal._is_table_tile(vertical_tile, horizontal_tile):
+            return Sinusoidal.tile_table().get_gring(horizontal_tile, vertical_tile)
+        gring = []
+        for line, sample in Sinusoidal._tile_corner_lines(grid):
+            lat, lon = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, line, sample, grid)
+            gring.extend(Sinusoidal.GCS2PCS(lat, lon))
+        return tuple(gring)
+
+    @staticmethod
+    def _is_table_tile(vertical_tile, horizontal_tile) -> bool:
+        """标量且合法的图块号可直接查询几何信息表"""
+        return _is_scalar(vertical_tile, horizontal_tile) and bool(Sinusoidal.valid_tile(vertical_tile, horizontal_tile))
+
+    @staticmethod
+    def tile_table(grid: Union[str, int, Grid] = "1km"):
+        """
+        获取指定网格的图块几何信息表(TileTable), 首次使用时构建并缓存
+        包含全部 18x36 个图块的投影范围、地理范围、GRing、六参数及陆地图块标记
+        """
+        from modis_sinusoidal_tile_converter.tile_table import get_tile_table
+
+        return get_tile_table(get_grid(grid).name)
+
+    @staticmethod
+    def tiles_in_bbox(lat_min, lon_min, lat_max, lon_max, land_only: bool = False) -> List[str]:
+        """
+        获取与经纬度矩形相交的图块编号, 基于精确的正弦投影图块边界
+        :param lat_min: 最小纬度
+        :param lon_min: 最小经度, 大于 lon_max 时表示矩形跨越180度经线
+        :param lat_max: 最大纬度
+        :param lon_max: 最大经度
+        :param land_only: 仅返回陆地图块
+        :return: 按 hv 排序的图块编号列表
+        """
+        from modis_sinusoidal_tile_converter.query import tiles_in_bbox
+
+        return tiles_in_bbox(lat_min, lon_min, lat_max, lon_max, land_only)
+
+    @staticmethod
+    def tiles_in_polygon(polygon, crs=None, land_only: bool = False, max_segment_degrees: float = 0.25) -> List[str]:
+        """
+        获取与多边形相交的图块编号, 正确处理跨越180度经线及环绕极点的多边形
+        :param polygon: (N, 2) 顶点数组, crs 为 None 时为 (lat, lon), 否则为该坐标系下的 (x, y);
+                        也可为带 __geo_interface__ 的对象或 GeoJSON 字典
+        :param crs: 多边形顶点所在坐标系, None 表示经纬度
+        :param land_only: 仅返回陆地图块
+        :param max_segment_degrees: 边加密的最大步长(度)
+        :return: 按 hv 排序的图块编号列表
+        """
+        from modis_sinusoidal_tile_converter.query import tiles_in_polygon
+
+        return tiles_in_polygon(polygon, crs, land_only, max_segment_degrees)
+
+    @staticmethod
+    def tiles_of_points(lat_gcs, lon_gcs, land_only: bool = False) -> Tuple[List[str], np.ndarray]:
+        """
+        一次向量化计算所有点所在的图块
+        :param lat_gcs: 纬度数组
+        :param lon_gcs: 经度数组
+        :param land_only: 非陆地图块上的点视为无效
+        :return: (tiles, index), index 为每个点所在图块在 tiles 中的下标, 非法点为 -1
+        """
+        from modis_sinusoidal_tile_converter.query import tiles_of_points
+
+        return tiles_of_points(lat_gcs, lon_gcs, land_only)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _parse_hv_str(hv: str) -> Tuple[int, int]:
+        hv = hv.lower()
+        if len(hv) != 6 or hv[0] != "h" or hv[3] != "v" or not (hv[1:3] + hv[4:6]).isdigit():
+            raise ValueError(f"hv({hv}) should be like 'h00v08'")
+        return Sinusoidal._check_hv(int(hv[1:3]), int(hv[4:6]))
+
+    @staticmethod
+    def _check_hv(h: int, v: int) -> Tuple[int, int]:
+        # 图块表按 [v, h] 索引, 越界的负数下标会静默环绕到另一侧的图块
+        if not 0 <= h <= 35:
+            raise ValueError(f"h({h}) should be in range of [0, 35]")
+        if not 0 <= v <= 17:
+            raise ValueError(f"v({v}) should be in range of [0, 17]")
+        return h, v
+
+    @staticmethod
+    def parse_hv(hv: Union[str, Tuple[int, int]]) -> Tuple[int, int]:
+        """
+        解析图块编号
+        :param hv: "hXXvYY" 形式的字符串(不区分大小写) 或 (h, v) 元组
+        :return: (h, v), h 为水平图块号(0~35), v 为垂直图块号(0~17); 超出范围时抛出 ValueError
+        """
+        if isinstance(hv, str):
+            return Sinusoidal._parse_hv_str(hv)
+        h, v = hv
+        return Sinusoidal._check_hv(int(h), int(v))
+
+    @staticmethod
+    def grid_pixel_size(grid: Union[str, Grid] = "1km") -> float:
+        """网格的像元大小(米)"""
+        return get_grid(grid).pixel_size
+
+    @staticmethod
+    @instrument("sinusoidal.get_tile_bounds")
+    def get_tile_bounds(hv: Union[str, Tuple[int, int]]) -> Tuple[float, float, float, float]:
+        """获取图块投影坐标系范围 (ulx, uly, lrx, lry)"""
+        h, v = Sinusoidal.parse_hv(hv)
+        return Sinusoidal.tile_table().get_bounds(h, v)
+
+    @staticmethod
+    def get_tile_crs(hv: str=None) -> "CRS":
         return Sinusoidal.crs
 
     @staticmethod
-    def get_tile_transform(hv: str, zoom: int = 1000) -> Affine:
-        tile_map_dict = {
-            1000: Sinusoidal.tile_size_meters_1km,
-            500: Sinusoidal.tile_size_meters_500m,
-            250: Sinusoidal.tile_size_meters_250m,
-        }
-        ulx, uly, _, _ = Sinusoidal.get_tile_bounds(hv)
-        return Affine.from_gdal(ulx, tile_map_dict[zoom], 0, uly, 0, -tile_map_dict[zoom])
+    @instrument("sinusoidal.get_tile_transform")
+    def get_tile_transform(hv: Union[str, Tuple[int, int]], zoom: Union[int, str, Grid] = 1000) -> "Affine":
+        """获取图块六参数投影变换矩阵, zoom为像元名义大小(1000, 500, 250), 也可为网格名称或 Grid 对象"""
+        h, v = Sinusoidal.parse_hv(hv)
+        return Sinusoidal.tile_table(zoom).get_transform(h, v)
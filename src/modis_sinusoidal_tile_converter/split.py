@@ -0,0 +1,202 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import rasterio as rio
+from rasterio.warp import Resampling, reproject
+from rasterio.windows import Window
+
+from modis_sinusoidal_tile_converter.convert import array2tiff
+from modis_sinusoidal_tile_converter.grid import GRIDS, Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+
+__all__ = ["split_raster_to_tiles", "main"]
+
+
+def _footprint(src, n: int = 64) -> np.ndarray:
+    """源影像外边界(加密后)的 (x, y) 顶点"""
+    left, bottom, right, top = src.bounds
+    t = np.linspace(0, 1, n, endpoint=False)
+    xs = np.concatenate([left + (right - left) * t, np.full(n, right), right - (right - left) * t, np.full(n, left)])
+    ys = np.concatenate([np.full(n, top), top - (top - bottom) * t, np.full(n, bottom), bottom + (top - bottom) * t])
+    return np.stack([xs, ys], axis=-1)
+
+
+def _source_window(src, hv: str, samples: int = 33, pad: int = 4) -> Optional[Window]:
+    """
+    计算图块在源影像中对应的最小读取窗口
+    在图块内均匀取样, 经解析正弦反算到经纬度后再转换到源坐标系, 投影有效区外的样点自动剔除
+    """
+    from pyproj import Transformer
+
+    ulx, uly, lrx, lry = Sinusoidal.get_tile_bounds(hv)
+    xs, ys = np.meshgrid(np.linspace(ulx, lrx, samples), np.linspace(uly, lry, samples))
+    lat, lon = Sinusoidal.PCS2GCS(xs.ravel(), ys.ravel())
+    valid = ~np.isnan(lat)
+    if not valid.any():
+        return None
+    transformer = Transformer.from_crs("EPSG:4326", src.crs, always_xy=True)
+    x, y = transformer.transform(lon[valid], lat[valid])
+    inv = ~src.transform
+    cols = inv.a * np.asarray(x) + inv.b * np.asarray(y) + inv.c
+    rows = inv.d * np.asarray(x) + inv.e * np.asarray(y) + inv.f
+    finite = np.isfinite(cols) & np.isfinite(rows)
+    if not finite.any():
+        return None
+    col_off = max(int(np.floor(cols[finite].min())) - pad, 0)
+    row_off = max(int(np.floor(rows[finite].min())) - pad, 0)
+    col_end = min(int(np.ceil(cols[finite].max())) + pad, src.width)
+    row_end = min(int(np.ceil(rows[finite].max())) + pad, src.height)
+    if col_end <= col_off or row_end <= row_off:
+        return None
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def _output_dtype(dtype, nodata) -> np.dtype:
+    """能同时容纳源数据与输出无效值的数据类型, 如 uint8 源数据配合 nodata=-9999 时提升为 int16"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return dtype
+    # 命令行传入的整数值无效值为浮点数, 按整数判断所需类型
+    if float(nodata).is_integer():
+        return np.result_type(dtype, np.min_scalar_type(int(nodata)))
+    return np.result_type(dtype, np.float32)
+
+
+def _split_tile(task: dict) -> Optional[str]:
+    """处理单个图块: 窗口读取 -> 重投影 -> 跳过全空图块 -> 写出, 在工作进程/线程中执行"""
+    hv, grid = task["hv"], task["grid"]
+    with rio.open(task["src_path"]) as src:
+        window = _source_window(src, hv)
+        if window is None:
+            return None
+        bands = task["bands"] or list(range(1, src.count + 1))
+        data = src.read(bands, window=window)
+        src_nodata = src.nodata
+        src_transform = src.window_transform(window)
+        src_crs = src.crs
+    h, v = Sinusoidal.parse_hv(hv)
+    pixels = get_grid(grid).pixels_per_tile
+    nodata = task["nodata"]
+    destination = np.full((len(bands), pixels, pixels), nodata, dtype=_output_dtype(data.dtype, nodata))
+    reproject(
+        source=data,
+        destination=destination,
+        src_transform=src_transform,
+        src_crs=src_crs,
+        src_nodata=src_nodata,
+        dst_transform=Sinusoidal.tile_table(grid).get_transform(h, v),
+        dst_crs=Sinusoidal.crs,
+        dst_nodata=nodata,
+        resampling=Resampling[task["resampling"]],
+    )
+    # NaN 与自身不相等, 需单独判断
+    empty = np.isnan(destination).all() if np.isnan(nodata) else np.all(destination == nodata)
+    if task["skip_empty"] and empty:
+        return None
+    fields = {"stem": task["stem"], "hv": hv, "h": h, "v": v, "grid": grid}
+    tiff_path = Path(task["output_dir"]) / task["filename_template"].format(**fields)
+    tiff_path.parent.mkdir(parents=True, exist_ok=True)
+    array2tiff(destination, str(tiff_path), hv, grid=grid, nodata=nodata, **task["profile"])
+    return str(tiff_path)
+
+
+def split_raster_to_tiles(
+    src_path: str,
+    output_dir: str,
+    grid: Union[str, Grid] = "1km",
+    filename_template: str = "{stem}.{hv}.tif",
+    bands: Sequence[int] = None,
+    resampling: str = "nearest",
+    nodata=None,
+    land_only: bool = False,
+    skip_empty: bool = True,
+    max_workers: int = None,
+    use_threads: bool = False,
+    **profile,
+) -> Dict[str, str]:
+    """
+    将任意带地理参考的栅格切分为MODIS正弦投影图块
+    先根据源影像外边界计算覆盖的图块, 再由进程池(或线程池)并行处理, 每个图块只读取其对应的源窗口
+
+    :param src_path: 源栅格路径, 任何rasterio可读的带坐标系数据
+    :param output_dir: 输出目录
+    :param grid: 输出网格, "1km", "500m", "250m" 或 Grid 对象
+    :param filename_template: 输出文件名模板, 可用字段 {stem}, {hv}, {h}, {v}, {grid}
+    :param bands: 需要处理的波段号(从1开始), 默认全部波段
+    :param resampling: 重采样方法名称, 见 rasterio.warp.Resampling
+    :param nodata: 输出无效值, 默认使用源影像的nodata, 源影像未设置时为0; 源数据类型无法表示该值时输出类型相应提升
+    :param land_only: 仅输出陆地图块
+    :param skip_empty: 跳过重投影后全为无效值的图块
+    :param max_workers: 并行数, 默认由执行器决定
+    :param use_threads: 使用线程池代替进程池(GDAL在读写及重投影时释放GIL)
+    :param profile: 传递给 array2tiff 的其他写出参数, 如 compress
+    :return: {hv: 输出文件路径}, 不包含被跳过的图块
+    """
+    grid = get_grid(grid).name
+    with rio.open(src_path) as src:
+        if src.crs is None:
+            raise ValueError(f"src_path({src_path}) has no CRS")
+        hvs = Sinusoidal.tiles_in_polygon(_footprint(src), crs=src.crs, land_only=land_only)
+        if nodata is None:
+            nodata = src.nodata if src.nodata is not None else 0
+    tasks = [
+        {
+            "src_path": str(src_path),
+            "output_dir": str(output_dir),
+            "hv": hv,
+            "grid": grid,
+            "stem": Path(src_path).stem,
+            "filename_template": filename_template,
+            "bands": list(bands) if bands else None,
+            "resampling": resampling,
+            "nodata": nodata,
+            "skip_empty": skip_empty,
+            "profile": profile,
+        }
+        for hv in hvs
+    ]
+    executor_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_cls(max_workers=max_workers) as executor:
+        results = executor.map(_split_tile, tasks)
+        return {task["hv"]: path for task, path in zip(tasks, results) if path is not None}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Split a georeferenced raster into MODIS sinusoidal tiles")
+    parser.add_argument("src", help="Path of the source raster")
+    parser.add_argument("output_dir", help="Directory of the output tiles")
+    parser.add_argument("--grid", default="1km", choices=list(GRIDS), help="Output grid")
+    parser.add_argument("--template", default="{stem}.{hv}.tif", help="Output filename template")
+    parser.add_argument("--bands", type=int, nargs="+", default=None, help="Bands to process, 1-based")
+    parser.add_argument("--resampling", default="nearest", help="Resampling method name")
+    parser.add_argument("--nodata", type=float, default=None, help="Output nodata value")
+    parser.add_argument("--land-only", action="store_true", help="Only write land tiles")
+    parser.add_argument("--keep-empty", action="store_true", help="Also write tiles that are entirely nodata")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of parallel workers")
+    parser.add_argument("--threads", action="store_true", help="Use a thread pool instead of a process pool")
+    parser.add_argument("--compress", default="lzw", help="GeoTIFF compression")
+    args = parser.parse_args(argv)
+    results = split_raster_to_tiles(
+        args.src,
+        args.output_dir,
+        grid=args.grid,
+        filename_template=args.template,
+        bands=args.bands,
+        resampling=args.resampling,
+        nodata=args.nodata,
+        land_only=args.land_only,
+        skip_empty=not args.keep_empty,
+        max_workers=args.workers,
+        use_threads=args.threads,
+        compress=args.compress,
+    )
+    for hv, path in sorted(results.items()):
+        print(f"{hv}: {path}")
+
+
+if __name__ == "__main__":
+    main()
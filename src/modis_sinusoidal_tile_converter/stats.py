@@ -0,0 +1,182 @@
+"""
+可选的运行统计
+
+默认关闭, 关闭时被统计的函数只多一次布尔判断; 开启后记录每个API的调用次数, 累计/分位耗时与处理项数(点数, 像素数).
+
+>>> from modis_sinusoidal_tile_converter import stats
+>>> stats.enable()
+>>> Sinusoidal.GCS2PCS(lat, lon)
+>>> stats.snapshot()["sinusoidal.GCS2PCS"]
+{'count': 1, 'items': 1000000, 'total_seconds': ..., 'mean_seconds': ..., 'p50_seconds': ..., ...}
+
+也可通过环境变量 MODIS_TILE_CONVERTER_STATS=1 在导入时开启; set_hook 可注册回调, 将每次记录导出到外部监控系统.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+__all__ = ["enable", "disable", "is_enabled", "instrument", "timer", "record", "snapshot", "reset", "set_hook"]
+
+# 每个API保留最近的耗时样本数, 用于计算分位数
+SAMPLE_SIZE = 1024
+
+_enabled = os.environ.get("MODIS_TILE_CONVERTER_STATS", "").lower() in ("1", "true", "yes")
+_hook: Optional[Callable[[str, float, int], None]] = None
+_logger = logging.getLogger(__name__)
+_lock = threading.Lock()
+_stats: Dict[str, "_Stat"] = {}
+_null_timer = nullcontext()
+
+
+class _Stat:
+    __slots__ = ("count", "items", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.items = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, seconds: float, items: int):
+        self.count += 1
+        self.items += items
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def to_dict(self) -> dict:
+        p50, p90, p99 = np.percentile(self.samples, [50, 90, 99]).tolist()
+        return {
+            "count": self.count,
+            "items": self.items,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count,
+            "p50_seconds": p50,
+            "p90_seconds": p90,
+            "p99_seconds": p99,
+            "max_seconds": self.max,
+        }
+
+
+def enable():
+    """开启统计"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """关闭统计, 已记录的数据保留"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_hook(hook: Optional[Callable[[str, float, int], None]]):
+    """
+    注册回调, 每次记录时以 (名称, 耗时秒数, 处理项数) 调用, 传入None取消
+    回调在被统计函数所在线程中同步执行, 应尽量轻量; 回调抛出的异常只记录日志, 不影响被统计函数
+    """
+    global _hook
+    _hook = hook
+
+
+def record(name: str, seconds: float, items: int = 1):
+    """记录一次调用"""
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.add(seconds, items)
+    hook = _hook
+    if hook is not None:
+        try:
+            hook(name, seconds, items)
+        except Exception:
+            _logger.exception("stats hook failed for %s", name)
+
+
+def snapshot() -> Dict[str, dict]:
+    """
+    获取当前统计结果: {名称: {count, items, total_seconds, mean_seconds, p50/p90/p99_seconds, max_seconds}}
+    分位数基于每个名称最近 SAMPLE_SIZE 次调用
+    """
+    with _lock:
+        return {name: stat.to_dict() for name, stat in sorted(_stats.items())}
+
+
+def reset():
+    """清空统计结果"""
+    with _lock:
+        _stats.clear()
+
+
+class _Timer:
+    __slots__ = ("name", "items", "start")
+
+    def __init__(self, name: str, items: int):
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, self.items)
+        return False
+
+
+def timer(name: str, items: int = 1):
+    """
+    统计代码块耗时的上下文管理器, 用于函数内部的分阶段统计, 关闭时返回空上下文
+    >>> with stats.timer("convert.array2tiff.write", items=arr.size):
+    ...     ds.write(arr)
+    """
+    return _Timer(name, items) if _enabled else _null_timer
+
+
+def instrument(name: str, items: Callable[..., int] = None):
+    """
+    统计函数调用的装饰器
+    :param name: 统计名称, 如 "sinusoidal.GCS2PCS"
+    :param items: 由调用参数计算处理项数的函数, 为None时每次调用计为1项
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start, items(*args, **kwargs) if items is not None else 1)
+
+        return wrapper
+
+    return decorator
+
+
+def first_arg_size(*args, **kwargs) -> int:
+    """以第一个参数的元素个数作为处理项数, 适用于坐标转换函数"""
+    values = args or tuple(kwargs.values())
+    return int(np.size(values[0])) if values else 1
+
+
+def array_pixels(*args, **kwargs) -> int:
+    """以第一个参数(数组)的元素个数作为处理项数, 无shape属性(如迭代器)时计为0"""
+    values = args or tuple(kwargs.values())
+    shape = getattr(values[0], "shape", None) if values else None
+    return int(np.prod(shape)) if shape is not None else 0
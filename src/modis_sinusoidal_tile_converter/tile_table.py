@@ -0,0 +1,96 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, Tuple, Union
+
+import numpy as np
+
+from modis_sinusoidal_tile_converter.constant import MODIS_SINUSOIDAL_TILE_USED
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+
+if TYPE_CHECKING:
+    from affine import Affine
+
+__all__ = ["TileTable", "get_tile_table"]
+
+
+class TileTable:
+    """
+    MODIS正弦投影全部图块(18行 x 36列)的几何信息表
+    所有数组的前两维均为 (vertical_tile, horizontal_tile), 即 [v, h] 索引;
+    查询方法的参数顺序与 "hXXvYY" 一致, 为 (h, v)
+
+    bounds: (18, 36, 4), 投影坐标系下的 (ulx, uly, lrx, lry)
+    gcs_box: (18, 36, 4), 地理坐标系下的 (lat_min, lon_min, lat_max, lon_max)
+    gring: (18, 36, 8), 投影坐标系下的 (x_ul, y_ul, x_ur, y_ur, x_lr, y_lr, x_ll, y_ll)
+    transforms: (18, 36, 6), GDAL顺序的六参数
+    is_land: (18, 36), 是否为 MODIS_SINUSOIDAL_TILE_USED 中的陆地图块
+    """
+
+    rows = 18
+    cols = 36
+
+    def __init__(self, grid: Union[str, Grid] = "1km"):
+        self.grid = get_grid(grid)
+        pixel_size = self.grid.pixel_size
+        v, h = np.mgrid[0 : self.rows, 0 : self.cols]
+
+        # 投影坐标系范围, 与 get_tile_bounds 的历史计算方式保持一致
+        dh = Sinusoidal.tile_meters_ulx / 18
+        dv = Sinusoidal.tile_meters_uly / 9
+        ulx = Sinusoidal.tile_meters_ulx - h * dh
+        uly = Sinusoidal.tile_meters_uly - v * dv
+        lrx = Sinusoidal.tile_meters_ulx - (h + 1) * dh
+        lry = Sinusoidal.tile_meters_uly - (v + 1) * dv
+        self.bounds = np.round(np.stack([ulx, uly, lrx, lry], axis=-1), 6)
+
+        # 图块角点的地理位置与网格分辨率无关, 统一按1km网格计算
+        self.gcs_box = np.stack(Sinusoidal.tile_GCSBox(v, h), axis=-1)
+        self.gring = np.stack(Sinusoidal.tile_PCSGRing(v, h), axis=-1)
+
+        zeros = np.zeros_like(ulx, dtype=float)
+        self.transforms = np.stack(
+            [self.bounds[..., 0], zeros + pixel_size, zeros, self.bounds[..., 1], zeros, zeros - pixel_size], axis=-1
+        )
+
+        self.is_land = np.zeros((self.rows, self.cols), dtype=bool)
+        for hv in MODIS_SINUSOIDAL_TILE_USED:
+            land_h, land_v = Sinusoidal.parse_hv(hv)
+            self.is_land[land_v, land_h] = True
+
+        for arr in (self.bounds, self.gcs_box, self.gring, self.transforms, self.is_land):
+            arr.flags.writeable = False
+
+    @staticmethod
+    def _index(h: int, v: int) -> Tuple[int, int]:
+        """校验图块编号并返回 [v, h] 下标"""
+        h, v = Sinusoidal.parse_hv((h, v))
+        return v, h
+
+    def get_bounds(self, h: int, v: int) -> Tuple[float, float, float, float]:
+        """图块投影坐标系范围 (ulx, uly, lrx, lry)"""
+        return tuple(self.bounds[self._index(h, v)].tolist())
+
+    def get_gcs_box(self, h: int, v: int) -> Tuple[float, float, float, float]:
+        """图块地理坐标系矩形范围 (lat_min, lon_min, lat_max, lon_max)"""
+        return tuple(self.gcs_box[self._index(h, v)].tolist())
+
+    def get_gring(self, h: int, v: int) -> Tuple[float, ...]:
+        """图块四个角点的投影坐标 (x_ul, y_ul, x_ur, y_ur, x_lr, y_lr, x_ll, y_ll)"""
+        return tuple(self.gring[self._index(h, v)].tolist())
+
+    def get_transform(self, h: int, v: int) -> "Affine":
+        """图块六参数投影变换矩阵(rasterio使用的Affine, 直接由affine包导入以免加载rasterio)"""
+        from affine import Affine
+
+        return Affine.from_gdal(*self.transforms[self._index(h, v)].tolist())
+
+    def land_tiles(self) -> Tuple[np.ndarray, np.ndarray]:
+        """全部陆地图块的 (h, v) 数组"""
+        v, h = np.nonzero(self.is_land)
+        return h, v
+
+
+@lru_cache(maxsize=None)
+def get_tile_table(grid: str = "1km") -> TileTable:
+    """获取指定网格的图块几何信息表, 首次调用时构建并缓存"""
+    return TileTable(grid)
@@ -0,0 +1,275 @@
+"""
+重投影下标映射缓存
+
+MODIS正弦投影网格固定不变, 同一图块重投影到同一目标网格时, 每个目标像元对应的源像元每天都相同.
+本模块对每个 (hv, grid, 目标网格, 重采样方法) 只计算一次下标映射(最近邻为一个源像元下标,
+双线性为4个源像元下标及权重), 以 .npy 文件保存在磁盘上并以内存映射方式读取, 内存中再保留一层LRU缓存;
+之后的重投影只需一次NumPy花式索引(gather), 无需重新计算坐标转换.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from pyproj import CRS, Transformer
+
+from modis_sinusoidal_tile_converter.grid import Grid, get_grid
+from modis_sinusoidal_tile_converter.sinusoidal import Sinusoidal
+
+__all__ = ["IndexMap", "IndexMapCache", "compute_index_map"]
+
+_METHODS = ("nearest", "bilinear")
+
+
+@lru_cache(maxsize=64)
+def _crs_wkt(crs_input) -> str:
+    return CRS.from_user_input(crs_input).to_wkt()
+
+
+def _crs_key(crs) -> str:
+    """目标坐标系的规范化WKT, 按用户输入缓存, 避免每次查询缓存都重新解析坐标系"""
+    # pyproj CRS 的哈希需要先生成WKT, 改用构造时的输入字符串作为缓存键
+    if isinstance(crs, CRS):
+        crs = crs.srs
+    try:
+        return _crs_wkt(crs)
+    except TypeError:
+        # 字典等不可哈希的输入
+        return CRS.from_user_input(crs).to_wkt()
+
+
+class IndexMap:
+    """
+    目标网格到源图块像元的下标映射
+
+    index: nearest 为 (N,), bilinear 为 (4, N) 的int32数组, 值为源图块展平后的像元下标;
+           目标像元在图块外时为源像元总数, 即指向 apply 时追加在末尾的无效值
+    weights: bilinear 为 (4, N) 的float32权重, nearest 为 None
+    shape: 目标网格形状 (height, width), N = height * width
+    source_shape: 源图块形状 (H, W)
+    """
+
+    def __init__(
+        self,
+        method: str,
+        shape: Tuple[int, int],
+        source_shape: Tuple[int, int],
+        index: np.ndarray,
+        weights: np.ndarray = None,
+    ):
+        self.method = method
+        self.shape = tuple(shape)
+        self.source_shape = tuple(source_shape)
+        self.index = index
+        self.weights = weights
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + (self.weights.nbytes if self.weights is not None else 0)
+
+    def apply(self, data: np.ndarray, nodata=None) -> np.ndarray:
+        """
+        将源图块数据按下标映射重投影到目标网格
+        :param data: 形状为 (H, W) 或 (bands, H, W) 的源图块数组
+        :param nodata: 源数据无效值及目标网格填充值, 浮点数据默认为NaN, 整数数据默认为0
+        :return: 形状为 (height, width) 或 (bands, height, width) 的数组
+        """
+        data = np.asarray(data)
+        if data.ndim not in (2, 3):
+            raise ValueError("Only support 2D or 3D array")
+        if data.shape[-2:] != self.source_shape:
+            raise ValueError(f"data shape {data.shape[-2:]} does not match the source tile shape {self.source_shape}")
+        if nodata is None:
+            nodata = np.nan if data.dtype.kind == "f" else 0
+        # 末尾追加一个无效值, 图块外的目标像元直接取到该值, gather后无需再次掩膜
+        flat = np.empty(data.shape[:-2] + (data.shape[-2] * data.shape[-1] + 1,), dtype=data.dtype)
+        flat[..., :-1] = data.reshape(data.shape[:-2] + (-1,))
+        flat[..., -1] = nodata
+        if self.method == "nearest":
+            return np.take(flat, self.index, axis=-1).reshape(data.shape[:-2] + self.shape)
+
+        # 双线性: 逐个邻域像元累加有效值的加权和, 并按有效权重之和重新归一化
+        out = np.zeros(flat.shape[:-1] + self.index.shape[-1:], dtype=np.float32)
+        total = np.zeros_like(out)
+        for index, weight in zip(self.index, self.weights):
+            values = np.take(flat, index, axis=-1).astype(np.float32, copy=False)
+            valid = ~np.isnan(values) if np.isnan(nodata) else values != nodata
+            weight = np.where(valid, weight, np.float32(0))
+            values[~valid] = 0
+            values *= weight
+            out += values
+            total += weight
+        empty = total == 0
+        total[empty] = 1
+        out /= total
+        if data.dtype.kind != "f":
+            np.rint(out, out=out)
+        out[empty] = nodata
+        return out.astype(data.dtype, copy=False).reshape(data.shape[:-2] + self.shape)
+
+
+def compute_index_map(
+    hv: Union[str, Tuple[int, int]],
+    dst_crs,
+    dst_transform,
+    dst_shape: Tuple[int, int],
+    grid: Union[str, Grid] = "1km",
+    method: str = "nearest",
+    chunk_rows: int = 256,
+) -> IndexMap:
+    """
+    计算正弦投影图块到目标网格的下标映射
+    目标像元中心 -> 经纬度(pyproj) -> 正弦投影坐标(解析公式) -> 源图块行列号, 按行分块计算以限制内存
+    :param hv: 源图块编号
+    :param dst_crs: 目标坐标系, 任何pyproj可识别的输入(EPSG代码, WKT, rasterio CRS等)
+    :param dst_transform: 目标网格仿射变换(rasterio Affine)
+    :param dst_shape: 目标网格形状 (height, width)
+    :param grid: 源图块网格, "1km", "500m", "250m" 或 Grid 对象
+    :param method: "nearest" 或 "bilinear"
+    """
+    if method not in _METHODS:
+        raise ValueError(f"Invalid method {method}, should be in range of {list(_METHODS)}")
+    height, width = dst_shape
+    grid = get_grid(grid)
+    pixels = grid.pixels_per_tile
+    ulx, uly, _, _ = Sinusoidal.get_tile_bounds(hv)
+    pixel_size = grid.pixel_size
+    transformer = Transformer.from_crs(CRS.from_user_input(dst_crs), "EPSG:4326", always_xy=True)
+
+    outside = pixels * pixels
+    n_neighbors = 1 if method == "nearest" else 4
+    index = np.empty((n_neighbors, height * width), dtype=np.int32)
+    weights = np.empty((n_neighbors, height * width), dtype=np.float32) if method == "bilinear" else None
+    cols_center = np.arange(width) + 0.5
+    for row in range(0, height, chunk_rows):
+        rows = np.arange(row, min(row + chunk_rows, height)) + 0.5
+        c, r = np.meshgrid(cols_center, rows)
+        x = dst_transform.a * c + dst_transform.b * r + dst_transform.c
+        y = dst_transform.d * c + dst_transform.e * r + dst_transform.f
+        lon, lat = transformer.transform(x.ravel(), y.ravel())
+        sin_x, sin_y = Sinusoidal.GCS2PCS(np.asarray(lat), np.asarray(lon))
+        src_col = (sin_x - ulx) / pixel_size
+        src_row = (uly - sin_y) / pixel_size
+        with np.errstate(invalid="ignore"):
+            inside = (src_col >= 0) & (src_col < pixels) & (src_row >= 0) & (src_row < pixels)
+        part = slice(row * width, row * width + r.size)
+        if method == "nearest":
+            col0 = np.where(inside, src_col, 0).astype(np.int64)
+            row0 = np.where(inside, src_row, 0).astype(np.int64)
+            index[0, part] = np.where(inside, row0 * pixels + col0, outside)
+            continue
+        # 以像元中心为采样点, 图块边缘的邻域下标截断到图块内
+        fc = np.where(inside, src_col, 0.5) - 0.5
+        fr = np.where(inside, src_row, 0.5) - 0.5
+        col0, row0 = np.floor(fc), np.floor(fr)
+        dx, dy = fc - col0, fr - row0
+        col0, row0 = col0.astype(np.int64), row0.astype(np.int64)
+        col1, row1 = np.clip(col0 + 1, 0, pixels - 1), np.clip(row0 + 1, 0, pixels - 1)
+        col0, row0 = np.clip(col0, 0, pixels - 1), np.clip(row0, 0, pixels - 1)
+        for k, (rr, cc, w) in enumerate(
+            [(row0, col0, (1 - dx) * (1 - dy)), (row0, col1, dx * (1 - dy)), (row1, col0, (1 - dx) * dy), (row1, col1, dx * dy)]
+        ):
+            index[k, part] = np.where(inside, rr * pixels + cc, outside)
+            weights[k, part] = w
+    if method == "nearest":
+        return IndexMap(method, dst_shape, (pixels, pixels), index[0])
+    return IndexMap(method, dst_shape, (pixels, pixels), index, weights)
+
+
+class IndexMapCache:
+    """
+    下标映射的两级缓存: 内存LRU + 磁盘上可内存映射的 .npy 文件
+
+    >>> cache = IndexMapCache("~/.cache/modis_index_maps")
+    >>> out = cache.warp(data, "h26v05", "EPSG:3857", transform, (256, 256))
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, maxsize: int = 64):
+        """
+        :param cache_dir: 磁盘缓存目录, 为None时仅使用内存缓存
+        :param maxsize: 内存中最多保留的下标映射个数, 超出时淘汰最久未用的
+        """
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir is not None else None
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+
+    @staticmethod
+    def _key(hv, dst_crs, dst_transform, dst_shape, grid: Grid, method: str) -> str:
+        """缓存键: 可读前缀 + 目标网格参数的摘要"""
+        hv = "h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv))
+        target = repr((_crs_key(dst_crs), tuple(dst_transform)[:6], tuple(dst_shape)))
+        digest = hashlib.sha1(target.encode("utf-8")).hexdigest()[:16]
+        return f"{hv}.{grid.name}.{method}.{digest}"
+
+    def _load(self, key: str, grid: Grid, method: str, dst_shape) -> Optional[IndexMap]:
+        index_path = self.cache_dir / f"{key}.index.npy"
+        if not index_path.exists():
+            return None
+        index = np.load(index_path, mmap_mode="r")
+        weights = np.load(self.cache_dir / f"{key}.weights.npy", mmap_mode="r") if method == "bilinear" else None
+        pixels = grid.pixels_per_tile
+        return IndexMap(method, dst_shape, (pixels, pixels), index, weights)
+
+    def _save(self, key: str, index_map: IndexMap):
+        """先写临时文件再改名, 多进程同时写入同一映射时不会读到不完整的文件"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        arrays = {"weights": index_map.weights, "index": index_map.index}
+        for name, arr in arrays.items():
+            if arr is None:
+                continue
+            tmp_path = self.cache_dir / f"{key}.{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, arr)
+            os.replace(tmp_path, self.cache_dir / f"{key}.{name}.npy")
+
+    def get(
+        self,
+        hv: Union[str, Tuple[int, int]],
+        dst_crs,
+        dst_transform,
+        dst_shape: Tuple[int, int],
+        grid: Union[str, Grid] = "1km",
+        method: str = "nearest",
+    ) -> IndexMap:
+        """获取下标映射, 依次查找内存缓存, 磁盘缓存, 均未命中时计算并写入缓存"""
+        grid = get_grid(grid)
+        key = self._key(hv, dst_crs, dst_transform, dst_shape, grid, method)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        index_map = self._load(key, grid, method, dst_shape) if self.cache_dir is not None else None
+        if index_map is None:
+            index_map = compute_index_map(hv, dst_crs, dst_transform, dst_shape, grid, method)
+            if self.cache_dir is not None:
+                self._save(key, index_map)
+        self._memory[key] = index_map
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return index_map
+
+    def warp(
+        self,
+        data: np.ndarray,
+        hv: Union[str, Tuple[int, int]],
+        dst_crs,
+        dst_transform,
+        dst_shape: Tuple[int, int],
+        grid: Union[str, Grid] = "1km",
+        method: str = "nearest",
+        nodata=None,
+    ) -> np.ndarray:
+        """
+        将图块数据重投影到目标网格, 相当于 rasterio.warp.reproject 的最近邻/双线性重采样
+        :param data: 形状为 (H, W) 或 (bands, H, W) 的源图块数组
+        :param nodata: 源数据无效值及目标网格填充值
+        """
+        return self.get(hv, dst_crs, dst_transform, dst_shape, grid, method).apply(data, nodata)
+
+    def clear(self, disk: bool = False):
+        """清空内存缓存, disk为True时同时删除磁盘缓存文件"""
+        self._memory.clear()
+        if disk and self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("h??v??.*.npy"):
+                path.unlink()
@@ -1,8 +1,12 @@
-import math
 import numpy as np
-from pyproj import CRS, Proj
-from typing import Tuple
-from rasterio import Affine
+from typing import TYPE_CHECKING, Tuple
+
+from modis_sinusoidal_tile_converter._lazy import lazy_class_attribute
+from modis_sinusoidal_tile_converter.stats import first_arg_size, instrument
+
+if TYPE_CHECKING:
+    from affine import Affine
+    from pyproj import CRS
 
 __all__ = ["WebMercator"]
 
@@ -12,12 +16,19 @@ class WebMercator:
     WebMercator投影
     参考网站: https://en.wikipedia.org/wiki/Web_Mercator_projection
     """
-    crs = CRS.from_epsg(3857)
+    @lazy_class_attribute
+    def crs():
+        """投影坐标系, 首次访问时才导入pyproj并构建"""
+        from pyproj import CRS
+
+        return CRS.from_epsg(3857)
     tile_meters_ulx = -20037508.3427892
     tile_meters_uly = 20037508.3427892
     tile_meters_brx = 20037508.3427892
     tile_meters_bry = -20037508.3427892
     pixels_per_tile = 256
+    earth_radius = 6378137.0
+    max_latitude = 85.0511287798066
 
     @staticmethod
     def _check_tile_xyz_valid(x:int, y:int, z:int):
@@ -31,6 +42,24 @@ class WebMercator:
             raise ValueError(f"z({z}) should be in range of [0, 21)")
 
     @staticmethod
+    @instrument("webmercator.GCS2PCS", items=first_arg_size)
+    def GCS2PCS(lat_gcs:float | np.ndarray, lon_gcs:float | np.ndarray)->Tuple[float | np.ndarray, float | np.ndarray]:
+        """地理坐标系转投影坐标系, 纬度超出±max_latitude时截断到投影边界"""
+        lat_rad = np.radians(np.clip(lat_gcs, -WebMercator.max_latitude, WebMercator.max_latitude))
+        x = WebMercator.earth_radius * np.radians(lon_gcs)
+        y = WebMercator.earth_radius * np.log(np.tan(np.pi / 4 + lat_rad / 2))
+        return x, y
+
+    @staticmethod
+    @instrument("webmercator.PCS2GCS", items=first_arg_size)
+    def PCS2GCS(x:float | np.ndarray, y:float | np.ndarray)->Tuple[float | np.ndarray, float | np.ndarray]:
+        """投影坐标系转地理坐标系, 返回(lat_gcs, lon_gcs)"""
+        lon_gcs = np.degrees(np.asarray(x) / WebMercator.earth_radius)
+        lat_gcs = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / WebMercator.earth_radius)) - np.pi / 2)
+        return lat_gcs, lon_gcs
+
+    @staticmethod
+    @instrument("webmercator.PCS2ICSTile", items=first_arg_size)
     def PCS2ICSTile(x:float | np.ndarray, y:float | np.ndarray, z:int)->Tuple[int | np.ndarray, int | np.ndarray]:
         """将投影坐标系转换为目标缩放级别(z)下的图块瓦片号(x, y)"""
         # 计算图块瓦片号
@@ -42,11 +71,12 @@ class WebMercator:
         return tile_x, tile_y
 
     @staticmethod
-    def get_tile_crs()->CRS:
+    def get_tile_crs()->"CRS":
         """获取瓦片坐标系"""
         return WebMercator.crs
 
     @staticmethod
+    @instrument("webmercator.get_tile_bounds")
     def get_tile_bounds(x:int, y:int, z:int)->Tuple[float, float, float, float]:
         """获取瓦片边界坐标"""
         earth_circumference = WebMercator.tile_meters_brx - WebMercator.tile_meters_ulx
@@ -59,8 +89,11 @@ class WebMercator:
         return round(tile_ulx, 6), round(tile_uly, 6), round(tile_brx, 6), round(tile_bry, 6)
 
     @staticmethod
-    def get_tile_transform(x:int, y:int, z:int)->Affine:
+    @instrument("webmercator.get_tile_transform")
+    def get_tile_transform(x:int, y:int, z:int)->"Affine":
         """获取瓦片六参数投影变换矩阵, 用于将瓦片坐标系转换为地理坐标系"""
+        from affine import Affine
+
         # 检查瓦片编号是否合法
         WebMercator._check_tile_xyz_valid(x, y, z)
         # 计算瓦片变换矩阵
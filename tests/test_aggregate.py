@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from modis_sinusoidal_tile_converter.aggregate import METHODS, aggregate, iter_aggregate, result_dtype
+
+
+def _naive(data, factor, method, nodata, min_valid):
+    """逐块的朴素参考实现"""
+    rows, cols = data.shape[0] // factor, data.shape[1] // factor
+    out = np.empty((rows, cols), dtype=result_dtype(data.dtype, method))
+    fill = nodata if nodata is not None else np.nan
+    required = max(1, int(np.ceil(min_valid * factor * factor)))
+    for r in range(rows):
+        for c in range(cols):
+            block = data[r * factor : (r + 1) * factor, c * factor : (c + 1) * factor].ravel()
+            valid = [v for v in block.tolist() if v == v and v != nodata]
+            if method == "valid_fraction":
+                out[r, c] = len(valid) / block.size
+            elif len(valid) < required:
+                out[r, c] = fill
+            elif method == "mean":
+                out[r, c] = np.mean(valid)
+            elif method == "sum":
+                out[r, c] = sum(valid)
+            elif method == "min":
+                out[r, c] = min(valid)
+            elif method == "max":
+                out[r, c] = max(valid)
+            else:
+                # 票数相同时取较小值
+                values, counts = np.unique(valid, return_counts=True)
+                out[r, c] = values[np.argmax(counts)]
+    return out
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("dtype, nodata", [("int16", -3000), ("float32", None), ("float32", -1.0)])
+@pytest.mark.parametrize("src_grid, factor", [("250m", 4), ("500m", 2)])
+def test_aggregate_matches_naive(method, dtype, nodata, src_grid, factor):
+    rng = np.random.default_rng(0)
+    # 取值范围小, 众数有大量平票
+    data = rng.integers(0, 5, (24, 32)).astype(dtype)
+    invalid = rng.random(data.shape) < 0.4
+    invalid[:factor, :factor] = True  # 整块无效
+    data[invalid] = nodata if nodata is not None else np.nan
+    if dtype == "float32" and nodata is not None:
+        data[rng.random(data.shape) < 0.1] = np.nan
+
+    for min_valid in (0.0, 0.5):
+        expected = _naive(data, factor, method, nodata, min_valid)
+        result = aggregate(data, src_grid, "1km", method=method, nodata=nodata, min_valid=min_valid)
+        assert result.dtype == expected.dtype
+        np.testing.assert_allclose(result, expected, rtol=1e-6)
+
+    stacked = aggregate(np.stack([data, data]), src_grid, "1km", method=method, nodata=nodata)
+    np.testing.assert_array_equal(stacked[1], aggregate(data, src_grid, "1km", method=method, nodata=nodata))
+
+
+def test_iter_aggregate_matches_aggregate():
+    data = np.random.default_rng(1).integers(0, 100, (40, 24)).astype("int16")
+    expected = aggregate(data, "250m", "1km", method="max", nodata=0)
+    out = np.full_like(expected, -1)
+    windows = []
+    for ((row_start, row_stop), (col_start, col_stop)), block in iter_aggregate(
+        data, "250m", "1km", method="max", nodata=0, block_rows=14
+    ):
+        windows.append((row_start, row_stop))
+        out[row_start:row_stop, col_start:col_stop] = block
+    # block_rows 向下取整为12行, 即目标网格每块3行
+    assert windows == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_aggregate_invalid_arguments():
+    data = np.zeros((8, 8))
+    with pytest.raises(ValueError):
+        aggregate(data, "1km", "250m")
+    with pytest.raises(ValueError):
+        aggregate(data, method="median")
+    with pytest.raises(ValueError):
+        aggregate(np.zeros((6, 8)))
+    with pytest.raises(ValueError):
+        next(iter_aggregate([(((2, 6), (0, 8)), data[:4])]))
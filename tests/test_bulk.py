@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.bulk import convert_file, convert_points, main
+
+
+def _points(n=1000):
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-89, 89, n), rng.uniform(-179, 179, n)
+    # 超出范围的点
+    lat[:3], lon[3:5] = [95, -91, np.nan], [200, np.nan]
+    return lat, lon
+
+
+@pytest.mark.parametrize("grid", ["1km", "250m"])
+def test_convert_points_matches_sinusoidal(grid):
+    lat, lon = _points()
+    tiles = convert_points([lat, lon], "gcs", "tile", grid)
+    for result, expected in zip(tiles, Sinusoidal.GCS2ICSTile(lat, lon, grid)):
+        np.testing.assert_array_equal(result, expected)
+    assert (tiles[0][:5] == -1).all() and (tiles[0][5:] >= 0).all()
+
+    x, y = convert_points([lat, lon], "gcs", "pcs")
+    back = convert_points([x, y], "pcs", "gcs")
+    np.testing.assert_allclose(back[0][5:], lat[5:], atol=1e-9)
+    np.testing.assert_allclose(back[1][5:], lon[5:], atol=1e-9)
+    # 经 tile 转换到 pcs 再回到 tile 得到同样的图块与行列号
+    via_pcs = convert_points(convert_points(tiles, "tile", "pcs", grid), "pcs", "tile", grid)
+    np.testing.assert_array_equal(via_pcs[0], tiles[0])
+    np.testing.assert_allclose(via_pcs[2][5:], tiles[2][5:], atol=1e-6)
+    with pytest.raises(ValueError):
+        convert_points([lat, lon], "gcs", "utm")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_file_keeps_order(tmp_path, workers):
+    lat, lon = _points()
+    pd.DataFrame({"id": np.arange(lat.size), "latitude": lat, "longitude": lon}).to_csv(tmp_path / "in.csv", index=False)
+    rows = convert_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), input_columns=["latitude", "longitude"],
+                        chunk_size=64, workers=workers, hv_column="hv")
+    assert rows == lat.size
+    out = pd.read_csv(tmp_path / "out.csv", keep_default_na=False)
+    assert list(out.columns) == ["id", "latitude", "longitude", "vertical_tile", "horizontal_tile", "line", "sample", "hv"]
+    np.testing.assert_array_equal(out["id"], np.arange(lat.size))
+    vertical_tile, horizontal_tile, line, sample = Sinusoidal.GCS2ICSTile(lat, lon)
+    np.testing.assert_array_equal(out["vertical_tile"], vertical_tile)
+    np.testing.assert_allclose(out["line"].replace("", np.nan).astype(float), line)
+    expected_hv = ["" if v < 0 else f"h{h:02d}v{v:02d}" for h, v in zip(horizontal_tile, vertical_tile)]
+    assert out["hv"].tolist() == expected_hv
+
+
+def test_main_only_output(tmp_path, capsys):
+    pd.DataFrame({"x": [0.0, 1e6], "y": [0.0, -2e6], "name": ["a", "b"]}).to_csv(tmp_path / "in.csv", index=False)
+    main([str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), "--from", "pcs", "--to", "gcs", "--only-output",
+          "--float-format", "%.6f"])
+    assert "2 rows converted" in capsys.readouterr().err
+    out = pd.read_csv(tmp_path / "out.csv")
+    assert list(out.columns) == ["lat", "lon"]
+    lat, lon = Sinusoidal.PCS2GCS(np.array([0.0, 1e6]), np.array([0.0, -2e6]))
+    np.testing.assert_allclose(out["lat"], lat, atol=1e-6)
+    np.testing.assert_allclose(out["lon"], lon, atol=1e-6)
+
+
+def test_convert_file_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    lat, lon = _points(100)
+    pd.DataFrame({"lat": lat, "lon": lon}).to_parquet(tmp_path / "in.parquet")
+    assert convert_file(str(tmp_path / "in.parquet"), str(tmp_path / "out.parquet"), dst="pcs", chunk_size=30) == 100
+    out = pd.read_parquet(tmp_path / "out.parquet")
+    x, y = Sinusoidal.GCS2PCS(lat, lon)
+    np.testing.assert_array_equal(out["x"], x)
+    np.testing.assert_array_equal(out["y"], y)
@@ -0,0 +1,47 @@
+import pytest
+
+from modis_sinusoidal_tile_converter.catalog import GranuleCatalog, parse_granule_name
+
+NAMES = [
+    "MOD09GA.A2021002.h09v07.061.2021012063102.hdf",
+    "MOD09GA.A2021002.h26v05.061.2021012063102.hdf",
+    "MOD09GA.A2021002.h26v05.061.2022001000000.hdf",
+    "MOD09GA.A2021010.h26v05.061.2021012063102.hdf",
+    "MOD021KM.A2021002.0300.061.2021002154516.hdf",
+]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in NAMES:
+        (data / name).touch()
+    catalog = GranuleCatalog.open(tmp_path / "index")
+    assert catalog.scan(data) == len(NAMES)
+    return catalog
+
+
+def test_parse_granule_name():
+    granule = parse_granule_name("MOD09GA.A2021002.h09v07.061.2021012063102.hdf")
+    assert (granule.product, granule.hv, granule.collection) == ("MOD09GA", "h09v07", 61)
+    assert granule.date.isoformat() == "2021-01-02"
+    swath = parse_granule_name("MOD021KM.A2021002.0300.061.2021002154516.hdf")
+    assert swath.hv is None and swath.acquired.strftime("%H%M") == "0300"
+    assert parse_granule_name("foo.tif") is None
+
+
+def test_query(catalog, tmp_path):
+    rows = catalog.query("MOD09GA", tiles=["h26v05"], start="2021002", end="2021-01-05")
+    assert len(rows) == 2
+    assert len(catalog.query("MOD09GA", tiles=["h26v05"], start="2021002", end="2021002", latest=True)) == 1
+    # 重新打开后只扫描新增文件
+    reopened = GranuleCatalog.open(tmp_path / "index")
+    assert len(reopened) == len(NAMES)
+    assert reopened.scan(tmp_path / "data") == 0
+
+
+@pytest.mark.parametrize("tiles", [[(0, -1)], [(40, 5)], ["h36v00"]])
+def test_query_rejects_out_of_range_tiles(catalog, tiles):
+    with pytest.raises(ValueError):
+        catalog.query(tiles=tiles)
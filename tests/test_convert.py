@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import rasterio as rio
+from rasterio.windows import Window
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.aggregate import aggregate, iter_aggregate, result_dtype
+from modis_sinusoidal_tile_converter.convert import array2tiff, array2tiff_batch, array2tiff_blocks
+
+
+def _tile(seed, dtype="int16"):
+    return np.random.default_rng(seed).integers(0, 1000, (1200, 1200)).astype(dtype)
+
+
+def test_array2tiff_batch_matches_serial(tmp_path):
+    items = [("h26v05", _tile(0)), ((27, 5), _tile(1)), ("H28V06", _tile(2))]
+    written, failed = array2tiff_batch(iter(items), str(tmp_path / "{grid}" / "ndvi.{hv}.tif"), max_workers=2, max_pending=1)
+    assert failed == {}
+    assert sorted(written) == ["h26v05", "h27v05", "h28v06"]
+    for hv, arr in items:
+        hv = "h{:02d}v{:02d}".format(*Sinusoidal.parse_hv(hv))
+        serial = tmp_path / f"serial.{hv}.tif"
+        array2tiff(arr, str(serial), hv)
+        with rio.open(written[hv]) as ds, rio.open(serial) as ref:
+            np.testing.assert_array_equal(ds.read(), ref.read())
+            assert ds.transform == ref.transform
+
+
+def test_array2tiff_batch_per_tile_failures(tmp_path):
+    (tmp_path / "blocker").touch()
+    items = [
+        ("h26v05", _tile(0)),
+        ("h40v05", _tile(1)),  # 超出范围
+        ([40, 5], _tile(2)),  # 不可哈希且超出范围
+        ((26, 5), _tile(3)),  # 与 h26v05 重复
+        ("h27v05", np.zeros(10, dtype="int16")),  # 维度错误
+    ]
+    written, failed = array2tiff_batch(items, str(tmp_path / "{hv}.tif"))
+    assert list(written) == ["h26v05"]
+    assert sorted(failed) == ["[40, 5]", "h26v05", "h27v05", "h40v05"]
+    assert all(isinstance(e, ValueError) for e in failed.values())
+    # 重复的图块没有覆盖第一个
+    with rio.open(written["h26v05"]) as ds:
+        np.testing.assert_array_equal(ds.read(1), _tile(0))
+    assert not (tmp_path / "h27v05.tif").exists()
+
+    # 无法创建输出目录时同样只记录失败
+    written, failed = array2tiff_batch([("h26v05", _tile(0))], str(tmp_path / "blocker" / "{hv}.tif"))
+    assert written == {} and list(failed) == ["h26v05"]
+
+
+def test_array2tiff_blocks_memmap_matches_array2tiff(tmp_path):
+    arr = np.random.default_rng(0).integers(0, 1000, (2, 2400, 2400)).astype("int16")
+    np.save(tmp_path / "src.npy", arr)
+    source = np.load(tmp_path / "src.npy", mmap_mode="r")
+    array2tiff_blocks(source, str(tmp_path / "blocks.tif"), "h26v05", grid="500m", block_size=256, nodata=-3000)
+    array2tiff(arr, str(tmp_path / "full.tif"), "h26v05", grid="500m", nodata=-3000)
+    with rio.open(tmp_path / "blocks.tif") as ds, rio.open(tmp_path / "full.tif") as ref:
+        assert ds.block_shapes == [(256, 256)] * 2
+        assert (ds.transform, ds.crs, ds.nodata) == (ref.transform, ref.crs, ref.nodata)
+        np.testing.assert_array_equal(ds.read(), arr)
+
+
+def test_array2tiff_blocks_from_windows(tmp_path):
+    arr = _tile(0)
+    # rasterio Window 与 ((row_start, row_stop), (col_start, col_stop)) 两种窗口, 顺序任意
+    blocks = [
+        (Window(600, 0, 600, 1200), arr[:, 600:]),
+        (((0, 1200), (0, 600)), arr[:, :600]),
+    ]
+    array2tiff_blocks(iter(blocks), str(tmp_path / "windows.tif"), "h26v05", count=1, dtype="int16")
+    with rio.open(tmp_path / "windows.tif") as ds:
+        np.testing.assert_array_equal(ds.read(1), arr)
+
+    # 流式聚合的输出可直接写出
+    fine = np.random.default_rng(1).integers(0, 1000, (4800, 4800)).astype("int16")
+    dtype = result_dtype(fine.dtype, "mean")
+    array2tiff_blocks(iter_aggregate(fine, "250m", "1km"), str(tmp_path / "mean.tif"), "h26v05", count=1, dtype=dtype)
+    with rio.open(tmp_path / "mean.tif") as ds:
+        np.testing.assert_array_equal(ds.read(1), aggregate(fine, "250m", "1km"))
+
+    with pytest.raises(ValueError):
+        array2tiff_blocks(iter(blocks), str(tmp_path / "bad.tif"), "h26v05")
+    with pytest.raises(ValueError):
+        array2tiff_blocks(arr, str(tmp_path / "bad.tif"), "h26v05", block_size=100)
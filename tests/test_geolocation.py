@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from rasterio.transform import xy
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.geolocation import GeolocationCache, iter_tile_geolocation, tile_geolocation
+
+
+@pytest.mark.parametrize("hv, grid", [("h26v05", "1km"), ("h26v05", "500m"), ("h09v02", "1km")])
+def test_gcs_matches_per_pixel_conversion(hv, grid):
+    lat, lon = tile_geolocation(hv, grid)
+    h, v = Sinusoidal.parse_hv(hv)
+    line, sample = np.mgrid[0 : lat.shape[0], 0 : lat.shape[1]]
+    ref_lat, ref_lon = Sinusoidal.ICSTile2GCS(v, h, line, sample, grid)
+    # ICSTile2GCS 不检查投影有效区域, 区域外的经度超出±180, tile_geolocation 置为NaN
+    outside = np.abs(ref_lon) > 180
+    np.testing.assert_array_equal(np.isnan(lon), outside)
+    np.testing.assert_array_equal(np.isnan(lat), outside)
+    np.testing.assert_array_equal(lat[~outside], ref_lat[~outside])
+    np.testing.assert_array_equal(lon[~outside], ref_lon[~outside])
+    assert outside.any() == (hv == "h09v02")
+
+
+def test_pcs_matches_tile_transform():
+    x, y = tile_geolocation("h26v05", "500m", kind="pcs", rows=(100, 110))
+    line, sample = np.mgrid[100:110, 0:2400]
+    ref_x, ref_y = xy(Sinusoidal.get_tile_transform("h26v05", "500m"), line, sample)
+    np.testing.assert_allclose(x, np.reshape(ref_x, x.shape), rtol=0, atol=1e-6)
+    np.testing.assert_allclose(y, np.reshape(ref_y, y.shape), rtol=0, atol=1e-6)
+
+
+def test_chunks_and_dtype():
+    lat, lon = tile_geolocation("h26v05")
+    chunks = list(iter_tile_geolocation("h26v05", chunk_rows=500, dtype="float32"))
+    assert [start for start, _, _ in chunks] == [0, 500, 1000]
+    lat32 = np.concatenate([first for _, first, _ in chunks])
+    lon32 = np.concatenate([second for _, _, second in chunks])
+    assert lat32.dtype == np.float32
+    np.testing.assert_array_equal(lat32, lat.astype("float32"))
+    np.testing.assert_array_equal(lon32, lon.astype("float32"))
+    with pytest.raises(ValueError):
+        tile_geolocation("h26v05", kind="utm")
+    with pytest.raises(ValueError):
+        tile_geolocation("h26v05", dtype="int32")
+    with pytest.raises(ValueError):
+        tile_geolocation("h26v05", rows=(0, 1201))
+
+
+def test_cache_reuses_disk_and_memory(tmp_path):
+    cache = GeolocationCache(tmp_path, chunk_rows=256)
+    lat, lon = cache.get("h26v05", "1km", dtype="float32")
+    assert isinstance(lat, np.memmap)
+    expected = tile_geolocation("h26v05", dtype="float32")
+    np.testing.assert_array_equal(lat, expected[0])
+    np.testing.assert_array_equal(lon, expected[1])
+    assert np.shares_memory(cache.get((26, 5), "1km", dtype="float32")[0], lat)
+    assert [p.name for p in tmp_path.glob("*.npy")] == ["h26v05.1km.gcs.float32.npy"]
+
+    reloaded = GeolocationCache(tmp_path).get("h26v05", "1km", dtype="float32")
+    np.testing.assert_array_equal(reloaded[1], expected[1])
+    # 仅内存缓存
+    memory_only = GeolocationCache().get("h26v05", kind="pcs")
+    np.testing.assert_array_equal(memory_only[0], tile_geolocation("h26v05", kind="pcs")[0])
+    cache.clear(disk=True)
+    assert not list(tmp_path.glob("*.npy"))
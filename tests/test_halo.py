@@ -0,0 +1,46 @@
+import numpy as np
+import rasterio as rio
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.halo import OFFSETS, crop_halo, read_tile_with_halo, tile_neighbors
+
+
+def test_tile_neighbors_do_not_wrap_antimeridian():
+    west = tile_neighbors("h00v08", land_only=False)
+    assert west[(0, -1)] is None and west[(-1, -1)] is None and west[(1, -1)] is None
+    assert west[(0, 1)] == "h01v08"
+    east = tile_neighbors("h35v09", land_only=False)
+    assert east[(0, 1)] is None and east[(-1, 1)] is None and east[(1, 1)] is None
+    assert east[(0, -1)] == "h34v09"
+
+
+def test_tile_neighbors_poles_and_land():
+    north = tile_neighbors("h17v00", land_only=False)
+    assert all(north[(-1, dh)] is None for dh in (-1, 0, 1))
+    assert north[(1, 0)] == "h17v01"
+    # h26v05 四周均为陆地图块
+    assert set(tile_neighbors("h26v05").values()) == {f"h{26 + dh:02d}v{5 + dv:02d}" for dv, dh in OFFSETS}
+
+
+def test_read_tile_with_halo(tmp_path):
+    pixels = 1200
+    tiles = {}
+    for h, v in [(0, 8), (1, 8), (0, 9), (35, 8)]:
+        data = np.full((pixels, pixels), h * 100 + v, dtype="int16")
+        data[:, 0] = -1  # 标记西边界列
+        tiles[(h, v)] = data
+        profile = dict(driver="GTiff", width=pixels, height=pixels, count=1, dtype="int16", nodata=-9999,
+                       crs=Sinusoidal.get_tile_crs(), transform=Sinusoidal.get_tile_transform((h, v)))
+        with rio.open(tmp_path / f"h{h:02d}v{v:02d}.tif", "w", **profile) as ds:
+            ds.write(data, 1)
+
+    halo = 2
+    out = read_tile_with_halo("h00v08", str(tmp_path / "{hv}.tif"), halo, land_only=False)
+    assert out.shape == (pixels + 2 * halo, pixels + 2 * halo)
+    np.testing.assert_array_equal(crop_halo(out, halo), tiles[(0, 8)])
+    # 东侧取 h01v08 的西边缘, 南侧取 h00v09 的北边缘
+    np.testing.assert_array_equal(out[halo:-halo, -halo:], tiles[(1, 8)][:, :halo])
+    np.testing.assert_array_equal(out[-halo:, halo:-halo], tiles[(0, 9)][:halo])
+    # 西侧不环绕到 h35v08, 北侧 h00v07 不存在, 均为 nodata
+    assert np.all(out[:, :halo] == -9999)
+    assert np.all(out[:halo] == -9999)
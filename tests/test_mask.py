@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.mask import MaskCache, Region, polygon_mask, polygon_masks
+
+# GeoJSON 顶点为 (lon, lat), 外环跨越 h25v05 与 h26v05, 洞位于 h26v05 内
+POLYGON = {
+    "type": "Polygon",
+    "coordinates": [
+        [[100, 31], [102, 39], [108, 36], [106, 32], [100, 31]],
+        [[102, 34], [104, 35], [104, 33], [102, 34]],
+    ],
+}
+
+
+def _point_in_polygon(lat, lon):
+    """奇偶规则的逐点参考实现, 经纬度空间中的直线边"""
+    inside = np.zeros(lat.shape, dtype=bool)
+    for ring in POLYGON["coordinates"]:
+        inside ^= Path(ring).contains_points(np.column_stack([lon.ravel(), lat.ravel()])).reshape(lat.shape)
+    return inside
+
+
+@pytest.mark.parametrize("grid", ["1km", "500m"])
+def test_polygon_mask_matches_point_in_polygon(grid):
+    mask = polygon_mask(POLYGON, "h26v05", grid)
+    pixels = mask.shape[0]
+    line, sample = np.mgrid[0:pixels, 0:pixels]
+    lat, lon = Sinusoidal.ICSTile2GCS(5, 26, line, sample, grid)
+    expected = _point_in_polygon(lat, lon)
+    assert expected.sum() > 1000 and (~expected).sum() > 1000
+    # 只允许多边形边上(边加密误差范围内)的像元不一致
+    assert (mask != expected).mean() < 1e-3
+
+
+def test_fraction_mode_consistent_with_boolean():
+    boolean = polygon_mask(POLYGON, "h26v05")
+    fraction = polygon_mask(POLYGON, "h26v05", mode="fraction", supersample=4)
+    assert fraction.dtype == np.float32 and fraction.min() == 0 and fraction.max() == 1
+    np.testing.assert_array_equal(np.unique((fraction * 16) % 1), [0])
+    # 像元完全在内部/外部时两种模式一致, 部分覆盖的像元只出现在边上
+    partial = (fraction > 0) & (fraction < 1)
+    np.testing.assert_array_equal(boolean[~partial], fraction[~partial] == 1)
+    assert partial.sum() < 0.05 * boolean.sum()
+    assert abs(fraction.sum() - boolean.sum()) < partial.sum()
+
+
+def test_polygon_masks_and_cache(tmp_path):
+    # (lat, lon) 顶点数组与 GeoJSON 外环是同一个多边形
+    outer = np.array([[31, 100], [39, 102], [36, 108], [32, 106]])
+    masks = polygon_masks(outer)
+    assert sorted(masks) == ["h25v05", "h26v05"]
+    region = Region({"type": "Polygon", "coordinates": POLYGON["coordinates"][:1]})
+    for hv, mask in masks.items():
+        np.testing.assert_array_equal(mask, polygon_mask(region, hv))
+
+    cache = MaskCache(tmp_path)
+    first = cache.get(POLYGON, "h26v05")
+    assert cache.get(POLYGON, (26, 5)) is first
+    reloaded = MaskCache(tmp_path).get(POLYGON, "h26v05")
+    assert isinstance(reloaded, np.memmap)
+    np.testing.assert_array_equal(reloaded, polygon_mask(POLYGON, "h26v05"))
+    cache.clear(disk=True)
+    assert not list(tmp_path.glob("*.npy"))
+    with pytest.raises(ValueError):
+        polygon_mask(POLYGON, "h26v05", mode="area")
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+import rasterio as rio
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.convert import array2tiff
+from modis_sinusoidal_tile_converter.mosaic import (
+    MemmapMosaic,
+    build_memmap,
+    build_vrt,
+    mosaic_shape,
+    mosaic_transform,
+    mosaic_window,
+    tile_window,
+)
+
+NODATA = -3000
+
+
+@pytest.fixture()
+def tiles(tmp_path):
+    rng = np.random.default_rng(0)
+    data = {hv: rng.integers(0, 1000, (2, 1200, 1200)).astype("int16") for hv in ("h26v05", "h27v05")}
+    for hv, arr in data.items():
+        array2tiff(arr, str(tmp_path / f"ndvi.{hv}.tif"), hv, nodata=NODATA)
+    return data
+
+
+def _expected(tiles, window, band=0):
+    """按图块逐个拼出窗口内的期望值"""
+    (row_start, row_stop), (col_start, col_stop) = window
+    out = np.full((row_stop - row_start, col_stop - col_start), NODATA, dtype="int16")
+    for hv, arr in tiles.items():
+        (r0, r1), (c0, c1) = tile_window(hv)
+        rows = slice(max(r0, row_start), min(r1, row_stop))
+        cols = slice(max(c0, col_start), min(c1, col_stop))
+        if rows.start < rows.stop and cols.start < cols.stop:
+            out[rows.start - row_start : rows.stop - row_start, cols.start - col_start : cols.stop - col_start] = arr[
+                band, rows.start - r0 : rows.stop - r0, cols.start - c0 : cols.stop - c0
+            ]
+    return out
+
+
+# 跨越 h26v05/h27v05 边界, 并延伸到未提供的 h26v04, h27v04
+WINDOW = ((5 * 1200 - 100, 5 * 1200 + 300), (27 * 1200 - 250, 27 * 1200 + 150))
+
+
+def test_build_vrt_reads_tile_data(tiles, tmp_path):
+    vrt = build_vrt(str(tmp_path / "ndvi.{hv}.tif"), str(tmp_path / "ndvi.vrt"))
+    with rio.open(vrt) as ds:
+        assert (ds.height, ds.width) == mosaic_shape() and ds.count == 2 and ds.nodata == NODATA
+        (row_start, row_stop), (col_start, col_stop) = WINDOW
+        data = ds.read(window=((row_start, row_stop), (col_start, col_stop)))
+        assert ds.transform == Sinusoidal.get_tile_transform("h00v00")
+    for band in range(2):
+        np.testing.assert_array_equal(data[band], _expected(tiles, WINDOW, band))
+
+
+def test_build_memmap_reads_tile_data(tiles, tmp_path):
+    mosaic = build_memmap(str(tmp_path / "ndvi.{hv}.tif"), str(tmp_path / "ndvi.npy"), bands=[2], max_workers=2)
+    assert mosaic.shape == mosaic_shape() and mosaic.tiles == {"h26v05", "h27v05"} and mosaic.nodata == NODATA
+    np.testing.assert_array_equal(mosaic.read(WINDOW), _expected(tiles, WINDOW, band=1))
+    np.testing.assert_array_equal(mosaic.read(tile_window("h27v05")), tiles["h27v05"][1])
+    with pytest.raises(ValueError):
+        mosaic.write_tile("h28v05", tiles["h26v05"][0])
+
+    # 重新以可写方式打开, 写入新图块后记录随 flush 保存
+    mosaic = MemmapMosaic(str(tmp_path / "ndvi.npy"), "r+")
+    mosaic.write_tile("h26v04", tiles["h26v05"][0])
+    mosaic.flush()
+    reopened = MemmapMosaic(str(tmp_path / "ndvi.npy"))
+    assert "h26v04" in reopened.tiles
+    np.testing.assert_array_equal(reopened.read(tile_window("h26v04")), tiles["h26v05"][0])
+
+
+def test_mosaic_window_covers_region():
+    (row_start, row_stop), (col_start, col_stop) = window = mosaic_window(30, 100, 35, 110)
+    # 矩形四角所在的像元都在窗口内
+    ulx, pixel_size, _, uly, _, _ = mosaic_transform()
+    for lat in (30, 35):
+        for lon in (100, 110):
+            x, y = Sinusoidal.GCS2PCS(lat, lon)
+            assert row_start <= (uly - y) // pixel_size < row_stop
+            assert col_start <= (x - ulx) // pixel_size < col_stop
+    assert window == mosaic_window(30, 100, 35, 110, "1km")
+    with pytest.raises(ValueError):
+        mosaic_window(35, 100, 30, 110)
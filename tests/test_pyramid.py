@@ -0,0 +1,25 @@
+import numpy as np
+import rasterio as rio
+
+from modis_sinusoidal_tile_converter import Sinusoidal, pyramid
+
+
+def test_nan_value_masked_before_reproject(tmp_path, monkeypatch):
+    pixels = 1200
+    data = np.full((pixels, pixels), 0.5, dtype="float32")
+    data[:, pixels // 2 :] = 9  # nan_value
+    profile = dict(driver="GTiff", width=pixels, height=pixels, count=1, dtype="float32",
+                   crs=Sinusoidal.get_tile_crs(), transform=Sinusoidal.get_tile_transform("h26v05"))
+    with rio.open(tmp_path / "h26v05.tif", "w", **profile) as ds:
+        ds.write(data, 1)
+
+    rendered = []
+    monkeypatch.setattr(pyramid.Renderer, "render_single_band", lambda data, *args, **kwargs: rendered.append(data))
+    for x, y in pyramid.xyz_tiles_of_sinusoidal_tile("h26v05", 6):
+        task = dict(x=x, y=y, z=6, sources=[("h26v05", str(tmp_path / "h26v05.tif"))], band=1, colormap="gray",
+                    vmin=0, vmax=1, nan_value=9, resampling="bilinear", output_dir=str(tmp_path), format="PNG")
+        pyramid._render_max_zoom_tile(task)
+    assert rendered
+    values = np.concatenate([r[~np.isnan(r)] for r in rendered])
+    # 无效值在重投影前已置为NaN, 不会被双线性插值混入有效像元
+    np.testing.assert_array_equal(np.unique(values), [0.5])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.query import tiles_in_bbox, tiles_in_polygon, tiles_of_points
+
+
+def _box(lat_min, lon_min, lat_max, lon_max):
+    """GeoJSON 矩形, lon_min > lon_max 时跨越180度经线"""
+    if lon_min > lon_max:
+        lon_max += 360
+    lons = np.linspace(lon_min, lon_max, 5)
+    ring = [[lon, lat_max] for lon in lons] + [[lon, lat_min] for lon in lons[::-1]] + [[lon_min, lat_max]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def _sampled_tiles(lat_min, lon_min, lat_max, lon_max):
+    """在矩形内部(不含边界)密集采样, 纬度带边界两侧额外采样, 得到与矩形内部相交的图块"""
+    eps = 1e-7
+    span = (lon_max - lon_min) % 360 or 360
+    lat = np.concatenate([np.linspace(lat_min, lat_max, 801), np.arange(-90, 91, 10) - eps, np.arange(-90, 91, 10) + eps])
+    lat = np.unique(np.clip(lat, lat_min + eps, lat_max - eps))
+    lon = lon_min + eps + np.linspace(0, span - 2 * eps, 1601)
+    lat, lon = np.meshgrid(lat, (lon + 180) % 360 - 180)
+    return set(tiles_of_points(lat.ravel(), lon.ravel())[0])
+
+
+def test_bbox_on_parallels_across_antimeridian():
+    tiles = tiles_in_bbox(-20, 170, -10, -170)
+    assert tiles == ["h00v10", "h01v10", "h02v10", "h33v10", "h34v10", "h35v10"]
+    # 框内的点必须落在结果中, 只在 -20 度纬线上接触的 v11 图块不计入
+    vertical_tile, horizontal_tile, _, _ = Sinusoidal.GCS2ICSTile(-10.5, 175)
+    assert f"h{int(horizontal_tile):02d}v{int(vertical_tile):02d}" in tiles
+
+
+def test_bbox_on_parallels():
+    assert tiles_in_bbox(10, 100, 20, 110) == ["h27v07", "h28v07"]
+    assert tiles_in_bbox(12, 100, 18, 110) == ["h27v07", "h28v07"]
+
+
+@pytest.mark.parametrize(
+    "bbox",
+    [(-20, 170, -10, -170), (10, 100, 20, 110), (-30, 160, 0, -160), (60, -180, 90, 180), (-50, -140, -40, -40)],
+)
+def test_polygon_matches_bbox(bbox):
+    assert tiles_in_polygon(_box(*bbox)) == tiles_in_bbox(*bbox)
+
+
+def test_bbox_edges_on_grid_lines_match_sampling():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        lat_min, lat_max = sorted(rng.choice(np.arange(-90, 91, 5), 2, replace=False).tolist())
+        lon_min, lon_max = rng.choice(np.arange(-180, 181, 10), 2, replace=False).tolist()
+        expected = _sampled_tiles(lat_min, lon_min, lat_max, lon_max)
+        assert set(tiles_in_bbox(lat_min, lon_min, lat_max, lon_max)) == expected, (lat_min, lon_min, lat_max, lon_max)
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from modis_sinusoidal_tile_converter.renderer import Renderer
+
+
+def test_clip_and_normalize_accepts_lists():
+    result = Renderer.clip_and_normalize([[-1, 0.5], [2, 0.25]])
+    assert result.dtype == np.float64
+    np.testing.assert_array_equal(result, [[0, 0.5], [1, 0.25]])
+    # 整数输入不会被原地截断为整数
+    np.testing.assert_array_equal(Renderer.clip_and_normalize(np.array([0, 1, 2]), 0, 4), [0, 0.25, 0.5])
+
+
+def test_clip_and_normalize_in_place():
+    data = np.array([-2, 1, 3, 6], dtype="float32")
+    result = Renderer.clip_and_normalize(data, 0, 4, out=data)
+    assert result is data
+    np.testing.assert_array_equal(data, [0, 0.25, 0.75, 1])
+
+
+def _layers(count, size=64):
+    rng = np.random.default_rng(0)
+    layers = rng.random((count, size, size)).astype("float32")
+    layers[:, :4] = np.nan
+    layers[:, -4:] = -1  # nan_value
+    return layers
+
+
+def test_render_batch_order_and_output(tmp_path):
+    layers = _layers(6)
+    dates = [f"2020{day:03d}" for day in range(1, 7)]
+    items = [("h26v05" if i % 2 else (27, 5), date, layer) for i, (date, layer) in enumerate(zip(dates, layers))]
+    template = str(tmp_path / "{hv}" / "{date}.png")
+    outputs = Renderer.render_batch(iter(items), template, format="PNG", colormap="viridis", nan_value=-1,
+                                    max_workers=2, max_pending=2)
+    keys = [("h26v05" if i % 2 else "h27v05", date) for i, date in enumerate(dates)]
+    assert list(outputs) == keys
+    for (hv, date), layer in zip(keys, layers):
+        assert outputs[(hv, date)] == template.format(hv=hv, date=date)
+        expected = Renderer.render_single_band(layer, format="PNG", colormap="viridis", nan_value=-1)
+        with Image.open(outputs[(hv, date)]) as image:
+            np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+
+    # 数组输入与单进程模式结果相同
+    serial = Renderer.render_batch(layers, str(tmp_path / "serial" / "{date}.png"), format="PNG",
+                                   colormap="viridis", nan_value=-1, hv="h26v05", dates=dates, max_workers=1)
+    assert list(serial) == [("h26v05", date) for date in dates]
+    for ((_, date), path), layer in zip(serial.items(), layers):
+        expected = Renderer.render_single_band(layer, format="PNG", colormap="viridis", nan_value=-1)
+        with Image.open(path) as image:
+            np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+    with pytest.raises(ValueError):
+        Renderer.render_batch(layers, template, hv="h26v05", dates=dates[:2])
+
+
+def test_render_batch_bounds_pending_items(tmp_path):
+    max_pending = 3
+    layers = _layers(12, size=16)
+    template = str(tmp_path / "{date}.png")
+    pulled = []
+
+    def items():
+        for i, layer in enumerate(layers):
+            # 取出第 i 个数组时, 最多只有 max_pending 个已提交但未收集结果的数组
+            done = sum(os.path.exists(template.format(date=k)) for k in range(i))
+            pulled.append(i - done)
+            yield "h26v05", i, layer
+
+    outputs = Renderer.render_batch(items(), template, format="PNG", max_workers=2, max_pending=max_pending)
+    assert list(outputs) == [("h26v05", i) for i in range(12)]
+    assert max(pulled) <= max_pending
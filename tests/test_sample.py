@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.convert import array2tiff, array2tiff_blocks
+from modis_sinusoidal_tile_converter.sample import locate_points, sample_tiles
+
+NODATA = -3000
+
+
+@pytest.fixture()
+def tiles(tmp_path):
+    rng = np.random.default_rng(0)
+    data = {}
+    for hv in ("h26v05", "h27v05"):
+        arr = rng.integers(0, 1000, (2, 1200, 1200)).astype("int16")
+        arr[:, rng.random((1200, 1200)) < 0.1] = NODATA
+        data[hv] = arr
+    # 条带存储与内部分块两种文件布局
+    array2tiff(data["h26v05"], str(tmp_path / "ndvi.h26v05.tif"), "h26v05", nodata=NODATA)
+    array2tiff_blocks(data["h27v05"], str(tmp_path / "ndvi.h27v05.tif"), "h27v05", block_size=128, nodata=NODATA)
+    return data
+
+
+def _points(n=5000):
+    rng = np.random.default_rng(1)
+    # 覆盖 h25v05 ~ h28v05, 其中 h25v05, h28v05 没有文件
+    lat = rng.uniform(30, 40, n)
+    lon = rng.uniform(90, 125, n)
+    lat[:2], lon[2:4] = [95, np.nan], [190, np.nan]
+    return lat, lon
+
+
+def _reference(tiles, lat, lon, band, fill_value=np.nan, mask_nodata=True):
+    """逐点查找图块并直接从数组取值"""
+    out = np.full(lat.size, fill_value)
+    for i in range(lat.size):
+        try:
+            v, h, line, sample = Sinusoidal.GCS2ICSTile(lat[i], lon[i])
+        except ValueError:
+            continue
+        arr = tiles.get(f"h{h:02d}v{v:02d}")
+        if arr is None or np.isnan(line):
+            continue
+        value = arr[band, min(int(np.floor(line + 0.5)), 1199), min(int(np.floor(sample + 0.5)), 1199)]
+        out[i] = fill_value if mask_nodata and value == NODATA else value
+    return out
+
+
+def test_sample_tiles_matches_reference(tiles, tmp_path):
+    lat, lon = _points()
+    template = str(tmp_path / "ndvi.{hv}.tif")
+    values = sample_tiles([lat, lon], template)
+    assert values.shape == (lat.size, 2)
+    for band in range(2):
+        np.testing.assert_array_equal(values[:, band], _reference(tiles, lat, lon, band))
+    assert np.isnan(values[:4]).all() and not np.isnan(values).all()
+
+    serial = sample_tiles([lat, lon], template, bands=[2], fill_value=-1, dtype="int32", mask_nodata=False, max_workers=1)
+    assert serial.shape == lat.shape and serial.dtype == np.int32
+    np.testing.assert_array_equal(serial, _reference(tiles, lat, lon, 1, fill_value=-1, mask_nodata=False))
+
+
+def test_sample_tiles_other_sources(tiles, tmp_path):
+    lat, lon = _points(500)
+    template = str(tmp_path / "ndvi.{hv}.tif")
+    expected = sample_tiles([lat, lon], template, bands=[1])
+    x, y = Sinusoidal.GCS2PCS(lat, lon)
+    np.testing.assert_array_equal(sample_tiles([x, y], template, src="pcs", bands=[1]), expected)
+    # 没有任何点落在已有图块中
+    empty = sample_tiles([np.array([0.0]), np.array([0.0])], template, bands=[1, 2])
+    assert empty.shape == (1, 2) and np.isnan(empty).all()
+
+
+def test_locate_points():
+    code, row, col = locate_points([np.array([35.0, 95.0]), np.array([100.0, 0.0])])
+    v, h, line, sample = Sinusoidal.GCS2ICSTile(35.0, 100.0)
+    assert code.tolist() == [h * 18 + v, -1]
+    assert (row[0], col[0]) == (int(np.floor(line + 0.5)), int(np.floor(sample + 0.5)))
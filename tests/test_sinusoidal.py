@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.tile_table import get_tile_table
+
+
+@pytest.mark.parametrize("hv", [(-1, 5), (0, -1), (36, 0), (0, 18), "h40v05", "h00v18"])
+def test_out_of_range_hv(hv):
+    with pytest.raises(ValueError):
+        Sinusoidal.parse_hv(hv)
+    with pytest.raises(ValueError):
+        Sinusoidal.get_tile_bounds(hv)
+    with pytest.raises(ValueError):
+        Sinusoidal.get_tile_transform(hv)
+
+
+def test_tile_table_out_of_range():
+    with pytest.raises(ValueError):
+        get_tile_table().get_bounds(-1, 5)
+    assert get_tile_table().get_bounds(35, 17) == Sinusoidal.get_tile_bounds("h35v17")
+
+
+def test_numpy_backend_matches_pyproj():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-89.9, 89.9, 200_000)
+    lon = rng.uniform(-180, 180, 200_000)
+    x, y = Sinusoidal.GCS2PCS(lat, lon, backend="numpy")
+    x_ref, y_ref = Sinusoidal.GCS2PCS(lat, lon, backend="pyproj")
+    assert np.abs(x - x_ref).max() < 4e-9
+    assert np.abs(y - y_ref).max() < 4e-9
+
+    lat_back, lon_back = Sinusoidal.PCS2GCS(x_ref, y_ref, backend="numpy")
+    lat_ref, lon_ref = Sinusoidal.PCS2GCS(x_ref, y_ref, backend="pyproj")
+    assert np.abs(lat_back - lat_ref).max() < 3e-11
+    assert np.abs(lon_back - lon_ref).max() < 3e-11
+
+
+@pytest.mark.parametrize("grid", ["1km", "500m", "250m"])
+def test_scalar_matches_array(grid):
+    rng = np.random.default_rng(1)
+    lat = np.concatenate([[-90, 90, 0, -90, 45], rng.uniform(-90, 90, 2000)])
+    lon = np.concatenate([[180, -180, 180, 0, -180], rng.uniform(-180, 180, 2000)])
+    tiles = Sinusoidal.GCS2ICSTile(lat, lon, grid)
+    for i in range(lat.size):
+        scalar = Sinusoidal.GCS2ICSTile(float(lat[i]), float(lon[i]), grid)
+        assert isinstance(scalar[0], int) and isinstance(scalar[2], float)
+        assert scalar == tuple(np.asarray(t)[i].item() for t in tiles)
+
+    vertical_tile, horizontal_tile, line, sample = tiles
+    lat_back, lon_back = Sinusoidal.ICSTile2GCS(vertical_tile, horizontal_tile, line, sample, grid)
+    for i in range(lat.size):
+        scalar = Sinusoidal.ICSTile2GCS(
+            int(vertical_tile[i]), int(horizontal_tile[i]), float(line[i]), float(sample[i]), grid
+        )
+        assert scalar == (lat_back[i].item(), lon_back[i].item())
+
+
+@pytest.mark.parametrize(
+    "func, args",
+    [
+        (Sinusoidal.GCS2ICSTile, (91, 0)),
+        (Sinusoidal.GCS2ICSTile, (0, 181)),
+        (Sinusoidal.ICSGeo2GCS, (-91, 0)),
+        (Sinusoidal.ICSTile2GCS, (18, 0, 0, 0)),
+        (Sinusoidal.ICSTile2ICSGeo, (0, 36, 0, 0)),
+        (Sinusoidal.GCS2PCS, (91, 0)),
+        (Sinusoidal.GCS2PCS, (0, -180.5)),
+    ],
+)
+def test_scalar_out_of_range_raises(func, args):
+    with pytest.raises(ValueError):
+        func(*args)
+
+
+def test_gcs2pcs_array_out_of_range_is_nan():
+    x, y = Sinusoidal.GCS2PCS(np.array([0, 91, 10]), np.array([0, 0, 200]))
+    assert not np.isnan(x[0]) and np.isnan(x[1:]).all() and np.isnan(y[1:]).all()
@@ -0,0 +1,51 @@
+import numpy as np
+import rasterio as rio
+from rasterio.transform import from_origin
+
+from modis_sinusoidal_tile_converter import Sinusoidal
+from modis_sinusoidal_tile_converter.query import tiles_of_points
+from modis_sinusoidal_tile_converter.split import split_raster_to_tiles
+
+
+def _write_source(path, data, nodata=None):
+    profile = dict(driver="GTiff", width=data.shape[-1], height=data.shape[-2], count=1, dtype=data.dtype,
+                   crs="EPSG:4326", transform=from_origin(100, 35, 0.05, 0.05), nodata=nodata)
+    with rio.open(path, "w", **profile) as ds:
+        ds.write(data, 1)
+
+
+def test_split_small_raster(tmp_path):
+    data = np.random.default_rng(0).integers(1, 255, (200, 200)).astype("uint8")
+    _write_source(tmp_path / "src.tif", data)
+    out = split_raster_to_tiles(tmp_path / "src.tif", tmp_path / "out", nodata=-9999, max_workers=1, use_threads=True)
+    # 100~110E, 25~35N
+    assert sorted(out) == ["h26v05", "h26v06", "h27v05", "h27v06"]
+    with rio.open(out["h27v05"]) as ds:
+        assert ds.dtypes[0] == "int16" and ds.nodata == -9999
+        tile = ds.read(1)
+        # 最近邻重采样只会出现源数据中的值
+        valid = tile[tile != -9999]
+        assert valid.size > 0 and np.isin(valid, data).all()
+    # 源像元中心所在的图块像元取到该源像元的值
+    for src_row, src_col in [(10, 110), (99, 150), (150, 199)]:
+        lat, lon = 35 - (src_row + 0.5) * 0.05, 100 + (src_col + 0.5) * 0.05
+        x, y = Sinusoidal.GCS2PCS(lat, lon)
+        (hv,), _ = tiles_of_points(lat, lon)
+        with rio.open(out[hv]) as ds:
+            row, col = ds.index(x, y)
+            assert ds.read(1)[row, col] == data[src_row, src_col]
+
+
+def test_split_skips_nan_empty_tiles(tmp_path):
+    # 只有左上角有有效值, 其余为NaN, 全为NaN的图块应被跳过
+    data = np.full((200, 200), np.nan, dtype="float32")
+    data[:20, :20] = 1.0
+    _write_source(tmp_path / "src.tif", data, nodata=np.nan)
+    out = split_raster_to_tiles(tmp_path / "src.tif", tmp_path / "out", nodata=np.nan, max_workers=1, use_threads=True)
+    assert sorted(out) == ["h26v05"]
+    with rio.open(out["h26v05"]) as ds:
+        assert np.isfinite(ds.read(1)).any()
+    kept = split_raster_to_tiles(
+        tmp_path / "src.tif", tmp_path / "all", nodata=np.nan, skip_empty=False, max_workers=1, use_threads=True
+    )
+    assert len(kept) == 4
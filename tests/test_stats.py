@@ -0,0 +1,25 @@
+import logging
+
+from modis_sinusoidal_tile_converter import stats
+
+
+def test_failing_hook_does_not_break_instrumented_call(caplog):
+    @stats.instrument("test.double")
+    def double(x):
+        return 2 * x
+
+    def hook(name, seconds, items):
+        raise RuntimeError("monitor down")
+
+    was_enabled = stats.is_enabled()
+    stats.enable()
+    stats.set_hook(hook)
+    try:
+        with caplog.at_level(logging.ERROR, logger=stats.__name__):
+            assert double(3) == 6
+    finally:
+        stats.set_hook(None)
+        if not was_enabled:
+            stats.disable()
+    assert stats.snapshot()["test.double"]["count"] >= 1
+    assert "test.double" in caplog.text and "monitor down" in caplog.text
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from rasterio.transform import from_origin
+from rasterio.warp import Resampling, reproject
+
+from modis_sinusoidal_tile_converter import Sinusoidal, warp_cache
+from modis_sinusoidal_tile_converter.warp_cache import IndexMapCache, compute_index_map
+
+# 覆盖 h26v05 西边界的经纬度网格, 左侧部分像元落在图块外
+DST_TRANSFORM = from_origin(98, 36, 0.004, 0.004)
+DST_SHAPE = (300, 400)
+
+
+def _source(method):
+    if method == "nearest":
+        return np.random.default_rng(0).integers(1, 1000, (1200, 1200)).astype("float32")
+    rows, cols = np.mgrid[0:1200, 0:1200]
+    return (np.sin(cols / 50) + np.cos(rows / 70)).astype("float32")
+
+
+def _rasterio_reference(data, method):
+    ref = np.full(DST_SHAPE, np.nan, dtype="float32")
+    reproject(data, ref, src_transform=Sinusoidal.get_tile_transform("h26v05"), src_crs=Sinusoidal.get_tile_crs(),
+              src_nodata=np.nan, dst_transform=DST_TRANSFORM, dst_crs="EPSG:4326", dst_nodata=np.nan,
+              resampling=Resampling[method])
+    return ref
+
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear"])
+def test_apply_matches_rasterio_reproject(method):
+    data = _source(method)
+    ref = _rasterio_reference(data, method)
+    out = compute_index_map("h26v05", "EPSG:4326", DST_TRANSFORM, DST_SHAPE, method=method).apply(data)
+    np.testing.assert_array_equal(np.isnan(out), np.isnan(ref))
+    assert np.isnan(out).any() and not np.isnan(out).all()
+    if method == "nearest":
+        np.testing.assert_array_equal(out, ref)
+    else:
+        np.testing.assert_allclose(out, ref, atol=1e-5, equal_nan=True)
+
+
+def test_apply_integer_nodata_and_bands():
+    data = np.stack([_source("nearest"), _source("nearest") * 2]).astype("int16")
+    index_map = compute_index_map("h26v05", "EPSG:4326", DST_TRANSFORM, DST_SHAPE)
+    out = index_map.apply(data, nodata=-1)
+    assert out.shape == (2,) + DST_SHAPE and out.dtype == np.int16
+    ref = _rasterio_reference(data[0].astype("float32"), "nearest")
+    np.testing.assert_array_equal(out[0], np.where(np.isnan(ref), -1, ref))
+    np.testing.assert_array_equal(out[1][out[1] != -1], 2 * out[0][out[0] != -1])
+    with pytest.raises(ValueError):
+        index_map.apply(data[0, :100])
+
+
+def test_cache_reuses_disk_and_memory(tmp_path, monkeypatch):
+    data = _source("bilinear")
+    cache = IndexMapCache(tmp_path)
+    expected = cache.warp(data, "h26v05", "EPSG:4326", DST_TRANSFORM, DST_SHAPE, method="bilinear")
+    assert sorted(p.name.split(".")[-2] for p in tmp_path.glob("*.npy")) == ["index", "weights"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("index map should come from the cache")
+
+    monkeypatch.setattr(warp_cache, "compute_index_map", fail)
+    # 同一坐标系的不同写法命中同一缓存, 新实例从磁盘读取
+    for crs in ("EPSG:4326", 4326):
+        reloaded = IndexMapCache(tmp_path)
+        index_map = reloaded.get((26, 5), crs, DST_TRANSFORM, DST_SHAPE, method="bilinear")
+        assert isinstance(index_map.index, np.memmap)
+        np.testing.assert_array_equal(index_map.apply(data), expected)
+    assert cache.get("h26v05", "EPSG:4326", DST_TRANSFORM, DST_SHAPE, method="bilinear") is cache.get(
+        "h26v05", "EPSG:4326", DST_TRANSFORM, DST_SHAPE, method="bilinear"
+    )
+
+    cache.clear(disk=True)
+    assert not list(tmp_path.glob("*.npy"))